@@ -0,0 +1,335 @@
+import asyncio
+import contextlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TimeElapsedColumn
+
+import http_client
+import image_store
+import metrics
+from main import (
+    LISTING_WORKERS,
+    MAX_PENDING_IMAGES,
+    RESIZE_WORKERS,
+    admit_product_urls,
+    checkpointed_image,
+    encode_image_url,
+    finish_product,
+    is_image_content_type,
+    link_stored_image,
+    listing_page_url,
+    parse_product_fields,
+    parse_product_links,
+    parse_product_page,
+    process_pool,
+    product_row,
+    remember_product_code,
+    save_image,
+)
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+
+def make_client(concurrency):
+    if httpx is None:
+        raise RuntimeError("The async engine needs httpx: pip install httpx")
+    return httpx.AsyncClient(
+        headers={"User-Agent": http_client.USER_AGENT},
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        timeout=httpx.Timeout(http_client.READ_TIMEOUT, connect=http_client.CONNECT_TIMEOUT),
+        follow_redirects=True,
+    )
+
+
+# An httpx.Response rebuilt from an http_cache entry
+def cached_response(url, entry, body):
+    return httpx.Response(200, headers=entry.get("headers", {}), content=body,
+                          request=httpx.Request("GET", url))
+
+
+# Listing pages, product pages and images all run as coroutines sharing one
+# semaphore, so `concurrency` bounds the requests in flight across every stage.
+# Parsing runs on a small thread pool off the event loop, or in a process
+# pool of `parse_workers`, and image resizing in a process pool. Rows are
+# journaled and written on that thread pool too, since a writer flushing a
+# batch would otherwise stall every request.
+class AsyncScraper:
+    def __init__(self, client, concurrency, image_directory, journal, writer, catalog=None, cpu_workers=None,
+                 parse_workers=None):
+        self.client = client
+        self.journal = journal
+        self.writer = writer
+        self.catalog = catalog
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.image_directory = image_directory
+        # image URL -> [lock, coroutines using it]; dropped when unused
+        self.image_locks = {}
+        self.executor = ThreadPoolExecutor(max_workers=cpu_workers or os.cpu_count())
+        self.resize_executor = process_pool(RESIZE_WORKERS)
+        self.parse_executor = process_pool(parse_workers) if parse_workers else None
+
+    # One GET through http_client's scheduler, which throttles and retries it
+    async def send(self, url, headers=None):
+        scheduler = http_client.get_scheduler()
+        if scheduler is None:
+            return await self.counted_get(url, headers)
+        return await scheduler.call_async(url, lambda: self.counted_get(url, headers),
+                                          retry_exceptions=(httpx.TransportError,))
+
+    async def counted_get(self, url, headers=None):
+        response = await self.client.get(url, headers=headers)
+        metrics.HTTP_REQUESTS.inc(status=response.status_code)
+        return response
+
+    async def fetch(self, url):
+        async with self.semaphore:
+            cache = http_client.get_cache()
+            if cache is None:
+                return await self.send(url)
+
+            entry = cache.lookup(url)
+            if entry is not None and cache.is_fresh(entry):
+                body = http_client.read_cached(cache, url, entry)
+                if body is not None:
+                    metrics.CACHE_LOOKUPS.inc(result="hit")
+                    return cached_response(url, entry, body)
+
+            headers = cache.validation_headers(entry) if entry is not None else None
+            response = await self.send(url, headers=headers)
+            if response.status_code == 304 and entry is not None:
+                body = http_client.read_cached(cache, url, entry)
+                if body is not None:
+                    cache.refresh(url, entry)
+                    metrics.CACHE_LOOKUPS.inc(result="revalidated")
+                    return cached_response(url, entry, body)
+                response = await self.send(url)
+            metrics.CACHE_LOOKUPS.inc(result="miss")
+            if response.status_code == 200:
+                cache.store(url, response.headers, response.content)
+            return response
+
+    async def run_cpu(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def parse_page(self, content, url):
+        with metrics.STAGE_SECONDS.time(stage="parse"):
+            if self.parse_executor is None:
+                return await self.run_cpu(parse_product_page, content, url, self.catalog)
+            loop = asyncio.get_running_loop()
+            fields = await loop.run_in_executor(self.parse_executor, parse_product_fields, content, url)
+            return await self.run_cpu(product_row, fields, url, self.catalog)
+
+    async def fetch_listing_page(self, url):
+        with metrics.STAGE_SECONDS.time(stage="listing"):
+            response = await self.fetch(url)
+            response.raise_for_status()
+            metrics.RESPONSE_BYTES.observe(len(response.content), kind="listing")
+            return await self.run_cpu(parse_product_links, response.content)
+
+    async def scrape_product(self, url):
+        try:
+            with metrics.STAGE_SECONDS.time(stage="product_fetch"):
+                response = await self.fetch(url)
+                response.raise_for_status()
+                metrics.RESPONSE_BYTES.observe(len(response.content), kind="product")
+            return url, await self.parse_page(response.content, url)
+        except Exception as e:
+            logger.error("Error scraping %s: %s", url, e, extra={'url': url})
+            self.journal.record_failure(url, "product", e)
+            metrics.PRODUCTS.inc(result="failed")
+            return url, None
+
+    @contextlib.asynccontextmanager
+    async def image_lock(self, image_url):
+        entry = self.image_locks.setdefault(image_url, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self.image_locks[image_url]
+
+    # An image already in the image store under this URL is linked, not
+    # downloaded again; products sharing an image URL take turns on its lock
+    async def download_image(self, image_url, product_code):
+        store = image_store.get_store()
+        if store is None:
+            return await self.fetch_image(image_url, product_code)
+        async with self.image_lock(image_url):
+            digest = store.lookup(image_url)
+            if digest is not None:
+                try:
+                    return await self.run_cpu(link_stored_image, store, digest, product_code, self.image_directory)
+                except OSError as e:
+                    logger.warning("Error linking stored image: %s", e,
+                                   extra={'url': image_url, 'product_code': product_code})
+            return await self.fetch_image(image_url, product_code)
+
+    async def fetch_image(self, image_url, product_code):
+        try:
+            logger.debug("Downloading image from: %s", image_url, extra={'product_code': product_code})
+            request_url = encode_image_url(image_url)
+            with metrics.STAGE_SECONDS.time(stage="image"):
+                response = await self.fetch(request_url)
+                response.raise_for_status()
+
+                if not is_image_content_type(response.headers.get('Content-Type')):
+                    logger.warning("URL does not point to an image: %s", request_url,
+                                   extra={'url': request_url, 'product_code': product_code})
+                    return None
+
+                return await self.run_cpu(
+                    save_image, [response.content], product_code, self.image_directory, self.resize_executor,
+                    image_url)
+        except httpx.HTTPError as e:
+            logger.warning("Error downloading image for %s: %s", product_code, e,
+                           extra={'url': image_url, 'product_code': product_code})
+            return None
+
+    async def finish_product(self, url, product_data, new_image_url=None):
+        await self.run_cpu(finish_product, self.journal, self.writer, url, product_data, new_image_url)
+
+    async def finish_with_image(self, url, product_data):
+        new_image_url = await self.download_image(product_data['image_url'], product_data['Product Code'])
+        await self.finish_product(url, product_data, new_image_url)
+
+    async def run(self, start_page, end_page, base_url, brand_id):
+        journal = self.journal
+        unique_product_codes = set(journal.product_codes)
+        # Products waiting on their image; past MAX_PENDING_IMAGES the
+        # results loop waits for one to finish, as the threads engine does
+        image_tasks = set()
+        total_found = 0
+
+        async def wait_for_images(return_when):
+            done, _ = await asyncio.wait(image_tasks, return_when=return_when)
+            for image_task in done:
+                image_tasks.discard(image_task)
+                image_task.result()
+
+        with Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
+            TimeElapsedColumn()
+        ) as progress:
+            task = progress.add_task("[cyan]Scraping Products...", total=0)
+
+            # Listing pages are fetched LISTING_WORKERS at a time and stop once
+            # a page brings no new links; product pages are scheduled as soon
+            # as their listing page is parsed
+            listing_tasks = {}
+            seen = set(journal.discovered_urls)
+            next_page = start_page
+            last_page = end_page
+            pending = set()
+            # First listing page that failed; no more pages are fetched, the
+            # products already scheduled finish and the error is raised after
+            listing_error = None
+
+            def schedule_listing_pages():
+                nonlocal next_page
+                while len(listing_tasks) < LISTING_WORKERS and next_page <= last_page:
+                    listing_task = asyncio.ensure_future(
+                        self.fetch_listing_page(listing_page_url(base_url, brand_id, next_page)))
+                    listing_tasks[listing_task] = next_page
+                    pending.add(listing_task)
+                    next_page += 1
+
+            def schedule_products(urls):
+                nonlocal total_found
+                urls = list(admit_product_urls(journal.pending_urls(urls), journal,
+                                               unique_product_codes.__contains__))
+                total_found += len(urls)
+                progress.update(task, total=total_found)
+                for url in urls:
+                    pending.add(asyncio.ensure_future(self.scrape_product(url)))
+
+            # URLs journaled by an earlier run of this job go first; listing
+            # pages are only fetched again if that run didn't finish discovery
+            schedule_products(journal.discovered_urls)
+            if not journal.discovery_complete:
+                schedule_listing_pages()
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for finished in done:
+                    if finished in listing_tasks:
+                        page = listing_tasks.pop(finished)
+                        try:
+                            links = finished.result()
+                        except Exception as e:
+                            if listing_error is None:
+                                logger.error("Listing page %d failed, finishing the products already found: %s",
+                                             page, e)
+                                listing_error = e
+                                last_page = next_page - 1
+                            continue
+                        urls = [url for url in links if url not in seen]
+                        if not urls:
+                            last_page = min(last_page, page - 1)
+                        seen.update(urls)
+                        for url in urls:
+                            journal.record_url(url)
+                        schedule_products(urls)
+                        schedule_listing_pages()
+                        if not listing_tasks and listing_error is None:
+                            journal.record_discovery_complete()
+                        continue
+
+                    url, product_data = finished.result()
+                    if product_data and product_data.get('unchanged'):
+                        unique_product_codes.add(product_data['Product Code'])
+                        journal.record_unchanged(url)
+                        remember_product_code(url, product_data['Product Code'])
+                        metrics.PRODUCTS.inc(result="unchanged")
+                    elif product_data and product_data['Product Code'] not in unique_product_codes:
+                        unique_product_codes.add(product_data['Product Code'])
+                        if 'image_url' in product_data:
+                            new_image_url = checkpointed_image(journal, product_data['Product Code'], self.image_directory)
+                            if new_image_url:
+                                await self.finish_product(url, product_data, new_image_url)
+                            else:
+                                while len(image_tasks) >= MAX_PENDING_IMAGES:
+                                    await wait_for_images(asyncio.FIRST_COMPLETED)
+                                image_tasks.add(asyncio.ensure_future(self.finish_with_image(url, product_data)))
+                        else:
+                            await self.finish_product(url, product_data)
+                        logger.debug("Scraped: %s", product_data['Name'],
+                                     extra={'url': url, 'product_code': product_data['Product Code']})
+                    elif product_data:
+                        journal.record_duplicate(url)
+                        remember_product_code(url, product_data['Product Code'])
+                        metrics.PRODUCTS.inc(result="duplicate")
+                    progress.update(task, advance=1)
+
+            if image_tasks:
+                await wait_for_images(asyncio.ALL_COMPLETED)
+            if listing_error is not None:
+                raise listing_error
+
+        print(f"Found {total_found} products to scrape.")
+
+
+async def scrape_async(start_page, end_page, base_url, brand_id, image_directory, journal, writer,
+                       concurrency=100, catalog=None, parse_workers=None):
+    async with make_client(concurrency) as client:
+        scraper = AsyncScraper(client, concurrency, image_directory, journal, writer, catalog,
+                               parse_workers=parse_workers)
+        try:
+            return await scraper.run(start_page, end_page, base_url, brand_id)
+        finally:
+            scraper.executor.shutdown(wait=False)
+            scraper.resize_executor.shutdown()
+            if scraper.parse_executor is not None:
+                scraper.parse_executor.shutdown()
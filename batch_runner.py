@@ -0,0 +1,238 @@
+import argparse
+import json
+import logging
+import os
+import re
+import threading
+
+from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TimeElapsedColumn
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+import fx_rate
+import http_client
+from checkpoint import CheckpointJournal, default_checkpoint_path
+from main import (
+    ThreadedPipeline, add_fetch_arguments, add_frontier_arguments, add_logging_arguments, add_metrics_arguments,
+    check_metrics_arguments, configure_fetching, configure_frontier, configure_logging, configure_metrics,
+    run_threaded_job,
+)
+from output_writer import ProductWriter, sidecar_path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOBS = 4
+DEFAULT_IMAGE_DIRECTORY = "product_images"
+DEFAULT_REPORT = "batch.report.json"
+
+
+class JobSpecError(ValueError):
+    pass
+
+
+# One category listing to scrape. `output` is only used when the batch
+# writes one file per job.
+class Job:
+    def __init__(self, base_url, brand_id="", start_page=1, end_page=1, name=None, output=None):
+        if not base_url:
+            raise JobSpecError("every job needs a base_url")
+        self.base_url = base_url
+        self.brand_id = str(brand_id or "")
+        self.start_page = int(start_page)
+        self.end_page = int(end_page)
+        if self.start_page < 1 or self.end_page < self.start_page:
+            raise JobSpecError(f"{base_url}: bad page range {self.start_page}-{self.end_page}")
+        self.name = name or job_name(self.base_url, self.brand_id)
+        self.output = output or f"{self.name}.csv"
+
+    def __repr__(self):
+        return f"Job({self.name!r}, pages {self.start_page}-{self.end_page})"
+
+
+# A file-safe name from the last path segment of the category URL
+def job_name(base_url, brand_id=""):
+    segments = [segment for segment in base_url.split("?")[0].split("/") if segment]
+    name = re.sub(r"[^\w\-]", "_", segments[-1] if segments else "job")
+    return f"{name}-{brand_id}" if brand_id else name
+
+
+# A batch is a dict like
+#   {"output": "all.csv",                      # optional: one combined file
+#    "defaults": {"start_page": 1, "end_page": 5},
+#    "jobs": [{"base_url": ..., "brand_id": 6409, "end_page": 20}, ...]}
+# Each job takes its missing keys from "defaults".
+def parse_batch(spec):
+    if not isinstance(spec, dict) or not isinstance(spec.get("jobs"), list) or not spec["jobs"]:
+        raise JobSpecError("a job spec needs a non-empty 'jobs' list")
+    defaults = spec.get("defaults") or {}
+    jobs = []
+    for entry in spec["jobs"]:
+        if isinstance(entry, str):
+            entry = {"base_url": entry}
+        options = dict(defaults, **entry)
+        unknown = set(options) - {"base_url", "brand_id", "start_page", "end_page", "name", "output"}
+        if unknown:
+            raise JobSpecError(f"unknown job keys: {', '.join(sorted(unknown))}")
+        jobs.append(Job(**options))
+
+    names = [job.name for job in jobs]
+    duplicates = {name for name in names if names.count(name) > 1}
+    if duplicates:
+        raise JobSpecError(f"job names must be unique, repeated: {', '.join(sorted(duplicates))}")
+    return jobs, spec.get("output")
+
+
+# Read a JSON or YAML job spec file
+def load_batch(path):
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if path.endswith((".yaml", ".yml")):
+        if yaml is None:
+            raise JobSpecError("PyYAML is needed for YAML job specs (pip install pyyaml)")
+        try:
+            spec = yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise JobSpecError(f"{path}: {e}")
+    else:
+        try:
+            spec = json.loads(text)
+        except ValueError as e:
+            raise JobSpecError(f"{path}: {e}")
+    try:
+        return parse_batch(spec)
+    except (TypeError, ValueError) as e:
+        raise JobSpecError(f"{path}: {e}")
+
+
+# --job BASE_URL[,BRAND_ID] arguments, all sharing the same page range
+def jobs_from_arguments(job_arguments, start_page, end_page):
+    if not job_arguments:
+        return []
+    jobs = []
+    for argument in job_arguments:
+        base_url, _, brand_id = argument.partition(",")
+        jobs.append({"base_url": base_url.strip(), "brand_id": brand_id.strip()})
+    return parse_batch({"defaults": {"start_page": start_page, "end_page": end_page}, "jobs": jobs})[0]
+
+
+# Run every job concurrently on one shared pipeline: the same product and
+# image workers, the same connection pool and the same Product Code dedup
+# set, so a product listed in two categories is written once. Rows go to
+# one combined file when `combined_output` is set, otherwise to each job's
+# own output. At most `parallel_jobs` jobs run at a time, from discovery
+# to their last row; the rest wait for a slot.
+def run_batch(jobs, combined_output=None, image_directory=DEFAULT_IMAGE_DIRECTORY, concurrency=None,
+              parallel_jobs=DEFAULT_JOBS, resume=False, compress=False, parse_workers=None):
+    os.makedirs(image_directory, exist_ok=True)
+    if concurrency:
+        http_client.configure(max_connections_per_host=concurrency)
+
+    combined_writer = ProductWriter(combined_output, compress=compress) if combined_output else None
+    slots = threading.Semaphore(parallel_jobs)
+    results = {}
+
+    def run_job(job, pipeline, progress):
+        with slots:
+            checkpoint_path = default_checkpoint_path(job.base_url, job.brand_id, job.start_page, job.end_page)
+            journal = CheckpointJournal(checkpoint_path, resume=resume)
+            writer = combined_writer or ProductWriter(job.output, compress=compress)
+            try:
+                for row in journal.iter_products():
+                    writer.write(row)
+                found = run_threaded_job(
+                    pipeline, progress, job.name, job.start_page, job.end_page, job.base_url, job.brand_id,
+                    image_directory, journal, writer,
+                )
+                results[job.name] = found
+            except Exception as e:
+                logger.error("Job %s failed: %s", job.name, e)
+                results[job.name] = e
+            finally:
+                if writer is not combined_writer:
+                    writer.close()
+                journal.close()
+
+    try:
+        with ThreadedPipeline(concurrency, parse_workers) as pipeline, Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
+            TimeElapsedColumn()
+        ) as progress:
+            threads = [threading.Thread(target=run_job, args=(job, pipeline, progress), name=job.name)
+                       for job in jobs]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+    finally:
+        if combined_writer:
+            combined_writer.close()
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape many Stone Group categories in one process")
+    parser.add_argument("spec", nargs="?", help="JSON or YAML job spec file")
+    parser.add_argument("--job", action="append", default=[], metavar="BASE_URL[,BRAND_ID]",
+                        help="a category to scrape; repeat for more (used with --start-page/--end-page)")
+    parser.add_argument("--start-page", type=int, default=1)
+    parser.add_argument("--end-page", type=int, default=1)
+    parser.add_argument("--output", default=None,
+                        help="write every job to this one file instead of one file per job")
+    parser.add_argument("--images", default=DEFAULT_IMAGE_DIRECTORY, help="image directory shared by all jobs")
+    parser.add_argument("--concurrency", type=int, default=None, help="product worker threads shared by all jobs")
+    parser.add_argument("--parse-workers", type=int, default=None,
+                        help="parse product pages in this many processes instead of on the fetching threads")
+    parser.add_argument("--parallel-jobs", type=int, default=DEFAULT_JOBS,
+                        help="jobs run at the same time; the others wait for one to finish")
+    parser.add_argument("--resume", action="store_true", help="continue each job from its checkpoint journal")
+    parser.add_argument("--gzip", action="store_true", help="gzip the output files")
+    add_fetch_arguments(parser)
+    add_frontier_arguments(parser)
+    add_metrics_arguments(parser)
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    if not args.spec and not args.job:
+        parser.error("give a job spec file or at least one --job")
+    check_metrics_arguments(parser, args)
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    configure_logging(args)
+    try:
+        if args.spec:
+            jobs, combined_output = load_batch(args.spec)
+        else:
+            jobs, combined_output = [], None
+        jobs += jobs_from_arguments(args.job, args.start_page, args.end_page)
+    except (JobSpecError, OSError) as e:
+        raise SystemExit(f"Error: {e}")
+    combined_output = args.output or combined_output
+
+    configure_fetching(args)
+    configure_frontier(args)
+    configure_metrics(args, sidecar_path(combined_output, "report", ".json") if combined_output
+                      else DEFAULT_REPORT)
+    try:
+        print(f"GBP to INR rate: {fx_rate.get_gbp_to_inr_rate()}")
+    except fx_rate.FXRateError as e:
+        raise SystemExit(f"Error: {e}")
+
+    results = run_batch(jobs, combined_output, args.images, args.concurrency, args.parallel_jobs,
+                        args.resume, args.gzip, args.parse_workers)
+    for job in jobs:
+        result = results.get(job.name)
+        if isinstance(result, Exception):
+            print(f"{job.name}: failed ({result})")
+        else:
+            print(f"{job.name}: {result} products found" +
+                  ("" if combined_output else f", written to {job.output}"))
+    if combined_output:
+        print(f"All jobs written to {combined_output}")
@@ -0,0 +1,126 @@
+import argparse
+import csv
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from category_classifier import CATEGORY_RULES, CategoryClassifier, standardize_category
+
+DEFAULT_INPUT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "stone_group_products.csv")
+
+
+# The if-chain main.py used before category_classifier, kept as the baseline
+def legacy_standardize_category(text):
+    lower_text = text.lower()
+    if any(term in lower_text for term in ["radio access point", "access point","Campus","campus","Hardened","hardened"]):
+        return "Access Point"
+
+    if any(term in lower_text for term in ["network card", "network adapter card","full/low-profile","Full/Low-Profile","10/100/1000 nic network adapter","10/100/1000 NIC Network Adapter"]):
+        return "Adapter Card"
+
+    if any(term in lower_text for term in ["wireless router", "wifi router","Wi-Fi system","wi-fi system"]):
+        return "Wifi & Routers"
+
+    if any(term in lower_text for term in ["console server"]):
+        return "Console System"
+
+    if any(term in lower_text for term in ["gen 2","Gen 2","gen","environment monitoring device","environmental monitoring","Temperature & humidity sensor","temperature & humidity sensor","Remote management adapter","remote management adapter"]):
+        return "Monitoring device"
+
+    cable_terms = [
+        "category 6", "category 6a", "patch cable", "security cable lock",
+        "cat 6 riser cable", "6ft locking cable incl", "usb type-c to ethernet",
+        "network cable", "type-c to ethernet", "cat 5e riser cable",
+        "ethernet", "cable", "ethernet cable", "fibre", "fibre optic cable",
+        "1000Base-SX SC", "InfiniBand cable","ft","m/","m /",
+        "antistatic wrist strap", "anti-static wrist strap", "anti static wrist strap"]
+
+    if any(term in lower_text for term in cable_terms):
+        return "Cables and accessories"
+
+    if any(term in lower_text for term in ["lifetime warranty","software license","subscription licence","Subscription licence","Licence","licence"]):
+        return "Software License"
+
+    if any(term in lower_text for term in ["v1","V1","v3","V3","switch","switches"]):
+        return "Switch"
+
+    if any(term in lower_text for term in ["windows 10","Windows 10","windows server","Windows Server"]):
+        return "Print Server"
+
+    if any(term in lower_text for term in ["Essentials Edition","essentials edition","Repeater","repeater"]):
+        return "Wifi range extender"
+
+    if any(term in lower_text for term in ["V2", "Dual Band AC600 Wireless Dongle", "dual band ac600 wireless dongle", "Quad Port Adapter", "ST1000SPEX43", "1T1R 802.11ac", "wifi adapter","WiFi Adapter","WiFi Card"]):
+        return "Network Adapter"
+
+    if any(term in lower_text for term in ["usb", "USB", "Usb", "Host", "bus adapter","Host bus adapter" ,"host bus adapter"]):
+        return "USB Hub"
+
+    if any(term in lower_text for term in ["8 Port","8 port"]):
+        return "Serial Adapter"
+
+    if any(term in lower_text for term in ["sfp", "mini-gbic", "transceiver module", "gbic", "optical module", "sfp+", "xfp", "qsfp", "fiber optic transceiver"]):
+        return "SFP transceiver module"
+
+    if any(term in lower_text for term in ["sfp", "mini-gbic", "transceiver module", "gbic", "optical module"]):
+        return "SFP transceiver module"
+
+    return text
+
+# Category strings from a catalog export: the last segment of Categories
+# plus product names, which exercise the rules with longer text
+def load_texts(path):
+    texts = []
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            category = (row.get("Categories") or "").split(">")[-1].strip()
+            for text in (category, row.get("Name") or ""):
+                if text:
+                    texts.append(text)
+    return texts
+
+
+def timed(func, texts):
+    start = time.perf_counter()
+    for text in texts:
+        func(text)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the category if-chain with the compiled classifier")
+    parser.add_argument("--input", default=DEFAULT_INPUT, help="catalog CSV to take category strings from")
+    parser.add_argument("--rows", type=int, default=200000, help="size of the simulated export")
+    args = parser.parse_args()
+
+    texts = load_texts(args.input)
+    if not texts:
+        sys.exit(f"No category strings found in {args.input}")
+    classifier = CategoryClassifier(CATEGORY_RULES)
+
+    # Lowercasing the rules on purpose revives mixed-case terms the old
+    # chain could never match; list every string whose result moved
+    for text in sorted(set(texts)):
+        before, after = legacy_standardize_category(text), classifier.classify(text)
+        if before != after:
+            print(f"changed: {text!r}: {before!r} -> {after!r}")
+
+    # A large export repeats the same strings; the distinct variant defeats the cache
+    export = [texts[i % len(texts)] for i in range(args.rows)]
+    distinct = [f"{text} {i}" for i, text in enumerate(export)]
+
+    legacy = timed(legacy_standardize_category, export)
+    compiled = timed(classifier.classify, export)
+    standardize_category.cache_clear()
+    memoized = timed(standardize_category, export)
+    unique = timed(classifier.classify, distinct)
+
+    print(f"{args.rows} rows, {len(set(texts))} distinct strings from {args.input}")
+    for label, seconds in (("legacy if-chain", legacy), ("compiled regex", compiled),
+                           ("compiled + lru_cache", memoized), ("compiled, all distinct", unique)):
+        print(f"{label:24}: {args.rows / seconds:12.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import http_client
+
+PAGE = b"<html><body>" + b"<div class='product-item-info'>x</div>" * 400 + b"</body></html>"
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run(fetch, urls, workers):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for response in executor.map(fetch, urls):
+            response.content
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare bare requests.get with the pooled http_client")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=http_client.MAX_WORKERS)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    urls = [f"http://127.0.0.1:{server.server_port}/p{i}" for i in range(args.requests)]
+
+    bare = run(requests.get, urls, args.workers)
+    pooled = run(http_client.get, urls, args.workers)
+    server.shutdown()
+
+    print(f"bare requests.get : {args.requests / bare:8.1f} req/s ({bare:.2f}s)")
+    print(f"pooled http_client: {args.requests / pooled:8.1f} req/s ({pooled:.2f}s)")
+    print(f"speedup           : {bare / pooled:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from main import parse_product_fields
+
+FIXTURE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def parse_fixture(item):
+    url, content = item
+    return parse_product_fields(content, url)
+
+
+def timed(executor, pages):
+    start = time.perf_counter()
+    fields = list(executor.map(parse_fixture, pages, chunksize=1))
+    return time.perf_counter() - start, fields
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare parsing product pages on threads and in processes")
+    parser.add_argument("--pages", type=int, default=2000, help="fixture pages parsed per run")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count()])
+    parser.add_argument("--fixtures", default=FIXTURE_DIRECTORY)
+    args = parser.parse_args()
+
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(args.fixtures, "*.html"))):
+        with open(path, "rb") as f:
+            fixtures.append((f"https://www.stonegroup.co.uk/{os.path.basename(path)}", f.read()))
+    if not fixtures:
+        sys.exit(f"No fixtures found in {args.fixtures}")
+    pages = [fixtures[i % len(fixtures)] for i in range(args.pages)]
+
+    print(f"{args.pages} pages from {len(fixtures)} fixtures, {os.cpu_count()} CPUs")
+    for workers in sorted(set(args.workers)):
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            thread_time, thread_fields = timed(executor, pages)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Start the workers before timing, as a long scrape would have
+            list(executor.map(parse_fixture, fixtures))
+            process_time, process_fields = timed(executor, pages)
+        if thread_fields != process_fields:
+            sys.exit("Threads and processes extracted different fields")
+        print(f"{workers:3d} workers: threads {args.pages / thread_time:7.0f} pages/s, "
+              f"processes {args.pages / process_time:7.0f} pages/s ({thread_time / process_time:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+import argparse
+import asyncio
+import contextlib
+import functools
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIRECTORY))
+
+STAGES = ("listing", "product_fetch", "parse", "image")
+PRODUCT_URL = re.compile(r"/product/\d+/")
+
+
+# Per-stage latencies collected by wrapping the pipeline's functions
+class StageTimer:
+    def __init__(self):
+        self.samples = {stage: [] for stage in STAGES}
+        self.lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self.lock:
+            self.samples[stage].append(seconds)
+
+    def wrap(self, stage, func, matches=None):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if matches is not None and not matches(*args):
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+        return wrapper
+
+    def wrap_async(self, stage, func, matches=None):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if matches is not None and not matches(*args):
+                return await func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+        return wrapper
+
+    def summary(self):
+        result = {}
+        for stage, samples in self.samples.items():
+            samples = sorted(samples)
+            if samples:
+                result[stage] = {
+                    "count": len(samples),
+                    "p50": samples[len(samples) // 2],
+                    "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+                }
+        return result
+
+
+def instrument(timer, engine):
+    import http_client
+    import main
+
+    if engine == "threads":
+        main.fetch_product_links = timer.wrap("listing", main.fetch_product_links)
+        http_client.get = timer.wrap("product_fetch", http_client.get, lambda url, *_: PRODUCT_URL.search(url))
+        main.ThreadedPipeline.parse_product_page = timer.wrap("parse", main.ThreadedPipeline.parse_product_page)
+        main.download_image = timer.wrap("image", main.download_image)
+    else:
+        from async_engine import AsyncScraper
+        AsyncScraper.fetch_listing_page = timer.wrap_async("listing", AsyncScraper.fetch_listing_page)
+        AsyncScraper.fetch = timer.wrap_async(
+            "product_fetch", AsyncScraper.fetch, lambda self, url, *_: PRODUCT_URL.search(url))
+        AsyncScraper.parse_page = timer.wrap_async("parse", AsyncScraper.parse_page)
+        AsyncScraper.download_image = timer.wrap_async("image", AsyncScraper.download_image)
+
+
+def peak_rss_mb():
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return own / scale, children / scale
+
+
+# One configuration, run in a fresh process so peak RSS belongs to it alone
+def run_child(args):
+    import fx_rate
+    import image_store
+    import main
+    import url_frontier
+    from checkpoint import CheckpointJournal
+    from output_writer import ProductWriter
+
+    fx_rate.configure(rate=100.0)
+    timer = StageTimer()
+    instrument(timer, args.engine)
+    base_url = f"{args.server}/catalog-{args.size}/"
+    end_page = args.size // 24 + 2
+
+    with tempfile.TemporaryDirectory() as work_directory:
+        image_directory = os.path.join(work_directory, "images")
+        os.makedirs(image_directory)
+        image_store.configure(os.path.join(work_directory, "store"))
+        url_frontier.configure(os.path.join(work_directory, "frontier"))
+        journal = CheckpointJournal(os.path.join(work_directory, "journal.jsonl"), resume=False)
+        writer = ProductWriter(os.path.join(work_directory, "products.csv"))
+        start = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            if args.engine == "async":
+                from async_engine import scrape_async
+                asyncio.run(scrape_async(1, end_page, base_url, "", image_directory, journal, writer,
+                                         concurrency=args.concurrency, parse_workers=args.parse_workers))
+            else:
+                main.scrape_threaded(1, end_page, base_url, "", image_directory, journal, writer,
+                                     args.concurrency, parse_workers=args.parse_workers)
+        elapsed = time.perf_counter() - start
+        writer.close()
+        journal.close()
+
+    rss, children_rss = peak_rss_mb()
+    print(json.dumps({
+        "products": writer.rows_written,
+        "seconds": elapsed,
+        "products_per_second": writer.rows_written / elapsed,
+        "stages": timer.summary(),
+        "peak_rss_mb": rss,
+        "peak_child_rss_mb": children_rss,
+    }))
+
+
+def start_fixture_server(latency, jitter, error_rate):
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(BENCHMARK_DIRECTORY, "fixture_server.py"), "--port", "0",
+         "--latency", str(latency), "--jitter", str(jitter), "--error-rate", str(error_rate)],
+        stdout=subprocess.PIPE, text=True,
+    )
+    banner = process.stdout.readline()
+    match = re.search(r"http://127\.0\.0\.1:\d+", banner)
+    if not match:
+        process.kill()
+        raise RuntimeError(f"fixture server did not start: {banner!r}")
+    return process, match.group()
+
+
+def server_call(server, path):
+    with urllib.request.urlopen(server + path) as response:
+        return json.load(response)
+
+
+def format_ms(stage):
+    if not stage:
+        return "      -/-     "
+    return f"{stage['p50'] * 1000:6.1f}/{stage['p95'] * 1000:<7.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the full scrape pipeline against a local fixture server")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500], help="catalog sizes to scrape")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[5, 10, 20])
+    parser.add_argument("--engines", nargs="+", choices=["threads", "async"], default=["threads"])
+    parser.add_argument("--parse-workers", type=int, default=None)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds the server adds to every response")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of responses that are 503s")
+    parser.add_argument("--json", default=None, help="also write every result to this file")
+    # Internal: run one configuration against --server and print its result
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--server", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--engine", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        args.concurrency = args.concurrency[0]
+        return run_child(args)
+
+    process, server = start_fixture_server(args.latency, args.jitter, args.error_rate)
+    results = []
+    try:
+        print(f"latency {args.latency}s +/- {args.jitter}s, error rate {args.error_rate}")
+        print(f"{'engine':8}{'size':>6}{'conc':>6}{'prod/s':>9}  "
+              + "".join(f"{stage + ' p50/p95 ms':>17}" for stage in STAGES)
+              + f"{'RSS MB':>9}{'child MB':>9}  requests")
+        for engine in args.engines:
+            for size in args.sizes:
+                for concurrency in args.concurrency:
+                    server_call(server, "/__reset")
+                    command = [sys.executable, os.path.abspath(__file__), "--child", "--server", server,
+                               "--size", str(size), "--engine", engine, "--concurrency", str(concurrency)]
+                    if args.parse_workers:
+                        command += ["--parse-workers", str(args.parse_workers)]
+                    output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+                    result = json.loads(output.strip().splitlines()[-1])
+                    result.update(engine=engine, size=size, concurrency=concurrency,
+                                  requests=server_call(server, "/__stats"))
+                    results.append(result)
+                    stages = result["stages"]
+                    print(f"{engine:8}{size:>6}{concurrency:>6}{result['products_per_second']:>9.1f}  "
+                          + "".join(f"{format_ms(stages.get(stage)):>17}" for stage in STAGES)
+                          + f"{result['peak_rss_mb']:>9.0f}{result['peak_child_rss_mb']:>9.0f}  "
+                          + " ".join(f"{kind}={count}" for kind, count in sorted(result["requests"].items())))
+    finally:
+        process.terminate()
+        process.wait()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
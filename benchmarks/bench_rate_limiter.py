@@ -0,0 +1,117 @@
+import argparse
+import collections
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import http_client
+
+PAGE = b"<html><body>" + b"<div class='product-item-info'>x</div>" * 400 + b"</body></html>"
+
+
+# Origin that tolerates `capacity` requests in flight and `rate` requests per
+# second; anything above either gets a 429 with Retry-After, like a CDN
+# rate limit would
+class ThrottlingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            now = time.monotonic()
+            server.window = [t for t in server.window if now - t < 1.0]
+            throttled = server.in_flight >= server.capacity or len(server.window) >= server.rate
+            if not throttled:
+                server.in_flight += 1
+                server.window.append(now)
+            server.stats[429 if throttled else 200] += 1
+
+        if throttled:
+            self.send_response(429)
+            if server.retry_after:
+                self.send_header("Retry-After", str(server.retry_after))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        try:
+            time.sleep(server.latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(PAGE)))
+            self.end_headers()
+            self.wfile.write(PAGE)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(capacity, rate, latency, retry_after):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ThrottlingHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.in_flight = 0
+    server.window = []
+    server.capacity = capacity
+    server.rate = rate
+    server.latency = latency
+    server.retry_after = retry_after
+    server.stats = collections.Counter()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(urls, workers):
+    statuses = collections.Counter()
+
+    def fetch(url):
+        try:
+            response = http_client.get(url, use_cache=False)
+            response.content
+            statuses[response.status_code] += 1
+        except Exception as e:
+            statuses[type(e).__name__] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(fetch, urls))
+    return time.perf_counter() - start, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch from a local origin that answers 429 when overloaded")
+    parser.add_argument("--requests", type=int, default=600)
+    parser.add_argument("--workers", type=int, default=40)
+    parser.add_argument("--capacity", type=int, default=8, help="requests in flight the origin accepts")
+    parser.add_argument("--origin-rate", type=int, default=200, help="requests per second the origin accepts")
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--rate", type=float, default=None, help="client-side requests per second per host")
+    args = parser.parse_args()
+    http_client.configure(max_connections_per_host=args.workers)
+
+    options = {"rate": args.rate} if args.rate else {}
+    for label, enabled in (("no scheduler", False), ("scheduler", True)):
+        http_client.configure_rate_limit(enabled, **options)
+        server = start_server(args.capacity, args.origin_rate, args.latency, args.retry_after)
+        urls = [f"http://127.0.0.1:{server.server_port}/p{i}" for i in range(args.requests)]
+        elapsed, statuses = run(urls, args.workers)
+        server.shutdown()
+        ok = statuses.get(200, 0)
+        print(f"{label:12}: {ok}/{args.requests} ok in {elapsed:.2f}s ({ok / elapsed:.0f} ok/s), "
+              f"client saw {dict(statuses)}, origin sent {server.stats[429]} 429s")
+        scheduler = http_client.get_scheduler()
+        if scheduler is not None:
+            for host, limiter in scheduler.hosts.items():
+                print(f"{'':12}  final concurrency limit for {host}: {limiter.concurrency.limit:.1f}")
+
+
+if __name__ == "__main__":
+    main()
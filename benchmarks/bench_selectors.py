@@ -0,0 +1,97 @@
+import argparse
+import glob
+import os
+import sys
+import time
+
+from lxml import html
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import product_selectors as selectors
+
+FIXTURE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# The string expressions extract_product_data used to pass to tree.xpath()
+# for every product, in the same order as the registry lookups below
+LEGACY_XPATHS = [
+    '//img[@class="gallery-placeholder__image"]/@src',
+    '//span[contains(text(), "SKU#:")]/text()',
+    '/html/body/div[4]/main/div[2]/div/div[1]/div[1]/div[2]/h1/span',
+    '/html/body/div[4]/main/div[2]/div/div[1]/div[1]/div[1]/div[1]/strong/text()',
+    '/html/body/div[4]/main/div[2]/div/div[1]/div[1]/div[3]/div[3]/span/span/span',
+    '/html/body/div[4]/main/div[2]/div/div[2]/div/div[2]/div/div[2]/div[1]/div',
+    '//ul[@class="short-overview"]/li/text()',
+    '/html/body/div[4]/main/div[2]/div/div[2]/div/div[2]/div/div[1]/ul/li[2]',
+    '//div[@class="manufacture-code"]/span/text()',
+    '//div[contains(concat(" ", normalize-space(@class), " "), " column-left ")]',
+    '//div[contains(concat(" ", normalize-space(@class), " "), " column-right ")]',
+]
+LEGACY_SPEC_ROW = './/div[contains(concat(" ", normalize-space(@class), " "), " specification-row ")]'
+
+
+def legacy_extract(tree):
+    results = [tree.xpath(expression) for expression in LEGACY_XPATHS]
+    rows = [row for column in results[-2:] for row in column[0].xpath(LEGACY_SPEC_ROW)]
+    return results, rows
+
+
+def registry_extract(tree):
+    main = selectors.product_anchor(tree)
+    results = [
+        selectors.PRODUCT_IMAGE(main, tree),
+        selectors.PRODUCT_SKU(main, tree),
+        selectors.PRODUCT_NAME(main),
+        selectors.PRODUCT_BRAND(main),
+        selectors.PRODUCT_PRICE(main),
+        selectors.PRODUCT_SHORT_DESCRIPTION(main),
+        selectors.PRODUCT_FEATURES(main, tree),
+        selectors.PRODUCT_CATEGORY(main),
+        selectors.PRODUCT_MANUFACTURE_CODE(main, tree),
+        selectors.SPEC_LEFT_COLUMN(main, tree),
+        selectors.SPEC_RIGHT_COLUMN(main, tree),
+    ]
+    rows = [row for column in results[-2:] for row in selectors.SPEC_ROW(column[0])]
+    return results, rows
+
+
+def timed(func, items, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for item in items:
+            func(item)
+    return (time.perf_counter() - start) / (rounds * len(items))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare string XPath lookups with the compiled selector registry")
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--fixtures", default=FIXTURE_DIRECTORY)
+    args = parser.parse_args()
+
+    pages = []
+    for path in sorted(glob.glob(os.path.join(args.fixtures, "*.html"))):
+        with open(path, "rb") as f:
+            pages.append(f.read())
+    if not pages:
+        sys.exit(f"No fixtures found in {args.fixtures}")
+    trees = [html.fromstring(page) for page in pages]
+
+    # Both ways must find the same nodes before their speed means anything
+    for tree in trees:
+        if legacy_extract(tree) != registry_extract(tree):
+            sys.exit("Registry selectors disagree with the legacy expressions")
+
+    parse = timed(html.fromstring, pages, args.rounds)
+    legacy = timed(legacy_extract, trees, args.rounds)
+    registry = timed(registry_extract, trees, args.rounds)
+
+    print(f"{len(pages)} fixtures, {args.rounds} rounds")
+    print(f"html.fromstring      : {parse * 1e6:8.1f} us/page")
+    print(f"string xpath extract : {legacy * 1e6:8.1f} us/page")
+    print(f"registry extract     : {registry * 1e6:8.1f} us/page")
+    print(f"extract speedup      : {legacy / registry:8.2f}x")
+    print(f"parse+extract speedup: {(parse + legacy) / (parse + registry):8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
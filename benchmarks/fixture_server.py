@@ -0,0 +1,151 @@
+import argparse
+import collections
+import glob
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+PRODUCTS_PER_PAGE = 24
+
+CATALOG_PATH = re.compile(r"^/catalog-(\d+)/")
+PRODUCT_PATH = re.compile(r"^/product/(\d+)/")
+IMAGE_PATH = re.compile(r"^/media/catalog/product/")
+PAGE_PARAMETER = re.compile(r"[?&]p=(\d+)")
+
+
+# Recorded product pages, made unique per product number so a catalog of
+# any size can be served from a handful of fixtures: the name, SKU,
+# manufacturer code and image path get the number appended
+class FixtureCatalog:
+    def __init__(self, directory=FIXTURE_DIRECTORY):
+        self.pages = []
+        for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+            with open(path, encoding="utf-8") as f:
+                self.pages.append(f.read())
+        if not self.pages:
+            raise FileNotFoundError(f"no product page fixtures in {directory}")
+        with open(os.path.join(directory, "product.jpg"), "rb") as f:
+            self.image = f.read()
+
+    def product_page(self, number):
+        page = self.pages[number % len(self.pages)]
+        page = re.sub(r'(itemprop="name">)([^<]*)', lambda m: f"{m.group(1)}{m.group(2)} #{number}", page, count=1)
+        page = re.sub(r"(SKU#: )([^<]*)", lambda m: f"{m.group(1)}{m.group(2)}-{number}", page, count=1)
+        page = re.sub(r"(Manufacture#: )([^<]*)", lambda m: f"{m.group(1)}{m.group(2)}-{number}", page, count=1)
+        page = re.sub(r'(/media/catalog/product/[^"]*?)\.jpg', lambda m: f"{m.group(1)}-{number}.jpg", page, count=1)
+        return page.encode("utf-8")
+
+    # Magento-style listing page; out-of-range pages repeat the last one
+    def listing_page(self, base_url, size, page):
+        last_page = max(1, -(-size // PRODUCTS_PER_PAGE))
+        page = min(max(page, 1), last_page)
+        first = (page - 1) * PRODUCTS_PER_PAGE
+        items = "".join(
+            f'<li class="item product product-item"><div class="product-item-info">'
+            f'<a class="product-item-photo" href="{base_url}/product/{i}/">photo</a>'
+            f'<div class="product details"><a class="product-item-link" href="{base_url}/product/{i}/">Product {i}</a>'
+            f"</div></div></li>"
+            for i in range(first, min(first + PRODUCTS_PER_PAGE, size))
+        )
+        return f'<html><body><ol class="products list items product-items">{items}</ol></body></html>'.encode("utf-8")
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def send_body(self, status, body, content_type="text/html; charset=UTF-8"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        path = self.path
+
+        if path == "/__stats":
+            with server.lock:
+                stats = dict(server.stats)
+            return self.send_body(200, json.dumps(stats).encode(), "application/json")
+        if path == "/__reset":
+            with server.lock:
+                server.stats.clear()
+            return self.send_body(200, b"{}", "application/json")
+
+        if CATALOG_PATH.match(path):
+            kind = "listing"
+        elif PRODUCT_PATH.match(path):
+            kind = "product"
+        elif IMAGE_PATH.match(path):
+            kind = "image"
+        else:
+            kind = "other"
+        with server.lock:
+            server.stats[kind] += 1
+
+        delay = server.latency + random.uniform(-server.jitter, server.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if kind != "other" and random.random() < server.error_rate:
+            with server.lock:
+                server.stats["errors"] += 1
+            return self.send_body(503, b"Service Unavailable", "text/plain")
+
+        base_url = f"http://{self.headers.get('Host')}"
+        if kind == "listing":
+            page = PAGE_PARAMETER.search(path)
+            size = int(CATALOG_PATH.match(path).group(1))
+            return self.send_body(200, server.catalog.listing_page(base_url, size, int(page.group(1)) if page else 1))
+        if kind == "product":
+            return self.send_body(200, server.catalog.product_page(int(PRODUCT_PATH.match(path).group(1))))
+        if kind == "image":
+            return self.send_body(200, server.catalog.image, "image/jpeg")
+        return self.send_body(404, b"Not Found", "text/plain")
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Local stand-in for www.stonegroup.co.uk. /catalog-<N>/?p=<page> lists a
+# catalog of N products, /product/<i>/ serves a recorded product page and
+# /media/catalog/product/... the recorded image. Every response is delayed
+# by `latency` +/- `jitter` seconds and fails with a 503 at `error_rate`.
+# /__stats returns request counts per kind, /__reset clears them.
+def make_server(port=0, latency=0.0, jitter=0.0, error_rate=0.0, directory=FIXTURE_DIRECTORY):
+    server = ThreadingHTTPServer(("127.0.0.1", port), FixtureHandler)
+    server.daemon_threads = True
+    server.catalog = FixtureCatalog(directory)
+    server.latency = latency
+    server.jitter = jitter
+    server.error_rate = error_rate
+    server.stats = collections.Counter()
+    server.lock = threading.Lock()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve recorded Stone Group pages for offline benchmarks")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random +/- seconds on top of --latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--fixtures", default=FIXTURE_DIRECTORY)
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.latency, args.jitter, args.error_rate, args.fixtures)
+    print(f"Serving on http://127.0.0.1:{server.server_port}/catalog-100/", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
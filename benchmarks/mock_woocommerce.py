@@ -0,0 +1,206 @@
+import argparse
+import base64
+import collections
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+API_PATH = "/wp-json/wc/v3/"
+MAX_BATCH_SIZE = 100
+
+
+# In-memory shop behind the handful of WooCommerce REST endpoints the
+# uploader uses: paginated GET of products, categories and tags, POST of
+# categories and tags, and POST products/batch with WooCommerce's
+# per-item errors (duplicate SKU, unknown id) and 100-operation limit
+class Shop:
+    def __init__(self):
+        self.products = {}
+        self.terms = {"products/categories": {}, "products/tags": {}}
+        self.next_id = 1
+        self.lock = threading.Lock()
+
+    def _new_id(self):
+        self.next_id += 1
+        return self.next_id - 1
+
+    def add_term(self, path, data):
+        with self.lock:
+            term = {"id": self._new_id(), "name": data["name"], "parent": data.get("parent", 0)}
+            self.terms[path][term["id"]] = term
+            return term
+
+    def _sku_taken(self, sku, product_id=None):
+        return sku and any(p["sku"] == sku and p["id"] != product_id for p in self.products.values())
+
+    def batch(self, body):
+        result = {"create": [], "update": []}
+        with self.lock:
+            for data in body.get("create") or ():
+                if self._sku_taken(data.get("sku")):
+                    result["create"].append({"id": 0, "error": {
+                        "code": "product_invalid_sku", "message": "Invalid or duplicated SKU.", "data": {"status": 400}}})
+                    continue
+                product = dict(data, id=self._new_id())
+                self.products[product["id"]] = product
+                result["create"].append(product)
+            for data in body.get("update") or ():
+                product = self.products.get(data.get("id"))
+                if product is None:
+                    result["update"].append({"id": data.get("id", 0), "error": {
+                        "code": "woocommerce_rest_product_invalid_id", "message": "Invalid ID.",
+                        "data": {"status": 400}}})
+                    continue
+                if self._sku_taken(data.get("sku"), product["id"]):
+                    result["update"].append({"id": product["id"], "error": {
+                        "code": "product_invalid_sku", "message": "Invalid or duplicated SKU.", "data": {"status": 400}}})
+                    continue
+                product.update(data)
+                result["update"].append(product)
+        return result
+
+
+class MockWooCommerceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    # Common checks; returns the API-relative path, or None once an error is sent.
+    # The request body is always read so an error keeps the connection usable.
+    def begin(self):
+        server = self.server
+        self.body = self.read_json() if self.command == "POST" else None
+        url = urlparse(self.path)
+        if url.path in ("/__stats", "/__reset"):
+            return url.path
+        if not url.path.startswith(API_PATH):
+            self.send_json(404, {"code": "rest_no_route", "message": "No route was found."})
+            return None
+        path = url.path[len(API_PATH):].rstrip("/")
+        with server.lock:
+            server.stats[f"{self.command} {path}"] += 1
+
+        expected = "Basic " + base64.b64encode(f"{server.key}:{server.secret}".encode()).decode()
+        if server.key and self.headers.get("Authorization") != expected:
+            self.send_json(401, {"code": "woocommerce_rest_cannot_view", "message": "Sorry, you cannot list resources."})
+            return None
+        delay = server.latency + random.uniform(-server.jitter, server.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if random.random() < server.error_rate:
+            with server.lock:
+                server.stats["errors"] += 1
+            self.send_json(503, {"code": "service_unavailable", "message": "Service Unavailable"})
+            return None
+        return path
+
+    def do_GET(self):
+        path = self.begin()
+        if path is None:
+            return
+        server = self.server
+        if path == "/__stats":
+            with server.lock:
+                stats = dict(server.stats, products=len(server.shop.products))
+            return self.send_json(200, stats)
+        if path == "/__reset":
+            with server.lock:
+                server.stats.clear()
+            return self.send_json(200, {})
+
+        query = parse_qs(urlparse(self.path).query)
+        per_page = int(query.get("per_page", ["10"])[0])
+        page = int(query.get("page", ["1"])[0])
+        if per_page > 100:
+            return self.send_json(400, {"code": "rest_invalid_param", "message": "per_page must be at most 100"})
+        with server.shop.lock:
+            if path == "products":
+                items = list(server.shop.products.values())
+                if "sku" in query:
+                    skus = set(query["sku"][0].split(","))
+                    items = [item for item in items if item["sku"] in skus]
+            elif path in server.shop.terms:
+                items = list(server.shop.terms[path].values())
+            else:
+                return self.send_json(404, {"code": "rest_no_route", "message": "No route was found."})
+        if "_fields" in query:
+            fields = query["_fields"][0].split(",")
+            items = [{field: item[field] for field in fields if field in item} for item in items]
+        total_pages = max(1, -(-len(items) // per_page))
+        self.send_json(200, items[(page - 1) * per_page:page * per_page],
+                       {"X-WP-Total": str(len(items)), "X-WP-TotalPages": str(total_pages)})
+
+    def do_POST(self):
+        path = self.begin()
+        if path is None:
+            return
+        body = self.body
+        if path == "products/batch":
+            operations = sum(len(body.get(kind) or ()) for kind in ("create", "update", "delete"))
+            if operations > MAX_BATCH_SIZE:
+                return self.send_json(413, {"code": "woocommerce_rest_request_entity_too_large",
+                                            "message": f"Unable to accept more than {MAX_BATCH_SIZE} items"})
+            return self.send_json(200, self.server.shop.batch(body))
+        if path in self.server.shop.terms:
+            return self.send_json(201, self.server.shop.add_term(path, body))
+        self.send_json(404, {"code": "rest_no_route", "message": "No route was found."})
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Local stand-in for a WooCommerce shop's REST API. Requests need HTTP
+# basic auth with `key`/`secret` when a key is set, are delayed by
+# `latency` +/- `jitter` seconds and fail with a 503 at `error_rate`.
+# /__stats returns request counts and the number of products stored.
+def make_server(port=0, key="ck_test", secret="cs_test", latency=0.0, jitter=0.0, error_rate=0.0):
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockWooCommerceHandler)
+    server.daemon_threads = True
+    server.shop = Shop()
+    server.key = key
+    server.secret = secret
+    server.latency = latency
+    server.jitter = jitter
+    server.error_rate = error_rate
+    server.stats = collections.Counter()
+    server.lock = threading.Lock()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve an in-memory WooCommerce REST API for upload tests")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--key", default="ck_test")
+    parser.add_argument("--secret", default="cs_test")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random +/- seconds on top of --latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.key, args.secret, args.latency, args.jitter, args.error_rate)
+    print(f"WooCommerce mock on http://127.0.0.1:{server.server_port} (key {args.key}, secret {args.secret})",
+          flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import argparse
+import sys
+
+from main import render_description
+from output_writer import COLUMNAR_FORMATS, ProductWriter, output_format, read_products
+
+
+# Render a Parquet or Arrow catalog as CSV or JSON lines for the WooCommerce
+# importer, rebuilding each Description from its stored template values
+def export_catalog(source, destination, compress=False):
+    if output_format(source) not in COLUMNAR_FORMATS:
+        raise ValueError(f"{source} is not a Parquet or Arrow catalog")
+    with ProductWriter(destination, compress=compress) as writer:
+        for row in read_products(source):
+            row['Description'] = render_description(row)
+            writer.write(row)
+    return writer
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Render a Parquet or Arrow product catalog as a WooCommerce CSV")
+    parser.add_argument("source", help="catalog written with --output <name>.parquet or <name>.arrow")
+    parser.add_argument("destination", help="output file; .jsonl writes JSON lines, a .gz suffix compresses")
+    parser.add_argument("--gzip", action="store_true", help="gzip the output file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        writer = export_catalog(args.source, args.destination, args.gzip)
+    except (ValueError, RuntimeError) as e:
+        sys.exit(f"Error: {e}")
+    print(f"{writer.rows_written} products written to {writer.path}")
@@ -0,0 +1,107 @@
+import re
+from functools import lru_cache
+
+# (category, terms) in priority order: the first rule with any term found
+# anywhere in the text wins. Terms are case-insensitive substrings.
+CATEGORY_RULES = [
+    ("Access Point", ["radio access point", "access point", "campus", "hardened"]),
+    ("Adapter Card", ["network card", "network adapter card", "full/low-profile", "10/100/1000 nic network adapter"]),
+    ("Wifi & Routers", ["wireless router", "wifi router", "wi-fi system"]),
+    ("Console System", ["console server"]),
+    ("Monitoring device", [
+        "gen 2", "gen", "environment monitoring device", "environmental monitoring",
+        "temperature & humidity sensor", "remote management adapter"]),
+    ("Cables and accessories", [
+        "category 6", "category 6a", "patch cable", "security cable lock",
+        "cat 6 riser cable", "6ft locking cable incl", "usb type-c to ethernet",
+        "network cable", "type-c to ethernet", "cat 5e riser cable",
+        "ethernet", "cable", "ethernet cable", "fibre", "fibre optic cable",
+        "1000base-sx sc", "infiniband cable", "ft", "m/", "m /",
+        "antistatic wrist strap", "anti-static wrist strap", "anti static wrist strap"]),
+    ("Software License", ["lifetime warranty", "software license", "subscription licence", "licence"]),
+    ("Switch", ["v1", "v3", "switch", "switches"]),
+    ("Print Server", ["windows 10", "windows server"]),
+    ("Wifi range extender", ["essentials edition", "repeater"]),
+    ("Network Adapter", [
+        "v2", "dual band ac600 wireless dongle", "quad port adapter", "st1000spex43",
+        "1t1r 802.11ac", "wifi adapter", "wifi card"]),
+    ("USB Hub", ["usb", "host", "bus adapter", "host bus adapter"]),
+    ("Serial Adapter", ["8 port"]),
+    ("SFP transceiver module", [
+        "sfp", "mini-gbic", "transceiver module", "gbic", "optical module",
+        "sfp+", "xfp", "qsfp", "fiber optic transceiver"]),
+]
+
+
+# Regex matching any of `terms`, with common prefixes merged into a trie
+# so each position costs one character test instead of one per term
+def _trie_pattern(terms):
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and "" not in node:
+            return branches[0]
+        return f"(?:{'|'.join(branches)}){'?' if '' in node else ''}"
+
+    return build(trie)
+
+
+# The rules compile into two regexes. `finder` is a trie of every term and
+# only locates where some term starts; `pattern` has one named group per
+# rule in priority order, so matching it at such a position names the best
+# rule starting there. The best rule over all positions wins. A term listed
+# under two rules only counts for the first one.
+class CategoryClassifier:
+    def __init__(self, rules):
+        self.categories = []
+        alternatives = []
+        seen_terms = set()
+        for category, terms in rules:
+            terms = [term.lower() for term in terms]
+            terms = [term for term in dict.fromkeys(terms) if term not in seen_terms]
+            seen_terms.update(terms)
+            if not terms:
+                continue
+            group = f"r{len(self.categories)}"
+            self.categories.append(category)
+            pattern = "|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True))
+            alternatives.append(f"(?P<{group}>{pattern})")
+        self.finder = re.compile(_trie_pattern(seen_terms))
+        self.pattern = re.compile("|".join(alternatives))
+
+    # Index of the winning rule, or None
+    def match(self, text):
+        text = text.lower()
+        best = None
+        found = self.finder.search(text)
+        while found is not None:
+            index = int(self.pattern.match(text, found.start()).lastgroup[1:])
+            if best is None or index < best:
+                best = index
+                if best == 0:
+                    break
+            found = self.finder.search(text, found.start() + 1)
+        return best
+
+    # The standard category for `text`, or `text` itself when no rule matches
+    def classify(self, text):
+        index = self.match(text)
+        return text if index is None else self.categories[index]
+
+
+_classifier = CategoryClassifier(CATEGORY_RULES)
+
+
+# Catalog exports repeat a few hundred category strings, so each distinct
+# one is classified once
+@lru_cache(maxsize=4096)
+def standardize_category(text):
+    return _classifier.classify(text)
@@ -0,0 +1,40 @@
+import re
+from html import escape
+
+
+# A text template with {NAME} slots, split once into static chunks and slot
+# names so rendering is a single join. Only the names listed in `slots` are
+# slots; other braces (the Gutenberg block comments are full of JSON) are
+# left alone. Values are HTML-escaped unless their slot is listed in `raw`.
+# A slot rendered with None keeps its {NAME} placeholder so it can be
+# filled in later, as the image is once it has been downloaded.
+class DescriptionTemplate:
+    def __init__(self, text, slots, raw=()):
+        self.slots = tuple(slots)
+        self.raw = frozenset(raw)
+        pattern = re.compile("|".join(re.escape("{" + slot + "}") for slot in self.slots))
+        # parts alternates static text and slot names: text, slot, text, ..., text
+        self.parts = []
+        position = 0
+        for found in pattern.finditer(text):
+            self.parts.append(text[position:found.start()])
+            self.parts.append(found.group()[1:-1])
+            position = found.end()
+        self.parts.append(text[position:])
+
+    def render(self, values):
+        output = self.parts[:]
+        for i in range(1, len(output), 2):
+            slot = output[i]
+            value = values.get(slot)
+            if value is None:
+                output[i] = "{" + slot + "}"
+            elif slot in self.raw:
+                output[i] = str(value)
+            else:
+                output[i] = escape(str(value))
+        return "".join(output)
+
+    # Fill a slot left as a placeholder by render()
+    def fill(self, rendered, slot, value):
+        return rendered.replace("{" + slot + "}", str(value) if slot in self.raw else escape(str(value)))
@@ -0,0 +1,253 @@
+import argparse
+import collections
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TimeElapsedColumn
+
+import fx_rate
+import http_client
+import metrics
+import work_queue
+from main import (
+    ThreadedPipeline, add_fetch_arguments, add_logging_arguments, add_metrics_arguments, apply_image,
+    check_metrics_arguments, configure_fetching, configure_logging, configure_metrics, download_image,
+    iter_product_urls,
+)
+from output_writer import ProductWriter, sidecar_path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IMAGE_DIRECTORY = "product_images"
+# Most URLs a worker holds leases on; once half of them are done it claims
+# enough to get back to this many, so the pipeline doesn't drain between claims
+DEFAULT_CLAIM_SIZE = 20
+# Discovered URLs are queued this many at a time
+ADD_BATCH_SIZE = 100
+POLL_INTERVAL = 2.0
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+# Discover the listing's product URLs into `queue`, then write every row
+# the workers commit to `output_path` until the queue is drained. The
+# queue keeps everything, so a coordinator restarted against the same
+# queue re-adds nothing and writes the full catalog again.
+def run_coordinator(queue, start_page, end_page, base_url, brand_id, output_path, compress=False,
+                    poll_interval=POLL_INTERVAL):
+    with Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        TextColumn("{task.completed}/{task.total}"),
+        TimeElapsedColumn()
+    ) as progress:
+        task = progress.add_task("[cyan]Queueing product URLs...", total=None)
+        found = added = 0
+        batch = []
+        for url in iter_product_urls(start_page, end_page, base_url, brand_id):
+            batch.append(url)
+            found += 1
+            if len(batch) >= ADD_BATCH_SIZE:
+                added += queue.add(batch)
+                batch = []
+                progress.update(task, completed=found)
+        added += queue.add(batch)
+        queue.close_discovery()
+        logger.info("Queued %d new of %d product URLs", added, found)
+
+        progress.update(task, description="[cyan]Waiting for workers...")
+        writer = ProductWriter(output_path, compress=compress)
+        after = 0
+        try:
+            while True:
+                # Checked before reading rows, so rows committed meanwhile are still read
+                finished = queue.finished()
+                rows = queue.rows(after)
+                for seq, row in rows:
+                    writer.write(row)
+                    after = seq
+                counts = queue.counts()
+                progress.update(task, completed=counts["done"] + counts["failed"],
+                                total=counts["pending"] + counts["leased"] + counts["done"] + counts["failed"])
+                if finished and not rows:
+                    break
+                if not rows:
+                    time.sleep(poll_interval)
+        finally:
+            writer.close()
+    return writer, counts
+
+
+# Fetch, parse and (for new products) download the image of one claimed
+# URL, then commit its row. Returns "written", "duplicate" or "failed".
+def process_claimed_url(pipeline, queue, worker_id, url, image_directory):
+    try:
+        with metrics.STAGE_SECONDS.time(stage="product_fetch"):
+            response = http_client.get(url)
+            response.raise_for_status()
+            metrics.RESPONSE_BYTES.observe(len(response.content), kind="product")
+        row = pipeline.parse_product_page(response.content, url)
+        # A product another worker already committed needs no image
+        if 'image_url' in row and not queue.has_product(row['Product Code']):
+            apply_image(row, download_image(row['image_url'], row['Product Code'], image_directory,
+                                            pipeline.resize_executor))
+        with metrics.STAGE_SECONDS.time(stage="write"):
+            stored = queue.commit(url, worker_id, row)
+    except Exception as e:
+        logger.error("Error scraping %s: %s", url, e, extra={'url': url})
+        try:
+            queue.fail(url, worker_id, e)
+        except Exception as fail_error:
+            # The lease lapses and another claim retries the URL
+            logger.error("Recording the failure of %s failed: %s", url, fail_error, extra={'url': url})
+        metrics.PRODUCTS.inc(result="failed")
+        return "failed"
+    result = "written" if stored else "duplicate"
+    metrics.PRODUCTS.inc(result=result)
+    logger.debug("%s: %s", result.capitalize(), row['Name'], extra={'url': url, 'product_code': row['Product Code']})
+    return result
+
+
+# Claim URLs from `queue` and scrape them until it is drained. Leases are
+# renewed every third of `lease` seconds while their URLs are in flight;
+# if this process dies they lapse and other workers pick the URLs up.
+# With `exit_when_idle` off the worker keeps polling for new work.
+def run_worker(queue, worker_id=None, image_directory=DEFAULT_IMAGE_DIRECTORY, claim_size=DEFAULT_CLAIM_SIZE,
+               lease=work_queue.DEFAULT_LEASE, concurrency=None, parse_workers=None, exit_when_idle=True,
+               poll_interval=POLL_INTERVAL):
+    worker_id = worker_id or default_worker_id()
+    os.makedirs(image_directory, exist_ok=True)
+    if concurrency:
+        http_client.configure(max_connections_per_host=concurrency)
+    results = collections.Counter()
+    held = set()
+    held_lock = threading.Lock()
+    stop = threading.Event()
+
+    def renew_leases():
+        while not stop.wait(lease / 3):
+            with held_lock:
+                urls = list(held)
+            try:
+                queue.renew(worker_id, urls, lease)
+            except Exception as e:
+                logger.warning("Renewing %d leases failed: %s", len(urls), e)
+
+    heartbeat = threading.Thread(target=renew_leases, name="lease-heartbeat", daemon=True)
+    heartbeat.start()
+    in_flight = {}
+    try:
+        with ThreadedPipeline(concurrency, parse_workers) as pipeline:
+            try:
+                while True:
+                    if len(in_flight) <= claim_size // 2:
+                        urls = queue.claim(worker_id, claim_size - len(in_flight), lease)
+                        with held_lock:
+                            held.update(urls)
+                        for url in urls:
+                            future = pipeline.executor.submit(
+                                process_claimed_url, pipeline, queue, worker_id, url, image_directory)
+                            in_flight[future] = url
+                    if not in_flight:
+                        if exit_when_idle and queue.finished():
+                            break
+                        time.sleep(poll_interval)
+                        continue
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        url = in_flight.pop(future)
+                        with held_lock:
+                            held.discard(url)
+                        results[future.result()] += 1
+            finally:
+                # URLs not started yet go straight back; running ones finish
+                # while the pipeline shuts down
+                not_started = [url for future, url in in_flight.items() if future.cancel()]
+                if not_started:
+                    queue.release(worker_id, not_started)
+    finally:
+        stop.set()
+    return results
+
+
+def add_queue_argument(parser):
+    parser.add_argument("queue", help="shared queue: a SQLite file on a shared disk (crawl.db, "
+                                      "sqlite:////mnt/shared/crawl.db) or redis://host:6379/0[#prefix]")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape a Stone Group listing with several worker machines")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    coordinator = commands.add_parser("coordinator", help="discover product URLs and collect the results")
+    add_queue_argument(coordinator)
+    coordinator.add_argument("--base-url", required=True, help="category URL to scrape")
+    coordinator.add_argument("--brand-id", default="", help="brand filter for the category")
+    coordinator.add_argument("--start-page", type=int, default=1)
+    coordinator.add_argument("--end-page", type=int, default=1)
+    coordinator.add_argument("--output", default="stone_group_products.csv",
+                             help="output file; .jsonl, .parquet and .arrow pick those formats")
+    coordinator.add_argument("--gzip", action="store_true", help="gzip the output file")
+    coordinator.set_defaults(parse_workers=None)
+
+    worker = commands.add_parser("worker", help="scrape product URLs claimed from the queue")
+    add_queue_argument(worker)
+    worker.add_argument("--worker-id", default=None, help="name in the queue's leases (default: host-pid)")
+    worker.add_argument("--images", default=DEFAULT_IMAGE_DIRECTORY, help="image directory")
+    worker.add_argument("--claim-size", type=int, default=DEFAULT_CLAIM_SIZE, help="most URLs leased at a time")
+    worker.add_argument("--lease", type=float, default=work_queue.DEFAULT_LEASE,
+                        help="seconds before an unrenewed claim is handed to another worker")
+    worker.add_argument("--max-attempts", type=int, default=work_queue.DEFAULT_MAX_ATTEMPTS,
+                        help="claims of one URL before it is marked failed")
+    worker.add_argument("--keep-polling", action="store_true", help="wait for more work once the queue is empty")
+    worker.add_argument("--concurrency", type=int, default=None, help="product worker threads")
+    worker.add_argument("--parse-workers", type=int, default=None,
+                        help="parse product pages in this many processes instead of on the fetching threads")
+    add_fetch_arguments(worker)
+
+    for command in (coordinator, worker):
+        add_metrics_arguments(command)
+        add_logging_arguments(command)
+    args = parser.parse_args()
+    check_metrics_arguments(parser, args)
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    configure_logging(args)
+    try:
+        queue = work_queue.open_queue(args.queue, getattr(args, "max_attempts", work_queue.DEFAULT_MAX_ATTEMPTS))
+    except work_queue.WorkQueueError as e:
+        raise SystemExit(f"Error: {e}")
+
+    try:
+        if args.command == "coordinator":
+            configure_metrics(args, sidecar_path(args.output, "report", ".json"))
+            writer, counts = run_coordinator(queue, args.start_page, args.end_page, args.base_url, args.brand_id,
+                                             args.output, args.gzip)
+            print(f"{writer.rows_written} products written to {writer.path}; {counts['done']} URLs done, "
+                  f"{counts['failed']} failed")
+            for url, error in sorted(queue.failed().items()):
+                print(f"Failed: {url}: {error}")
+        else:
+            worker_id = args.worker_id or default_worker_id()
+            configure_fetching(args)
+            configure_metrics(args, f"{worker_id}.report.json")
+            try:
+                print(f"GBP to INR rate: {fx_rate.get_gbp_to_inr_rate()}")
+            except fx_rate.FXRateError as e:
+                raise SystemExit(f"Error: {e}")
+            results = run_worker(queue, worker_id, args.images, args.claim_size, args.lease, args.concurrency,
+                                 args.parse_workers, exit_when_idle=not args.keep_polling)
+            print(f"{worker_id}: {results['written']} products written, {results['duplicate']} duplicates, "
+                  f"{results['failed']} failed")
+    finally:
+        queue.close()
@@ -0,0 +1,117 @@
+import json
+import logging
+import os
+import threading
+import time
+
+import requests
+
+import http_client
+
+logger = logging.getLogger(__name__)
+
+FX_API_URL = "https://open.er-api.com/v6/latest/GBP"
+
+# Environment variable that pins the rate and skips the API entirely
+FX_RATE_ENV = "GBP_TO_INR_RATE"
+
+# The fetched rate is kept on disk and reused for FX_CACHE_TTL seconds
+FX_CACHE_PATH = os.path.join(".cache", "fx_rate.json")
+FX_CACHE_TTL = 12 * 3600
+
+_rate = None
+_override = None
+_lock = threading.Lock()
+
+
+class FXRateError(RuntimeError):
+    pass
+
+
+# Pin the rate, or change where and for how long the fetched rate is cached.
+# Takes effect on the next get_gbp_to_inr_rate() call.
+def configure(rate=None, cache_path=None, ttl=None):
+    global _rate, _override, FX_CACHE_PATH, FX_CACHE_TTL
+    with _lock:
+        if rate is not None:
+            if rate <= 0:
+                raise ValueError(f"FX rate must be positive, got {rate}")
+            _override = float(rate)
+        if cache_path is not None:
+            FX_CACHE_PATH = cache_path
+        if ttl is not None:
+            FX_CACHE_TTL = ttl
+        _rate = None
+
+
+def _read_cache():
+    try:
+        with open(FX_CACHE_PATH, encoding="utf-8") as f:
+            cached = json.load(f)
+        return float(cached["rate"]), float(cached["fetched_at"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _write_cache(rate):
+    directory = os.path.dirname(FX_CACHE_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = FX_CACHE_PATH + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump({"rate": rate, "fetched_at": time.time(), "source": FX_API_URL}, f)
+    os.replace(temp_path, FX_CACHE_PATH)
+
+
+def _fetch_rate():
+    response = http_client.get(FX_API_URL, use_cache=False)
+    response.raise_for_status()
+    rate = float(response.json()["rates"]["INR"])
+    if rate <= 0:
+        raise ValueError(f"API returned a non-positive rate: {rate}")
+    return rate
+
+
+def _resolve_rate():
+    if _override is not None:
+        return _override
+    environment_rate = os.environ.get(FX_RATE_ENV)
+    if environment_rate:
+        try:
+            rate = float(environment_rate)
+        except ValueError:
+            raise FXRateError(f"{FX_RATE_ENV}={environment_rate!r} is not a number")
+        if rate <= 0:
+            raise FXRateError(f"{FX_RATE_ENV} must be positive, got {rate}")
+        return rate
+
+    cached = _read_cache()
+    if cached and time.time() - cached[1] < FX_CACHE_TTL:
+        return cached[0]
+    try:
+        rate = _fetch_rate()
+    except (requests.RequestException, ValueError, KeyError, TypeError) as e:
+        # An expired rate is still far better than a made-up one
+        if cached:
+            age_hours = (time.time() - cached[1]) / 3600
+            logger.warning("Error fetching GBP to INR rate (%s); using the cached rate from %.1f hours ago",
+                           e, age_hours)
+            return cached[0]
+        raise FXRateError(
+            f"Could not fetch the GBP to INR rate from {FX_API_URL}: {e}. "
+            f"Set {FX_RATE_ENV} or pass --fx-rate to set it by hand."
+        ) from e
+    _write_cache(rate)
+    return rate
+
+
+# GBP to INR rate, resolved on first use: an explicit override, then the
+# GBP_TO_INR_RATE environment variable, then the disk cache, then the API.
+# Raises FXRateError rather than guessing when none of them has a rate.
+def get_gbp_to_inr_rate():
+    global _rate
+    if _rate is None:
+        with _lock:
+            if _rate is None:
+                _rate = _resolve_rate()
+    return _rate
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Seconds a stored response is served without asking the origin. With 0
+# every hit is revalidated with If-None-Match / If-Modified-Since.
+DEFAULT_TTL = 0
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+# Response headers kept with the body so a cached response looks like the original
+STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+def _compress(body):
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(body)
+    return "zlib", zlib.compress(body, 6)
+
+
+def _decompress(codec, data):
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("cache entry is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def _write_atomic(path, data):
+    temp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+# Disk-backed HTTP cache keyed by URL. Each entry is a compressed body file
+# plus a small JSON metadata file holding the validators. Entries are evicted
+# least-recently-used first once the bodies exceed `max_bytes`.
+class HTTPCache:
+    def __init__(self, directory, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.total_bytes = sum(size for _, _, size in self._body_files())
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        subdirectory = os.path.join(self.directory, key[:2])
+        return os.path.join(subdirectory, key + ".json"), os.path.join(subdirectory, key + ".body")
+
+    def _body_files(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".body"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, stat.st_mtime, stat.st_size
+
+    # Metadata for `url`, or None when it isn't cached
+    def lookup(self, url):
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(body_path):
+            return None
+        return entry
+
+    def is_fresh(self, entry):
+        return self.ttl > 0 and time.time() - entry["stored_at"] < self.ttl
+
+    def validation_headers(self, entry):
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def read_body(self, url, entry):
+        _, body_path = self._paths(url)
+        with open(body_path, "rb") as f:
+            data = f.read()
+        # Touch the body so eviction sees it as recently used
+        os.utime(body_path)
+        return _decompress(entry["codec"], data)
+
+    def store(self, url, headers, body):
+        meta_path, body_path = self._paths(url)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        codec, data = _compress(body)
+        entry = {
+            "url": url,
+            "stored_at": time.time(),
+            "codec": codec,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "headers": {name: headers[name] for name in STORED_HEADERS if name in headers},
+        }
+        try:
+            previous_size = os.path.getsize(body_path)
+        except OSError:
+            previous_size = 0
+        _write_atomic(body_path, data)
+        _write_atomic(meta_path, json.dumps(entry).encode("utf-8"))
+        with self.lock:
+            self.total_bytes += len(data) - previous_size
+            over_limit = self.total_bytes > self.max_bytes
+        if over_limit:
+            self.evict()
+
+    # A 304 confirmed the entry is current: restart its TTL
+    def refresh(self, url, entry):
+        meta_path, _ = self._paths(url)
+        entry = dict(entry, stored_at=time.time())
+        _write_atomic(meta_path, json.dumps(entry).encode("utf-8"))
+
+    def evict(self):
+        with self.lock:
+            target = self.max_bytes * 0.9
+            files = sorted(self._body_files(), key=lambda item: item[1])
+            total = sum(size for _, _, size in files)
+            for body_path, _, size in files:
+                if total <= target:
+                    break
+                for path in (body_path, body_path[:-len(".body")] + ".json"):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                total -= size
+            self.total_bytes = total
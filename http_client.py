@@ -0,0 +1,186 @@
+import threading
+import zlib
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.request import ACCEPT_ENCODING
+
+import metrics
+from http_cache import HTTPCache
+from rate_limiter import RequestScheduler
+
+# Worker count of the product scraping pool; the connection pool is sized to match
+MAX_WORKERS = 10
+
+# Connection pool settings shared by every request made by the scraper
+POOL_HOSTS = 10
+MAX_CONNECTIONS_PER_HOST = MAX_WORKERS
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 30
+
+USER_AGENT = "Mozilla/5.0 (compatible; stone-group-scraper)"
+
+_session = None
+_session_lock = threading.Lock()
+_cache = None
+# Retries transient failures and adapts per-host concurrency; no fixed
+# request rate unless configure_rate_limit() sets one
+_scheduler = RequestScheduler()
+
+
+def _build_session():
+    session = requests.Session()
+    # pool_block makes MAX_CONNECTIONS_PER_HOST a hard cap instead of
+    # opening (and then discarding) extra connections under load
+    adapter = HTTPAdapter(
+        pool_connections=POOL_HOSTS,
+        pool_maxsize=MAX_CONNECTIONS_PER_HOST,
+        pool_block=True,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    # urllib3 advertises br/zstd only when a decoder is installed
+    session.headers.update({
+        "User-Agent": USER_AGENT,
+        "Accept-Encoding": ACCEPT_ENCODING,
+    })
+    return session
+
+
+# Shared keep-alive session; created on first use
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+# Change pool size or timeouts; the session is rebuilt on next use
+def configure(max_connections_per_host=None, pool_hosts=None, connect_timeout=None, read_timeout=None):
+    global _session, MAX_CONNECTIONS_PER_HOST, POOL_HOSTS, CONNECT_TIMEOUT, READ_TIMEOUT
+    with _session_lock:
+        if max_connections_per_host is not None:
+            MAX_CONNECTIONS_PER_HOST = max_connections_per_host
+        if pool_hosts is not None:
+            POOL_HOSTS = pool_hosts
+        if connect_timeout is not None:
+            CONNECT_TIMEOUT = connect_timeout
+        if read_timeout is not None:
+            READ_TIMEOUT = read_timeout
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+# Put a disk cache under get(); pass directory=None to turn it off again
+def configure_cache(directory, ttl=None, max_bytes=None):
+    global _cache
+    if directory is None:
+        _cache = None
+        return None
+    options = {}
+    if ttl is not None:
+        options["ttl"] = ttl
+    if max_bytes is not None:
+        options["max_bytes"] = max_bytes
+    _cache = HTTPCache(directory, **options)
+    return _cache
+
+
+def get_cache():
+    return _cache
+
+
+# Replace the request scheduler (see rate_limiter.RequestScheduler for the
+# options); enabled=False sends requests straight to the session
+def configure_rate_limit(enabled=True, **options):
+    global _scheduler
+    _scheduler = RequestScheduler(**options) if enabled else None
+    return _scheduler
+
+
+def get_scheduler():
+    return _scheduler
+
+
+def _counted_get(session, url, kwargs):
+    response = session.get(url, **kwargs)
+    metrics.HTTP_REQUESTS.inc(status=response.status_code)
+    return response
+
+
+# One GET through the scheduler, which throttles and retries it
+def _send(url, **kwargs):
+    session = get_session()
+    scheduler = _scheduler
+    if scheduler is None:
+        return _counted_get(session, url, kwargs)
+    return scheduler.call(url, lambda: _counted_get(session, url, kwargs),
+                          retry_exceptions=(requests.ConnectionError, requests.Timeout))
+
+
+# A requests.Response rebuilt from a cache entry
+def cached_response(url, entry, body):
+    response = requests.Response()
+    response.status_code = 200
+    response.reason = "OK"
+    response.url = url
+    response.headers = CaseInsensitiveDict(entry.get("headers", {}))
+    response._content = body
+    response._content_consumed = True
+    response.from_cache = True
+    return response
+
+
+# Cached body, or None if the entry vanished or can't be decoded
+def read_cached(cache, url, entry):
+    try:
+        return cache.read_body(url, entry)
+    except (OSError, ValueError, zlib.error):
+        return None
+
+
+def get(url, use_cache=True, **kwargs):
+    kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+    cache = _cache if use_cache else None
+    if cache is None:
+        return _send(url, **kwargs)
+
+    entry = cache.lookup(url)
+    if entry is not None and cache.is_fresh(entry):
+        body = read_cached(cache, url, entry)
+        if body is not None:
+            metrics.CACHE_LOOKUPS.inc(result="hit")
+            return cached_response(url, entry, body)
+
+    headers = dict(kwargs.pop("headers", None) or {})
+    if entry is not None:
+        headers.update(cache.validation_headers(entry))
+    response = _send(url, headers=headers, **kwargs)
+
+    if response.status_code == 304 and entry is not None:
+        body = read_cached(cache, url, entry)
+        if body is not None:
+            response.close()
+            cache.refresh(url, entry)
+            metrics.CACHE_LOOKUPS.inc(result="revalidated")
+            return cached_response(url, entry, body)
+        # Evicted between lookup and read: fetch it unconditionally
+        response = _send(url, **kwargs)
+    metrics.CACHE_LOOKUPS.inc(result="miss")
+    if response.status_code == 200:
+        # Reads the whole body, which also serves stream=True callers fine
+        cache.store(url, response.headers, response.content)
+    response.from_cache = False
+    return response
+
+
+def close():
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
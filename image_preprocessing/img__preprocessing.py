@@ -1,41 +1,142 @@
 from PIL import Image
+import argparse
+import csv
+import logging
 import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from tqdm import tqdm
 
-def resize_image(input_path, output_path, size=(554, 554)):
+logger = logging.getLogger(__name__)
+
+IMAGE_SIZE = (554, 554)
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp')
+# JPEGs are decoded at the smallest DCT scale still at least this many
+# times the target size; LANCZOS then does the last, small step
+DRAFT_FACTOR = 2
+
+def _resize(input_path, output_path, size=IMAGE_SIZE):
+    with Image.open(input_path) as img:
+        if img.format == 'JPEG':
+            # Let the decoder skip detail the thumbnail would throw away
+            img.draft('RGB', (size[0] * DRAFT_FACTOR, size[1] * DRAFT_FACTOR))
+
+        # Create a new image with white background
+        new_img = Image.new("RGB", size, (255, 255, 255))
+
+        # Resize the original image while maintaining aspect ratio
+        img.thumbnail(size, Image.LANCZOS)
+
+        # Calculate position to paste the resized image
+        paste_box = ((size[0] - img.size[0]) // 2, (size[1] - img.size[1]) // 2)
+
+        # Paste the resized image onto the white background
+        new_img.paste(img, paste_box)
+
+        # Save the result
+        new_img.save(output_path)
+
+# Errors are raised, so callers can drop the image instead of publishing
+# a file that was never written
+def resize_image(input_path, output_path, size=IMAGE_SIZE):
+    _resize(input_path, output_path, size)
+    logger.debug("Image resized successfully and saved as %s", output_path)
+
+# True when `output_path` is newer than `input_path` and already `size`,
+# so a run after a size change redoes every image
+def is_up_to_date(input_path, output_path, size=IMAGE_SIZE):
+    try:
+        if os.path.getmtime(output_path) < os.path.getmtime(input_path):
+            return False
+        with Image.open(output_path) as img:
+            return img.size == tuple(size)
+    except OSError:
+        return False
+
+# Resize one image for the batch; returns (input path, seconds, error or None)
+def process_image(task):
+    input_path, output_path, size = task
+    start = time.perf_counter()
+    temp_path = f"{output_path}.tmp{os.path.splitext(output_path)[1]}"
     try:
-        with Image.open(input_path) as img:
-            # Create a new image with white background
-            new_img = Image.new("RGB", size, (255, 255, 255))
-            
-            # Resize the original image while maintaining aspect ratio
-            img.thumbnail(size, Image.LANCZOS)
-            
-            # Calculate position to paste the resized image
-            paste_box = ((size[0] - img.size[0]) // 2, (size[1] - img.size[1]) // 2)
-            
-            # Paste the resized image onto the white background
-            new_img.paste(img, paste_box)
-            
-            # Save the result
-            new_img.save(output_path)
-        print(f"Image resized successfully and saved as {output_path}")
+        _resize(input_path, temp_path, size)
+        os.replace(temp_path, output_path)
+        return input_path, time.perf_counter() - start, None
     except Exception as e:
-        print(f"An error occurred: {str(e)}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return input_path, time.perf_counter() - start, f"{type(e).__name__}: {e}"
+
+# Resize every image in `input_directory` that isn't up to date in
+# `output_directory`, `workers` at a time. Returns (timings, failures,
+# skipped): (path, seconds) for each resized image, (path, error) for
+# each failure and the number of up-to-date images left alone.
+def process_directory(input_directory, output_directory, size=IMAGE_SIZE, workers=None, force=False):
+    os.makedirs(output_directory, exist_ok=True)
+    tasks = []
+    skipped = 0
+    for filename in sorted(os.listdir(input_directory)):
+        if not filename.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        input_path = os.path.join(input_directory, filename)
+        output_path = os.path.join(output_directory, filename)
+        if not force and is_up_to_date(input_path, output_path, size):
+            skipped += 1
+        else:
+            tasks.append((input_path, output_path, size))
+
+    timings = []
+    failures = []
+    if tasks:
+        # Big enough chunks to keep IPC cheap, small enough to balance the pool
+        chunksize = max(1, min(32, len(tasks) // (4 * (workers or os.cpu_count()))))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(process_image, tasks, chunksize=chunksize)
+            for input_path, seconds, error in tqdm(results, total=len(tasks), desc="Resizing", unit="image"):
+                if error:
+                    failures.append((input_path, error))
+                else:
+                    timings.append((input_path, seconds))
+    return timings, failures, skipped
+
+def print_summary(timings, failures, skipped, elapsed, slowest=5):
+    print(f"Resized {len(timings)} images, skipped {skipped} up to date, {len(failures)} failed in {elapsed:.1f}s")
+    if timings:
+        seconds = sorted(t for _, t in timings)
+        print(f"Per image: mean {sum(seconds) / len(seconds) * 1000:.1f} ms, "
+              f"p50 {seconds[len(seconds) // 2] * 1000:.1f} ms, "
+              f"p95 {seconds[min(len(seconds) - 1, int(len(seconds) * 0.95))] * 1000:.1f} ms, "
+              f"max {seconds[-1] * 1000:.1f} ms")
+        for path, t in sorted(timings, key=lambda item: item[1], reverse=True)[:slowest]:
+            print(f"  {t * 1000:8.1f} ms  {path}")
+    for path, error in failures:
+        print(f"Failed: {path}: {error}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Resize product images to a white square canvas")
+    parser.add_argument("input_directory", nargs="?", default="product_images")
+    parser.add_argument("output_directory", nargs="?", default="output_images")
+    parser.add_argument("--size", type=int, default=IMAGE_SIZE[0], help="canvas width and height in pixels")
+    parser.add_argument("--workers", type=int, default=None, help="resize processes (default: one per CPU)")
+    parser.add_argument("--force", action="store_true", help="resize images whose output is already up to date")
+    parser.add_argument("--timings", default=None, help="write path,seconds,error for every image to this CSV")
+    return parser.parse_args()
 
 def main():
-    input_directory = "product_images"
-    output_directory = "output_images"
-    
-    # Create output directory if it doesn't exist
-    if not os.path.exists(output_directory):
-        os.makedirs(output_directory)
-    
-    # Process all images in the input directory
-    for filename in os.listdir(input_directory):
-        if filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp')):
-            input_path = os.path.join(input_directory, filename)
-            output_path = os.path.join(output_directory, f"{filename}")
-            resize_image(input_path, output_path)
+    args = parse_args()
+    start = time.perf_counter()
+    timings, failures, skipped = process_directory(
+        args.input_directory, args.output_directory, (args.size, args.size), args.workers, args.force)
+    print_summary(timings, failures, skipped, time.perf_counter() - start)
+    if args.timings:
+        with open(args.timings, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(['path', 'seconds', 'error'])
+            writer.writerows((path, f"{seconds:.4f}", '') for path, seconds in timings)
+            writer.writerows((path, '', error) for path, error in failures)
+    if failures:
+        sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
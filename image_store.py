@@ -0,0 +1,188 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+IMAGE_STORE_DIRECTORY = os.path.join(".cache", "images")
+MANIFEST_NAME = "manifest.jsonl"
+# Seconds an image URL is served from the store before it is downloaded
+# again; unchanged bytes are then only relinked, not resized
+DEFAULT_URL_TTL = 24 * 3600
+
+
+# Resized images stored once per distinct source image. An object is named
+# by the SHA-256 of the downloaded bytes, so colour and length variants
+# that share a gallery image, under one URL or several, are downloaded and
+# resized once. The append-only manifest records
+#   {"url": ..., "sha256": ..., "fetched": ...}   source URL -> content hash
+#   {"product_code": ..., "sha256": ...}          product -> stored image
+# and each product's file in the image directory is a hard link to its
+# object (a copy where links aren't possible). A URL fetched more than
+# `url_ttl` seconds ago (None: never) is downloaded again, so a changed
+# image replaces the old one; with the HTTP cache on that download is a
+# conditional GET.
+class ImageStore:
+    def __init__(self, directory=IMAGE_STORE_DIRECTORY, url_ttl=DEFAULT_URL_TTL):
+        self.directory = directory
+        self.url_ttl = url_ttl
+        self.manifest_path = os.path.join(directory, MANIFEST_NAME)
+        # url -> (digest, fetch time)
+        self.urls = {}
+        self.products = {}
+        self.lock = threading.Lock()
+        # key -> [lock, threads using it]; dropped when unused
+        self.locks = {}
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.manifest_path):
+            self._load()
+        self.manifest = open(self.manifest_path, "a", encoding="utf-8")
+
+    def _load(self):
+        with open(self.manifest_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn last line from an interrupted run
+                    continue
+                if "url" in entry:
+                    # Entries written before fetch times were kept count as stale
+                    self.urls[entry["url"]] = (entry["sha256"], entry.get("fetched", 0))
+                elif "product_code" in entry:
+                    self.products[entry["product_code"]] = entry["sha256"]
+
+    def _append(self, entry):
+        self.manifest.write(json.dumps(entry) + "\n")
+        self.manifest.flush()
+
+    def object_path(self, digest):
+        return os.path.join(self.directory, digest[:2], f"{digest}.jpg")
+
+    @contextlib.contextmanager
+    def _lock_for(self, key):
+        with self.lock:
+            entry = self.locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self.lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self.locks[key]
+
+    # Held while one URL is fetched, so a second product with the same
+    # image waits for the first download instead of repeating it
+    def url_lock(self, url):
+        return self._lock_for(("url", url))
+
+    # Digest of a stored object made from `url` within the TTL, or None
+    def lookup(self, url):
+        with self.lock:
+            digest, fetched = self.urls.get(url, (None, 0))
+        if digest is None:
+            return None
+        if self.url_ttl is not None and time.time() - fetched > self.url_ttl:
+            metrics.IMAGE_STORE.inc(result="url_stale")
+            return None
+        if os.path.exists(self.object_path(digest)):
+            metrics.IMAGE_STORE.inc(result="url_hit")
+            return digest
+        return None
+
+    # Hash `chunks` into the store, resizing them with `resize(source,
+    # output)` unless identical bytes were stored before. Returns the
+    # digest, or None when the resize produced nothing.
+    def add(self, url, chunks, resize):
+        temp_path = os.path.join(self.directory, f"tmp-{uuid.uuid4().hex}")
+        resized_path = temp_path + ".jpg"
+        sha256 = hashlib.sha256()
+        try:
+            with open(temp_path, "wb") as f:
+                for chunk in chunks:
+                    sha256.update(chunk)
+                    f.write(chunk)
+            digest = sha256.hexdigest()
+            object_path = self.object_path(digest)
+            # Identical bytes arriving from two URLs at once are resized once
+            with self._lock_for(("sha256", digest)):
+                if not os.path.exists(object_path):
+                    os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                    resize(temp_path, resized_path)
+                    if not os.path.exists(resized_path):
+                        return None
+                    os.replace(resized_path, object_path)
+                    metrics.IMAGE_STORE.inc(result="stored")
+                else:
+                    metrics.IMAGE_STORE.inc(result="content_hit")
+                    logger.debug("Image from %s already stored as %s", url, digest, extra={'url': url})
+        finally:
+            # A resize that failed part way can leave its output behind
+            for path in (temp_path, resized_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        fetched = time.time()
+        with self.lock:
+            self.urls[url] = (digest, fetched)
+            self._append({"url": url, "sha256": digest, "fetched": round(fetched)})
+        return digest
+
+    # Make `path` (a product's image file) the stored object `digest`
+    def link(self, digest, path, product_code=None):
+        object_path = self.object_path(digest)
+        # rename() onto another link to the same file does nothing, so
+        # an up-to-date link is left alone
+        if not (os.path.exists(path) and os.path.samefile(object_path, path)):
+            temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            try:
+                os.link(object_path, temp_path)
+            except OSError:
+                shutil.copyfile(object_path, temp_path)
+            os.replace(temp_path, path)
+        if product_code is not None:
+            with self.lock:
+                if self.products.get(product_code) != digest:
+                    self.products[product_code] = digest
+                    self._append({"product_code": product_code, "sha256": digest})
+
+    def close(self):
+        with self.lock:
+            self.manifest.close()
+
+
+_store = None
+_store_directory = IMAGE_STORE_DIRECTORY
+_store_url_ttl = DEFAULT_URL_TTL
+_store_lock = threading.Lock()
+
+
+# Move the store; directory=None turns it off and every image is
+# downloaded and resized on its own again
+def configure(directory, url_ttl=DEFAULT_URL_TTL):
+    global _store, _store_directory, _store_url_ttl
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+        _store = None
+        _store_directory = directory
+        _store_url_ttl = url_ttl
+
+
+# Shared store, created on first use; None when turned off
+def get_store():
+    global _store
+    if _store is None and _store_directory is not None:
+        with _store_lock:
+            if _store is None and _store_directory is not None:
+                _store = ImageStore(_store_directory, _store_url_ttl)
+    return _store
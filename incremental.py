@@ -0,0 +1,119 @@
+import csv
+import hashlib
+import json
+import os
+import threading
+
+from output_writer import read_products, sidecar_path
+
+DELTA_COLUMNS = ['Change', 'Product Code', 'Product URL', 'Name']
+
+
+# Hash of everything a product row is built from, including the converted
+# price so an FX change also counts as a change
+def product_fingerprint(fields, price):
+    payload = json.dumps([fields, price], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+# Move the last catalog aside so the new one can be written in its place.
+# A resumed run keeps the copy moved aside by the run it continues.
+def prepare_previous_catalog(output_path, resume=False):
+    previous_path = sidecar_path(output_path, 'previous')
+    if resume and os.path.exists(previous_path):
+        return previous_path
+    if os.path.exists(output_path):
+        os.replace(output_path, previous_path)
+        return previous_path
+    return None
+
+
+# Writer wrapper for incremental runs. It indexes the previous catalog by
+# Product URL (keeping only code and name in memory) and answers whether a
+# freshly fetched product is unchanged, so the pipeline can skip building
+# its description, spec table and image. On close it carries over the
+# previous rows of unchanged products, writes a delta file of added,
+# changed and removed products, and saves the new fingerprints. A run
+# that fails calls abort() instead, which leaves the previous catalog in
+# place.
+class IncrementalCatalog:
+    def __init__(self, writer, previous_path, journal):
+        self.writer = writer
+        self.previous_path = previous_path
+        self.journal = journal
+        self.lock = threading.Lock()
+        self.fingerprints_path = sidecar_path(writer.path, 'fingerprints', '.json')
+        self.delta_path = sidecar_path(writer.path, 'delta', '.csv')
+
+        self.previous = {}
+        if previous_path:
+            for row in read_products(previous_path):
+                self.previous[row['Product URL']] = (row['Product Code'], row['Name'])
+        try:
+            with open(self.fingerprints_path, encoding='utf-8') as f:
+                self.previous_fingerprints = json.load(f)
+        except (OSError, ValueError):
+            self.previous_fingerprints = {}
+
+        self.fingerprints = {}
+        self.changes = {}
+        self.written_codes = set()
+
+    @property
+    def path(self):
+        return self.writer.path
+
+    @property
+    def rows_written(self):
+        return self.writer.rows_written
+
+    def is_unchanged(self, url, fingerprint):
+        with self.lock:
+            self.fingerprints[url] = fingerprint
+        return url in self.previous and self.previous_fingerprints.get(url) == fingerprint
+
+    def write(self, row):
+        url = row['Product URL']
+        with self.lock:
+            change = 'changed' if url in self.previous else 'added'
+            self.changes[url] = (change, row['Product Code'], row['Name'])
+            self.written_codes.add(row['Product Code'])
+        self.writer.write(row)
+
+    # Keep the partial output as a sidecar and put the previous catalog back.
+    # Nothing is counted as removed and the fingerprints are left alone; the
+    # rows already journaled come back when the job is resumed.
+    def abort(self):
+        self.writer.close()
+        if self.previous_path and os.path.exists(self.previous_path):
+            os.replace(self.writer.path, sidecar_path(self.writer.path, 'partial'))
+            os.replace(self.previous_path, self.writer.path)
+
+    def close(self):
+        discovered = set(self.journal.iter_discovered_urls())
+        removed = []
+
+        # Previous rows of products still listed but not rewritten this run:
+        # unchanged ones, and ones whose page failed to fetch
+        if self.previous_path:
+            for row in read_products(self.previous_path):
+                url = row['Product URL']
+                if url not in discovered:
+                    removed.append(row)
+                elif url not in self.changes and row['Product Code'] not in self.written_codes:
+                    self.written_codes.add(row['Product Code'])
+                    self.writer.write(row)
+                    self.fingerprints.setdefault(url, self.previous_fingerprints.get(url))
+        self.writer.close()
+
+        with open(self.delta_path, 'w', encoding='utf-8', newline='') as f:
+            delta = csv.writer(f, lineterminator='\n')
+            delta.writerow(DELTA_COLUMNS)
+            for url, (change, code, name) in self.changes.items():
+                delta.writerow([change, code, url, name])
+            for row in removed:
+                delta.writerow(['removed', row['Product Code'], row['Product URL'], row['Name']])
+
+        fingerprints = {url: fingerprint for url, fingerprint in self.fingerprints.items() if fingerprint}
+        with open(self.fingerprints_path, 'w', encoding='utf-8') as f:
+            json.dump(fingerprints, f)
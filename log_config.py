@@ -0,0 +1,113 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime, timezone
+
+TEXT_FORMAT = "%(levelname)s %(message)s"
+# Context passed as `extra=` that JSON records carry as top-level fields
+CONTEXT_FIELDS = ("url", "product_code", "stage")
+
+_listener = None
+_settings = None
+
+
+# One JSON object per line: time, level, logger, message, any
+# CONTEXT_FIELDS on the record and the traceback when there is one
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.processName != "MainProcess":
+            entry["process"] = record.processName
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+# Writes to whatever sys.stderr is at the time, so records go through
+# rich's redirect while a progress bar is live instead of tearing it
+class StderrHandler(logging.StreamHandler):
+    def __init__(self):
+        super().__init__(sys.stderr)
+
+    @property
+    def stream(self):
+        return sys.stderr
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+# "DEBUG" sets the root level, "http_client=DEBUG" one logger's
+def parse_levels(specs):
+    levels = {}
+    for spec in specs or ():
+        name, _, level = spec.rpartition("=")
+        levels[name] = level.upper()
+    return levels
+
+
+def _build_handler(json_format, path):
+    handler = logging.FileHandler(path, encoding="utf-8") if path else StderrHandler()
+    handler.setFormatter(JSONFormatter() if json_format else logging.Formatter(TEXT_FORMAT))
+    return handler
+
+
+# Route every logger through a queue: callers only pay for an enqueue, and
+# one listener thread formats and writes the records. `levels` is a list
+# of parse_levels() specs. Safe to call again to reconfigure.
+def configure_logging(levels=None, json_format=False, path=None, use_queue=True):
+    global _listener, _settings
+    stop_logging()
+    _settings = {"levels": list(levels or ()), "json_format": json_format, "path": path}
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.setLevel(logging.INFO)
+    for name, level in parse_levels(levels).items():
+        logging.getLogger(name or None).setLevel(level)
+
+    handler = _build_handler(json_format, path)
+    if use_queue:
+        records = queue.SimpleQueue()
+        root.addHandler(logging.handlers.QueueHandler(records))
+        _listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+        _listener.start()
+    else:
+        root.addHandler(handler)
+
+
+# Flush the queue and stop the listener thread; registered at exit
+def stop_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+# Arguments for init_worker, so process pools log the way the parent does
+def worker_settings():
+    return (_settings,)
+
+
+# ProcessPoolExecutor initializer. A forked worker inherits the parent's
+# queue handler but not its listener thread, so it writes directly instead.
+def init_worker(settings):
+    if settings is not None:
+        configure_logging(**settings, use_queue=False)
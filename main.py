@@ -1,398 +1,913 @@
 import requests
+import http_client
+import fx_rate
+import image_store
+import log_config
+import metrics
+import rate_limiter
+import url_frontier
 from lxml import html
 from tqdm import tqdm
-import pandas as pd
 import re
-from bs4 import BeautifulSoup
 import os
+import argparse
+import logging
 from datetime import datetime
 from urllib.parse import quote
 from urllib.parse import urlparse
 from PIL import Image
 from colorama import init, Fore, Style
 from extract_table import extract_product_specs, generate_html_table
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from category_classifier import standardize_category
+from description_template import DescriptionTemplate
+from product_selectors import (
+    LISTING_PRODUCT_CONTAINER, LISTING_PRODUCT_LINK, PRODUCT_BRAND, PRODUCT_CATEGORY, PRODUCT_FEATURES,
+    PRODUCT_IMAGE, PRODUCT_MANUFACTURE_CODE, PRODUCT_NAME, PRODUCT_PRICE, PRODUCT_SHORT_DESCRIPTION,
+    PRODUCT_SKU, product_anchor,
+)
+from checkpoint import CheckpointJournal, default_checkpoint_path
+from output_writer import ProductWriter, resolve_output_path, sidecar_path
+from incremental import IncrementalCatalog, prepare_previous_catalog, product_fingerprint
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, ALL_COMPLETED, FIRST_COMPLETED, wait
+import queue
 import threading
 from image_preprocessing.img__preprocessing import resize_image
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TimeElapsedColumn
 
-def get_gbp_to_inr_rate():
-    try:
-        # Using an alternative API that provides exchange rate data
-        response = requests.get("https://open.er-api.com/v6/latest/GBP")
-        response.raise_for_status()  # Raises an HTTPError for bad responses
-        data = response.json()
-        return data['rates']['INR']
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching data from API: {e}")
-        return 1  # Fallback to a default value if API call fails
-
-# Real-time conversion rate from GBP to INR
-GBP_TO_INR_CONVERSION_RATE = get_gbp_to_inr_rate()
-
-def standardize_category(text):
-    lower_text = text.lower()
-    if any(term in lower_text for term in ["radio access point", "access point","Campus","campus","Hardened","hardened"]):
-        return "Access Point"
-    
-    if any(term in lower_text for term in ["network card", "network adapter card","full/low-profile","Full/Low-Profile","10/100/1000 nic network adapter","10/100/1000 NIC Network Adapter"]):
-        return "Adapter Card"
-    
-    if any(term in lower_text for term in ["wireless router", "wifi router","Wi-Fi system","wi-fi system"]):
-        return "Wifi & Routers"
-    
-    if any(term in lower_text for term in ["console server"]):
-        return "Console System"
-    
-    if any(term in lower_text for term in ["gen 2","Gen 2","gen","environment monitoring device","environmental monitoring","Temperature & humidity sensor","temperature & humidity sensor","Remote management adapter","remote management adapter"]):
-        return "Monitoring device"
-    
-    cable_terms = [
-        "category 6", "category 6a", "patch cable", "security cable lock",
-        "cat 6 riser cable", "6ft locking cable incl", "usb type-c to ethernet",
-        "network cable", "type-c to ethernet", "cat 5e riser cable",
-        "ethernet", "cable", "ethernet cable", "fibre", "fibre optic cable",
-        "1000Base-SX SC", "InfiniBand cable","ft","m/","m /",
-        "antistatic wrist strap", "anti-static wrist strap", "anti static wrist strap"]
-    
-    if any(term in lower_text for term in cable_terms):
-        return "Cables and accessories"
-    
-    if any(term in lower_text for term in ["lifetime warranty","software license","subscription licence","Subscription licence","Licence","licence"]):
-        return "Software License"
-    
-    if any(term in lower_text for term in ["v1","V1","v3","V3","switch","switches"]):
-        return "Switch"
-    
-    if any(term in lower_text for term in ["windows 10","Windows 10","windows server","Windows Server"]):
-        return "Print Server"
-    
-    if any(term in lower_text for term in ["Essentials Edition","essentials edition","Repeater","repeater"]):
-        return "Wifi range extender"
-    
-    if any(term in lower_text for term in ["V2", "Dual Band AC600 Wireless Dongle", "dual band ac600 wireless dongle", "Quad Port Adapter", "ST1000SPEX43", "1T1R 802.11ac", "wifi adapter","WiFi Adapter","WiFi Card"]):
-        return "Network Adapter"
-    
-    if any(term in lower_text for term in ["usb", "USB", "Usb", "Host", "bus adapter","Host bus adapter" ,"host bus adapter"]):
-        return "USB Hub"
-    
-    if any(term in lower_text for term in ["8 Port","8 port"]):
-        return "Serial Adapter"
-    
-    if any(term in lower_text for term in ["sfp", "mini-gbic", "transceiver module", "gbic", "optical module", "sfp+", "xfp", "qsfp", "fiber optic transceiver"]):
-        return "SFP transceiver module"
-    
-    if any(term in lower_text for term in ["sfp", "mini-gbic", "transceiver module", "gbic", "optical module"]):
-        return "SFP transceiver module"
-    
-    
-    return text
-    
-def extract_product_data(tree, url):
-    # Define the existing HTML content in the description
-    existing_description = '''<!-- wp:woocommerce/product-tab {"id":"general","title":"General"} /-->\n\n<!-- wp:woocommerce/product-tab {"id":"pricing","title":"Pricing"} /-->\n\n<!-- wp:woocommerce/product-tab {"id":"inventory","title":"Inventory"} /-->\n\n<!-- wp:woocommerce/product-tab {"id":"shipping","title":"Shipping"} /-->\n\n<!-- wp:group {"align":"full","style":{"spacing":{"blockGap":"60px"}},"layout":{"type":"constrained","contentSize":"1920px"}} -->\n<div class="wp-block-group alignfull"><!-- wp:group {"align":"full","layout":{"type":"constrained","contentSize":"1400px"}} -->\n<div class="wp-block-group alignfull"><!-- wp:columns {"style":{"spacing":{"blockGap":{"left":"19.4%"}}}} -->\n<div class="wp-block-columns"><!-- wp:column {"width":"324px"} -->\n<div class="wp-block-column" style="flex-basis:324px"><!-- wp:heading {"className":"has-dm-sans-font-family","style":{"typography":{"fontSize":"25px","fontStyle":"normal","fontWeight":"700","lineHeight":"1.6"}},"textColor":"contrast"} -->\n<h2 class="wp-block-heading has-dm-sans-font-family has-contrast-color has-text-color" style="font-size:25px;font-style:normal;font-weight:700;line-height:1.6"><strong>Product details</strong></h2>\n<!-- /wp:heading --></div>\n<!-- /wp:column -->\n\n<!-- wp:column {"width":"805px"} -->\n<div class="wp-block-column" style="flex-basis:805px"><!-- wp:group {"style":{"spacing":{"blockGap":"60px"}},"layout":{"type":"constrained"}} -->\n<div class="wp-block-group"><!-- wp:group {"layout":{"type":"constrained"}} -->\n<div class="wp-block-group"><!-- wp:heading {"className":"has-dm-sans-font-family","style":{"typography":{"fontSize":"17px","fontStyle":"normal","fontWeight":"700","lineHeight":1.6},"spacing":{"margin":{"bottom":"10px"}}},"textColor":"contrast"} -->\n<h2 class="wp-block-heading has-dm-sans-font-family has-contrast-color has-text-color" style="margin-bottom:10px;font-size:17px;font-style:normal;font-weight:700;line-height:1.6"><strong>{card_pro_name}</strong></h2>\n<!-- /wp:heading -->\n\n<!-- wp:paragraph {"style":{"spacing":{"padding":{"top":"0","right":"0","bottom":"0","left":"0"},"margin":{"top":"0","right":"0","bottom":"0","left":"0"}},"typography":{"fontSize":"15px","fontStyle":"normal","fontWeight":"400","lineHeight":"1.6"}},"textColor":"contrast"} -->\n<p class="has-contrast-color has-text-color" style="margin-top:0;margin-right:0;margin-bottom:0;margin-left:0;padding-top:0;padding-right:0;padding-bottom:0;padding-left:0;font-size:15px;font-style:normal;font-weight:400;line-height:1.6"><strong>Overview</strong></p>\n<!-- /wp:paragraph -->\n\n<!-- wp:paragraph {"style":{"spacing":{"padding":{"top":"0","right":"0","bottom":"0","left":"0"},"margin":{"top":"0","right":"0","bottom":"0","left":"0"}},"typography":{"fontSize":"15px","fontStyle":"normal","fontWeight":"400","lineHeight":"1.6"}},"textColor":"contrast"} -->\n<p class="has-contrast-color has-text-color" style="margin-top:0;margin-right:0;margin-bottom:0;margin-left:0;padding-top:0;padding-right:0;padding-bottom:0;padding-left:0;font-size:15px;font-style:normal;font-weight:400;line-height:1.6">{SHORT DESCRIPTION}</p>\n<!-- /wp:paragraph -->\n\n<!-- wp:list -->\n<ul class="wp-block-list"><!-- wp:list-item -->\n<li>{FEATURE 1}</li>\n<!-- /wp:list-item -->\n\n<!-- wp:list-item -->\n<li>{FEATURE 2}</li>\n<!-- /wp:list-item -->\n\n<!-- wp:list-item -->\n<li>{FEATURE 3}</li>\n<!-- /wp:list-item -->\n\n<!-- wp:list-item -->\n<li>{FEATURE 4}</li>\n<!-- /wp:list-item --></ul>\n<!-- /wp:list --></div>\n<!-- /wp:group --></div>\n<!-- /wp:group --></div>\n<!-- /wp:column --></div>\n<!-- /wp:columns --></div>\n<!-- /wp:group -->\n\n<!-- wp:table {"className":"is-style-stripes"} /-->\n\n<!-- wp:group {"align":"full","style":{"spacing":{"blockGap":"0px"}},"layout":{"type":"constrained","contentSize":"1400px"}} -->\n<div class="wp-block-group alignfull"><!-- wp:columns {"verticalAlignment":"center","style":{"spacing":{"blockGap":{"top":"0","left":"0"},"padding":{"top":"0","right":"0","bottom":"0","left":"0"}},"border":{"radius":"8px"}}} -->\n<div class="wp-block-columns are-vertically-aligned-center" style="border-radius:8px;padding-top:0;padding-right:0;padding-bottom:0;padding-left:0"><!-- wp:column {"verticalAlignment":"center","width":"595px","style":{"spacing":{"padding":{"top":"0","bottom":"0"}}}} -->\n<div class="wp-block-column is-vertically-aligned-center" style="padding-top:0;padding-bottom:0;flex-basis:595px"><!-- wp:group {"className":"title-with-image","style":{"color":{"background":"#f5f5f7"},"border":{"radius":{"topLeft":"8px","bottomLeft":"8px"}},"spacing":{"padding":{"right":"14%","left":"11.7%"}}},"layout":{"type":"constrained","contentSize":""}} -->\n<div class="wp-block-group title-with-image has-background" style="border-top-left-radius:8px;border-bottom-left-radius:8px;background-color:#f5f5f7;padding-right:14%;padding-left:11.7%"><!-- wp:heading {"textAlign":"left","className":"has-dm-sans-font-family","style":{"typography":{"fontSize":"36px","fontStyle":"normal","fontWeight":"700","lineHeight":"1.3"}}} -->\n<h2 class="wp-block-heading has-text-align-left has-dm-sans-font-family" style="font-size:36px;font-style:normal;font-weight:700;line-height:1.3"><strong>{card_pro_name}</strong></h2>\n<!-- /wp:heading -->\n\n<!-- wp:paragraph -->\n<p>{card_pro_des}</p>\n<!-- /wp:paragraph --></div>\n<!-- /wp:group --></div>\n<!-- /wp:column -->\n\n<!-- wp:column {"verticalAlignment":"center"} -->\n<div class="wp-block-column is-vertically-aligned-center"><!-- wp:image {"id":6384,"width":"257px","height":"auto","sizeSlug":"full","linkDestination":"none","style":{"border":{"radius":{"topRight":"8px","bottomRight":"8px"}}}} -->\n<figure class="wp-block-image size-full is-resized has-custom-border"><img src="{IMAGE}" alt="" class="wp-image-6384" style="border-top-right-radius:8px;border-bottom-right-radius:8px;width:257px;height:auto"/></figure>\n<!-- /wp:image --></div>\n<!-- /wp:column --></div>\n<!-- /wp:columns --></div>\n<!-- /wp:group -->\n\n<!-- wp:group {"align":"full","layout":{"type":"constrained","contentSize":"1400px"}} -->\n<div class="wp-block-group alignfull"><!-- wp:columns {"style":{"spacing":{"blockGap":{"left":"19.4%"}}}} -->\n<div class="wp-block-columns"><!-- wp:column {"width":"805px"} -->\n<div class="wp-block-column" style="flex-basis:805px"><!-- wp:paragraph {"className":"has-dm-sans-font-family","style":{"typography":{"fontSize":"15px","lineHeight":"1.6","fontStyle":"normal","fontWeight":"400"}},"textColor":"contrast"} -->\n<p class="has-dm-sans-font-family has-contrast-color has-text-color" style="font-size:15px;font-style:normal;font-weight:400;line-height:1.6"></p>\n<!-- /wp:paragraph -->\n\n<!-- wp:paragraph -->\n<p></p>\n<!-- /wp:paragraph -->\n\n<!-- wp:paragraph -->\n<p></p>\n<!-- /wp:paragraph -->\n\n<!-- wp:heading {"level":1} -->\n<h1 class="wp-block-heading">Specification</h1>\n<!-- /wp:heading -->\n\n<!-- wp:table {"className":"is-style-stripes","style":{"border":{"width":"0px","style":"none"},"spacing":{"margin":{"top":"var:preset|spacing|30","bottom":"var:preset|spacing|30"}}}} -->\n'''
-
-    product_data = {
-        'ID': '',
-        'Type': 'simple',
-        'SKU': '',
-        'Name': '',
-        'Published': 1,
-        'Is featured?': 0,
-        'Visibility in catalog': 'visible',
-        'Short description': '',
-        'Description': existing_description.replace("{PRODUCT NAME}", "{PRODUCT NAME}").replace("{SHORT DESCRIPTION}", "{SHORT DESCRIPTION}").strip(),
-        'Date sale price starts': '',
-        'Tax status': 'taxable',
-        'Tax class': '',
-        'In stock?': 1,
-        'Stock': '',
-        'Regular price': '',  # INR price
-        'Categories': '',
-        'Tags': '',
-        'Images': '',
-        'Attribute 1 name': 'brand',
-        'Attribute 1 value(s)': '',
-        'Attribute 1 visible': 1,
-        'Attribute 1 global': 1,
-        'Product URL': '',
-        'Product Code':'',
-        'Meta: _product_code': '',
+# Named explicitly: run as a script this module is __main__
+logger = logging.getLogger("main")
+
+# Description template filled in for every product
+EXISTING_DESCRIPTION = '''<!-- wp:woocommerce/product-tab {"id":"general","title":"General"} /-->\n\n<!-- wp:woocommerce/product-tab {"id":"pricing","title":"Pricing"} /-->\n\n<!-- wp:woocommerce/product-tab {"id":"inventory","title":"Inventory"} /-->\n\n<!-- wp:woocommerce/product-tab {"id":"shipping","title":"Shipping"} /-->\n\n<!-- wp:group {"align":"full","style":{"spacing":{"blockGap":"60px"}},"layout":{"type":"constrained","contentSize":"1920px"}} -->\n<div class="wp-block-group alignfull"><!-- wp:group {"align":"full","layout":{"type":"constrained","contentSize":"1400px"}} -->\n<div class="wp-block-group alignfull"><!-- wp:columns {"style":{"spacing":{"blockGap":{"left":"19.4%"}}}} -->\n<div class="wp-block-columns"><!-- wp:column {"width":"324px"} -->\n<div class="wp-block-column" style="flex-basis:324px"><!-- wp:heading {"className":"has-dm-sans-font-family","style":{"typography":{"fontSize":"25px","fontStyle":"normal","fontWeight":"700","lineHeight":"1.6"}},"textColor":"contrast"} -->\n<h2 class="wp-block-heading has-dm-sans-font-family has-contrast-color has-text-color" style="font-size:25px;font-style:normal;font-weight:700;line-height:1.6"><strong>Product details</strong></h2>\n<!-- /wp:heading --></div>\n<!-- /wp:column -->\n\n<!-- wp:column {"width":"805px"} -->\n<div class="wp-block-column" style="flex-basis:805px"><!-- wp:group {"style":{"spacing":{"blockGap":"60px"}},"layout":{"type":"constrained"}} -->\n<div class="wp-block-group"><!-- wp:group {"layout":{"type":"constrained"}} -->\n<div class="wp-block-group"><!-- wp:heading {"className":"has-dm-sans-font-family","style":{"typography":{"fontSize":"17px","fontStyle":"normal","fontWeight":"700","lineHeight":1.6},"spacing":{"margin":{"bottom":"10px"}}},"textColor":"contrast"} -->\n<h2 class="wp-block-heading has-dm-sans-font-family has-contrast-color has-text-color" style="margin-bottom:10px;font-size:17px;font-style:normal;font-weight:700;line-height:1.6"><strong>{card_pro_name}</strong></h2>\n<!-- /wp:heading -->\n\n<!-- wp:paragraph {"style":{"spacing":{"padding":{"top":"0","right":"0","bottom":"0","left":"0"},"margin":{"top":"0","right":"0","bottom":"0","left":"0"}},"typography":{"fontSize":"15px","fontStyle":"normal","fontWeight":"400","lineHeight":"1.6"}},"textColor":"contrast"} -->\n<p class="has-contrast-color has-text-color" style="margin-top:0;margin-right:0;margin-bottom:0;margin-left:0;padding-top:0;padding-right:0;padding-bottom:0;padding-left:0;font-size:15px;font-style:normal;font-weight:400;line-height:1.6"><strong>Overview</strong></p>\n<!-- /wp:paragraph -->\n\n<!-- wp:paragraph {"style":{"spacing":{"padding":{"top":"0","right":"0","bottom":"0","left":"0"},"margin":{"top":"0","right":"0","bottom":"0","left":"0"}},"typography":{"fontSize":"15px","fontStyle":"normal","fontWeight":"400","lineHeight":"1.6"}},"textColor":"contrast"} -->\n<p class="has-contrast-color has-text-color" style="margin-top:0;margin-right:0;margin-bottom:0;margin-left:0;padding-top:0;padding-right:0;padding-bottom:0;padding-left:0;font-size:15px;font-style:normal;font-weight:400;line-height:1.6">{SHORT DESCRIPTION}</p>\n<!-- /wp:paragraph -->\n\n<!-- wp:list -->\n<ul class="wp-block-list"><!-- wp:list-item -->\n<li>{FEATURE 1}</li>\n<!-- /wp:list-item -->\n\n<!-- wp:list-item -->\n<li>{FEATURE 2}</li>\n<!-- /wp:list-item -->\n\n<!-- wp:list-item -->\n<li>{FEATURE 3}</li>\n<!-- /wp:list-item -->\n\n<!-- wp:list-item -->\n<li>{FEATURE 4}</li>\n<!-- /wp:list-item --></ul>\n<!-- /wp:list --></div>\n<!-- /wp:group --></div>\n<!-- /wp:group --></div>\n<!-- /wp:column --></div>\n<!-- /wp:columns --></div>\n<!-- /wp:group -->\n\n<!-- wp:table {"className":"is-style-stripes"} /-->\n\n<!-- wp:group {"align":"full","style":{"spacing":{"blockGap":"0px"}},"layout":{"type":"constrained","contentSize":"1400px"}} -->\n<div class="wp-block-group alignfull"><!-- wp:columns {"verticalAlignment":"center","style":{"spacing":{"blockGap":{"top":"0","left":"0"},"padding":{"top":"0","right":"0","bottom":"0","left":"0"}},"border":{"radius":"8px"}}} -->\n<div class="wp-block-columns are-vertically-aligned-center" style="border-radius:8px;padding-top:0;padding-right:0;padding-bottom:0;padding-left:0"><!-- wp:column {"verticalAlignment":"center","width":"595px","style":{"spacing":{"padding":{"top":"0","bottom":"0"}}}} -->\n<div class="wp-block-column is-vertically-aligned-center" style="padding-top:0;padding-bottom:0;flex-basis:595px"><!-- wp:group {"className":"title-with-image","style":{"color":{"background":"#f5f5f7"},"border":{"radius":{"topLeft":"8px","bottomLeft":"8px"}},"spacing":{"padding":{"right":"14%","left":"11.7%"}}},"layout":{"type":"constrained","contentSize":""}} -->\n<div class="wp-block-group title-with-image has-background" style="border-top-left-radius:8px;border-bottom-left-radius:8px;background-color:#f5f5f7;padding-right:14%;padding-left:11.7%"><!-- wp:heading {"textAlign":"left","className":"has-dm-sans-font-family","style":{"typography":{"fontSize":"36px","fontStyle":"normal","fontWeight":"700","lineHeight":"1.3"}}} -->\n<h2 class="wp-block-heading has-text-align-left has-dm-sans-font-family" style="font-size:36px;font-style:normal;font-weight:700;line-height:1.3"><strong>{card_pro_name}</strong></h2>\n<!-- /wp:heading -->\n\n<!-- wp:paragraph -->\n<p>{card_pro_des}</p>\n<!-- /wp:paragraph --></div>\n<!-- /wp:group --></div>\n<!-- /wp:column -->\n\n<!-- wp:column {"verticalAlignment":"center"} -->\n<div class="wp-block-column is-vertically-aligned-center"><!-- wp:image {"id":6384,"width":"257px","height":"auto","sizeSlug":"full","linkDestination":"none","style":{"border":{"radius":{"topRight":"8px","bottomRight":"8px"}}}} -->\n<figure class="wp-block-image size-full is-resized has-custom-border"><img src="{IMAGE}" alt="" class="wp-image-6384" style="border-top-right-radius:8px;border-bottom-right-radius:8px;width:257px;height:auto"/></figure>\n<!-- /wp:image --></div>\n<!-- /wp:column --></div>\n<!-- /wp:columns --></div>\n<!-- /wp:group -->\n\n<!-- wp:group {"align":"full","layout":{"type":"constrained","contentSize":"1400px"}} -->\n<div class="wp-block-group alignfull"><!-- wp:columns {"style":{"spacing":{"blockGap":{"left":"19.4%"}}}} -->\n<div class="wp-block-columns"><!-- wp:column {"width":"805px"} -->\n<div class="wp-block-column" style="flex-basis:805px"><!-- wp:paragraph {"className":"has-dm-sans-font-family","style":{"typography":{"fontSize":"15px","lineHeight":"1.6","fontStyle":"normal","fontWeight":"400"}},"textColor":"contrast"} -->\n<p class="has-dm-sans-font-family has-contrast-color has-text-color" style="font-size:15px;font-style:normal;font-weight:400;line-height:1.6"></p>\n<!-- /wp:paragraph -->\n\n<!-- wp:paragraph -->\n<p></p>\n<!-- /wp:paragraph -->\n\n<!-- wp:paragraph -->\n<p></p>\n<!-- /wp:paragraph -->\n\n<!-- wp:heading {"level":1} -->\n<h1 class="wp-block-heading">Specification</h1>\n<!-- /wp:heading -->\n\n<!-- wp:table {"className":"is-style-stripes","style":{"border":{"width":"0px","style":"none"},"spacing":{"margin":{"top":"var:preset|spacing|30","bottom":"var:preset|spacing|30"}}}} -->\n'''
+
+# EXISTING_DESCRIPTION split into static chunks and slots once; the spec
+# table goes after the template and is already HTML
+DESCRIPTION_TEMPLATE = DescriptionTemplate(
+    EXISTING_DESCRIPTION.strip() + '{SPEC TABLE}',
+    slots=['FEATURE 1', 'FEATURE 2', 'FEATURE 3', 'FEATURE 4', 'SHORT DESCRIPTION',
+           'card_pro_name', 'card_pro_des', 'IMAGE', 'SPEC TABLE'],
+    raw=['SPEC TABLE'],
+)
+
+# Pull the raw product fields out of a parsed product page. Nothing here
+# depends on the output format, so the fields can be fingerprinted or
+# shipped between processes before a row is built from them.
+def extract_product_fields(tree, url):
+    fields = {
+        'url': url,
+        'image_url': None,
+        'sku': '',
+        'name': '',
+        'brand': '',
+        'price_gbp': None,
+        'short_description': '',
+        'features': [],
+        'category': None,
+        'specs': None,
+        'card_pro_name': '',
+        'card_pro_des': '',
+        'product_code': '',
     }
 
     try:
-        # Inside extract_product_data function
-        image_element = tree.xpath('//img[@class="gallery-placeholder__image"]/@src')
+        main = product_anchor(tree)
+
+        image_element = PRODUCT_IMAGE(main, tree)
         if image_element:
             image_url = image_element[0]
             if not image_url.startswith(('http://', 'https://')):
                 # If the URL is relative, make it absolute
                 parsed_url = urlparse(url)
                 image_url = f"{parsed_url.scheme}://{parsed_url.netloc}{image_url}"
-            print(f"Image URL found: {image_url}")
-            product_data['image_url'] = image_url
-            
+            logger.debug("Image URL found: %s", image_url, extra={'url': url})
+            fields['image_url'] = image_url
         else:
-            print("No image URL found")
-            
-                    
+            logger.debug("No image URL found", extra={'url': url})
+
         # Extract SKU
-        sku = tree.xpath('//span[contains(text(), "SKU#:")]/text()')
+        sku = PRODUCT_SKU(main, tree)
         if sku:
-            product_data['SKU'] = sku[0].split(':')[-1].strip()
+            fields['sku'] = sku[0].split(':')[-1].strip()
 
         # Extract Name
-        name_element = tree.xpath('/html/body/div[4]/main/div[2]/div/div[1]/div[1]/div[2]/h1/span')
-        brand_element = tree.xpath('/html/body/div[4]/main/div[2]/div/div[1]/div[1]/div[1]/div[1]/strong/text()')
+        name_element = PRODUCT_NAME(main)
+        brand_element = PRODUCT_BRAND(main)
 
         if name_element:
-            name = name_element[0].text_content().strip()
-            product_data['Name'] = name
+            fields['name'] = name_element[0].text_content().strip()
 
         if brand_element:
-            brand = brand_element[0].strip()
-            product_data['Attribute 1 value(s)'] = brand
+            fields['brand'] = brand_element[0].strip()
 
         # Extract Price
-        price_element = tree.xpath('/html/body/div[4]/main/div[2]/div/div[1]/div[1]/div[3]/div[3]/span/span/span')
+        price_element = PRODUCT_PRICE(main)
         if price_element:
             price_text = price_element[0].text_content()
             price_match = re.search(r'£(\d+\.\d+)', price_text)
             if price_match:
-                price_gbp = float(price_match.group(1))
-                price_inr = price_gbp * GBP_TO_INR_CONVERSION_RATE
-                product_data['Regular price'] = round(price_inr, 2)
+                fields['price_gbp'] = float(price_match.group(1))
 
         # Extract Short Description
-        short_desc_items = tree.xpath('/html/body/div[4]/main/div[2]/div/div[2]/div/div[2]/div/div[2]/div[1]/div')
+        short_desc_items = PRODUCT_SHORT_DESCRIPTION(main)
         if short_desc_items:
-            short_description = ' '.join([item.text_content().strip() for item in short_desc_items])
-            product_data['Short description'] = short_description
-        
-        # Extract Features
-        features_elements = tree.xpath('//ul[@class="short-overview"]/li/text()')
-        features = [feature.strip() for feature in features_elements if feature.strip()]
-
-        # Prepare a list of features, ensuring it has exactly 4 elements (with placeholders for missing ones)
-        for i in range(1, 5):
-            if i <= len(features):
-                product_data[f'FEATURE {i}'] = features[i - 1]
-            else:
-                product_data[f'FEATURE {i}'] = ""
+            fields['short_description'] = ' '.join([item.text_content().strip() for item in short_desc_items])
 
-        # Update the Description with dynamic features
-        product_data['Description'] = product_data['Description'].replace("{FEATURE 1}", product_data['FEATURE 1'])
-        product_data['Description'] = product_data['Description'].replace("{FEATURE 2}", product_data['FEATURE 2'])
-        product_data['Description'] = product_data['Description'].replace("{FEATURE 3}", product_data['FEATURE 3'])
-        product_data['Description'] = product_data['Description'].replace("{FEATURE 4}", product_data['FEATURE 4'])
+        # Extract Features
+        features_elements = PRODUCT_FEATURES(main, tree)
+        fields['features'] = [feature.strip() for feature in features_elements if feature.strip()]
 
-        # Update the Description with the dynamic values
-        # product_data['Description'] = product_data['Description'].replace("{PRODUCT NAME}", product_data['Name'])
-        product_data['Description'] = product_data['Description'].replace("{SHORT DESCRIPTION}", product_data['Short description'])
-        
         # Extract Categories
-        category_elements = tree.xpath('/html/body/div[4]/main/div[2]/div/div[2]/div/div[2]/div/div[1]/ul/li[2]')
+        category_elements = PRODUCT_CATEGORY(main)
         if category_elements:
-            category = category_elements[0].text_content().strip()
-            standardized_category = standardize_category(category)
-            if standardized_category in ["Cables and accessories", "Software License"]:
-                product_data['Categories'] = standardized_category
-            else:
-                product_data['Categories'] = f"Networking, Networking > {standardized_category}"
-
+            fields['category'] = category_elements[0].text_content().strip()
 
-        # Set Tags
-        product_data['Tags'] = f"{product_data['Attribute 1 value(s)']},{standardized_category}"
-
-        # Add product URL
-        product_data['Product URL'] = url
-
-        # Extract specifications and generate table
-        specs, card_pro_name, card_pro_des = extract_product_specs(url)
+        # Extract specifications
+        specs, card_pro_name, card_pro_des = extract_product_specs(tree, main)
         if isinstance(specs, dict):
-            table_html = generate_html_table(specs)
-            product_data['Description'] += table_html  # Append table to the existing description
+            fields['specs'] = specs
+        fields['card_pro_name'] = card_pro_name
+        fields['card_pro_des'] = card_pro_des
+        logger.debug("Card: %s / %s", card_pro_name, card_pro_des, extra={'url': url})
 
-        # Update the Description with card_pro_name and card_pro_des
-        product_data['Description'] = product_data['Description'].replace("{card_pro_name}", card_pro_name)
-        product_data['Description'] = product_data['Description'].replace("{card_pro_des}", card_pro_des)
-        print(card_pro_des, card_pro_name)
-        
         # Extract Manufacture Code
-        manufacture_code_element = tree.xpath('//div[@class="manufacture-code"]/span/text()')
+        manufacture_code_element = PRODUCT_MANUFACTURE_CODE(main, tree)
         if manufacture_code_element:
-            manufacture_code = manufacture_code_element[0].replace('Manufacture#:', '').strip()
-            product_data['Product Code'] = manufacture_code
-            product_data['Meta: _product_code'] = manufacture_code
-    
+            fields['product_code'] = manufacture_code_element[0].replace('Manufacture#:', '').strip()
 
     except Exception as e:
-        print(f"Error extracting data: {str(e)}")
+        logger.warning("Error extracting data: %s", e, extra={'url': url})
+
+    return fields
+
+def convert_price(price_gbp):
+    if price_gbp is None:
+        return ''
+    return round(price_gbp * fx_rate.get_gbp_to_inr_rate(), 2)
+
+# Build the WooCommerce row for a product from its extracted fields
+def build_product_row(fields):
+    product_data = {
+        'ID': '',
+        'Type': 'simple',
+        'SKU': fields['sku'],
+        'Name': fields['name'],
+        'Published': 1,
+        'Is featured?': 0,
+        'Visibility in catalog': 'visible',
+        'Short description': fields['short_description'],
+        'Description': '',
+        'Date sale price starts': '',
+        'Tax status': 'taxable',
+        'Tax class': '',
+        'In stock?': 1,
+        'Stock': '',
+        'Regular price': convert_price(fields['price_gbp']),  # INR price
+        'Categories': '',
+        'Tags': fields['brand'],
+        'Images': '',
+        'Attribute 1 name': 'brand',
+        'Attribute 1 value(s)': fields['brand'],
+        'Attribute 1 visible': 1,
+        'Attribute 1 global': 1,
+        'Product URL': fields['url'],
+        'Product Code': fields['product_code'],
+        'Meta: _product_code': fields['product_code'],
+    }
+
+    if fields['image_url']:
+        product_data['image_url'] = fields['image_url']
+
+    # Prepare a list of features, ensuring it has exactly 4 elements (with placeholders for missing ones)
+    features = fields['features']
+    for i in range(1, 5):
+        if i <= len(features):
+            product_data[f'FEATURE {i}'] = features[i - 1]
+        else:
+            product_data[f'FEATURE {i}'] = ""
+
+    if fields['category'] is not None:
+        standardized_category = standardize_category(fields['category'])
+        if standardized_category in ["Cables and accessories", "Software License"]:
+            product_data['Categories'] = standardized_category
+        else:
+            product_data['Categories'] = f"Networking, Networking > {standardized_category}"
+        # Set Tags
+        product_data['Tags'] = f"{fields['brand']},{standardized_category}"
+
+    # Kept with the row so columnar outputs can store them instead of the HTML
+    product_data['description_params'] = {
+        'card_pro_name': fields['card_pro_name'],
+        'card_pro_des': fields['card_pro_des'],
+        'SPEC TABLE': generate_html_table(fields['specs']) if fields['specs'] is not None else '',
+    }
+    # The image slot stays a placeholder until the image has been
+    # downloaded (see apply_image)
+    product_data['Description'] = render_description(product_data)
 
     return product_data
 
-# Modify the extract_product_urls function
-def extract_product_urls(start_page, end_page):
+# Fill the description template in one pass from a row's columns and its
+# description_params; also rebuilds Description for rows read back from
+# a Parquet or Arrow file
+def render_description(row):
+    params = row.get('description_params') or {}
+    return DESCRIPTION_TEMPLATE.render({
+        'FEATURE 1': row.get('FEATURE 1', ''),
+        'FEATURE 2': row.get('FEATURE 2', ''),
+        'FEATURE 3': row.get('FEATURE 3', ''),
+        'FEATURE 4': row.get('FEATURE 4', ''),
+        'SHORT DESCRIPTION': row.get('Short description', ''),
+        'card_pro_name': params.get('card_pro_name', ''),
+        'card_pro_des': params.get('card_pro_des', ''),
+        'IMAGE': row.get('Images') or None,
+        'SPEC TABLE': params.get('SPEC TABLE', ''),
+    })
+
+def extract_product_data(tree, url):
+    return build_product_row(extract_product_fields(tree, url))
+
+# Ask for the category to scrape
+def prompt_listing_source():
     base_url = input("Enter the base URL (e.g., https://www.stonegroup.co.uk/hardware/storage-and-memory/): ")
     brand_id = input("Enter the brand ID (e.g., 6409) or press Enter if none: ")
+    return base_url, brand_id
+
+def listing_page_url(base_url, brand_id, page):
+    if brand_id:
+        return f"{base_url}?brand={brand_id}&p={page}"
+    return f"{base_url}?p={page}"
+
+# Listing pages fetched concurrently during discovery
+LISTING_WORKERS = 5
+
+# Image downloads run on their own threads; resizing runs in a process pool
+IMAGE_WORKERS = 10
+# Rows waiting on an image download; the scrape loop waits for one to
+# finish before starting more, so held rows stay bounded
+MAX_PENDING_IMAGES = IMAGE_WORKERS * 4
+RESIZE_WORKERS = os.cpu_count()
+
+# Product links found on one listing page
+def parse_product_links(content):
+    if not content or not content.strip():
+        return []
+    tree = html.fromstring(content)
     product_links = []
-    
+    for container in LISTING_PRODUCT_CONTAINER(tree):
+        link = LISTING_PRODUCT_LINK(container)
+        if link:
+            product_links.append(str(link[0]))
+    return product_links
+
+def fetch_product_links(url):
+    with metrics.STAGE_SECONDS.time(stage="listing"):
+        response = http_client.get(url)
+        response.raise_for_status()
+        metrics.RESPONSE_BYTES.observe(len(response.content), kind="listing")
+        return parse_product_links(response.content)
+
+# Yield product URLs as listing pages complete. Up to LISTING_WORKERS pages
+# are in flight at once; discovery stops scheduling new pages once a page
+# has no products or only repeats links already seen (Magento serves the
+# last page again for out-of-range ?p= values).
+def iter_product_urls(start_page, end_page, base_url, brand_id, workers=LISTING_WORKERS):
+    seen = set()
+    last_page = end_page
+    next_page = start_page
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+
+        def schedule():
+            nonlocal next_page
+            while len(pending) < workers and next_page <= last_page:
+                future = executor.submit(fetch_product_links, listing_page_url(base_url, brand_id, next_page))
+                pending[future] = next_page
+                next_page += 1
+
+        schedule()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                page = pending.pop(future)
+                new_links = [link for link in future.result() if link not in seen]
+                if not new_links:
+                    last_page = min(last_page, page - 1)
+                for link in new_links:
+                    seen.add(link)
+                    yield link
+            schedule()
+
+# Modify the extract_product_urls function
+def extract_product_urls(start_page, end_page, base_url=None, brand_id=None):
+    if base_url is None:
+        base_url, brand_id = prompt_listing_source()
+
     with Progress(
         SpinnerColumn(),
         TextColumn("[progress.description]{task.description}"),
-        BarColumn(),
-        TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
+        TextColumn("{task.completed} found"),
         TimeElapsedColumn()
     ) as progress:
-        task = progress.add_task("[cyan]Collecting product URLs...", total=end_page - start_page + 1)
-        
-        for page in range(start_page, end_page + 1):
-            url = f"{base_url}?p={page}"
-            if brand_id:
-                url = f"{base_url}?brand={brand_id}&p={page}"
-                
-            response = requests.get(url)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            product_containers = soup.find_all('div', class_='product-item-info')
-            
-            for container in product_containers:
-                link = container.find('a', class_='product-item-link')
-                if link:
-                    product_links.append(link['href'])
-                    
+        task = progress.add_task("[cyan]Collecting product URLs...", total=None)
+        product_links = []
+        for link in iter_product_urls(start_page, end_page, base_url, brand_id):
+            product_links.append(link)
             progress.update(task, advance=1)
-            
+
     return product_links
 
-import re
+# Run process_url over URLs as they are discovered and yield each result as
+# soon as it is ready, so product scraping overlaps listing discovery.
+def scrape_as_discovered(executor, process_url, product_urls, on_discovered=None):
+    finished = queue.Queue()
+    submitted = 0
+    discovery_error = []
 
-def download_image(image_url, product_code, save_directory):
+    def submit_all():
+        nonlocal submitted
+        try:
+            for url in product_urls:
+                executor.submit(process_url, url).add_done_callback(finished.put)
+                submitted += 1
+                if on_discovered:
+                    on_discovered(submitted)
+        except Exception as e:
+            discovery_error.append(e)
+        finally:
+            finished.put(None)
+
+    discovery = threading.Thread(target=submit_all, daemon=True)
+    discovery.start()
+
+    received = 0
+    discovery_done = False
+    while not discovery_done or received < submitted:
+        future = finished.get()
+        if future is None:
+            discovery_done = True
+            continue
+        received += 1
+        yield future.result()
+
+    if discovery_error:
+        raise discovery_error[0]
+
+# Parse a downloaded product page into its fields. This is the CPU-heavy
+# stage; it takes and returns plain data so it can run in a process pool
+# (see --parse-workers), with only the small fields dict sent back.
+def parse_product_fields(content, url):
+    with metrics.profile_parse():
+        return extract_product_fields(html.fromstring(content), url)
+
+# The row for a parsed product. With an incremental `catalog`, a product
+# whose fingerprint matches the previous run comes back as a small marker
+# row instead, skipping the description and spec table.
+def product_row(fields, url, catalog=None):
+    if catalog is not None:
+        fingerprint = product_fingerprint(fields, convert_price(fields['price_gbp']))
+        if catalog.is_unchanged(url, fingerprint):
+            return {'Product Code': fields['product_code'], 'Name': fields['name'], 'unchanged': True}
+    return build_product_row(fields)
+
+# Parse a downloaded product page and extract its row
+def parse_product_page(content, url, catalog=None):
+    return product_row(parse_product_fields(content, url), url, catalog)
+
+def image_filename(product_code):
     # Clean the product code to create a valid filename
     safe_product_code = re.sub(r'[^\w\-_\. ]', '_', product_code)
     # Remove spaces and replace with underscores
     safe_product_code = safe_product_code.replace(' ', '_')
-    filename = f"{safe_product_code}.jpg"
-    
-    # URL encode the filename for the web URL
-    encoded_filename = quote(filename)
+    return f"{safe_product_code}.jpg"
+
+def encode_image_url(image_url):
+    # Handle URLs with spaces and special characters
+    if ' ' in image_url or '%' in image_url:
+        image_url = quote(image_url, safe=':/?=&')
+    return image_url
+
+def is_image_content_type(content_type):
+    return 'image' in (content_type or '').lower()
+
+# Where the product's image will be published on the shop
+def published_image_url(product_code):
+    current_date = datetime.now()
+    year = current_date.year
+    month = current_date.strftime("%m")
+    # Use encoded filename in the final URL
+    return f"https://www.movantechonline.com/wp-content/uploads/{year}/{month}/{quote(image_filename(product_code))}"
+
+def count_image_bytes(chunks):
+    size = 0
+    for chunk in chunks:
+        size += len(chunk)
+        yield chunk
+    metrics.RESPONSE_BYTES.observe(size, kind="image")
+
+# Resize an image, in `resize_executor` (a process pool) when one is given
+def resize_downloaded_image(source_path, output_path, resize_executor=None):
+    with metrics.STAGE_SECONDS.time(stage="resize"):
+        if resize_executor is not None:
+            resize_executor.submit(resize_image, source_path, output_path).result()
+        else:
+            resize_image(source_path, output_path)
+
+# Write downloaded image chunks, resize them and return the published URL.
+# With the image store on, identical bytes are resized once and the
+# product's file is linked to the stored copy.
+def save_image(chunks, product_code, save_directory, resize_executor=None, image_url=None):
+    store = image_store.get_store()
+    if store is not None:
+        try:
+            digest = store.add(image_url, count_image_bytes(chunks),
+                               lambda source, output: resize_downloaded_image(source, output, resize_executor))
+            if digest is None:
+                logger.warning("Error processing image: resize produced no file",
+                               extra={'url': image_url, 'product_code': product_code})
+                return None
+            return link_stored_image(store, digest, product_code, save_directory)
+        except requests.RequestException:
+            # A failed download is reported by fetch_image
+            raise
+        except Exception as e:
+            logger.warning("Error processing image: %s", e, extra={'url': image_url, 'product_code': product_code})
+            return None
+
+    filename = image_filename(product_code)
     temp_filepath = os.path.join(save_directory, "temp_" + filename)
     final_filepath = os.path.join(save_directory, filename)
     
+    # Save original image temporarily
+    with open(temp_filepath, 'wb') as f:
+        for chunk in count_image_bytes(chunks):
+            f.write(chunk)
+    
     try:
-        print(f"Downloading image from: {image_url}")
+        # Preprocess and resize the image
+        resize_downloaded_image(temp_filepath, final_filepath, resize_executor)
         
-        # Handle URLs with spaces and special characters
-        if ' ' in image_url or '%' in image_url:
-            image_url = quote(image_url, safe=':/?=&')
-            
-        response = requests.get(image_url, stream=True)
-        response.raise_for_status()
-        
-        if 'image' not in response.headers.get('Content-Type', '').lower():
-            print(f"URL does not point to an image: {image_url}")
-            return None
+        # Clean up temporary file
+        if os.path.exists(temp_filepath):
+            os.remove(temp_filepath)
         
-        # Save original image temporarily
-        with open(temp_filepath, 'wb') as f:
-            for chunk in response.iter_content(8192):
-                f.write(chunk)
+        return published_image_url(product_code)
         
-        try:
-            # Preprocess and resize the image
-            resize_image(temp_filepath, final_filepath)
-            
-            # Clean up temporary file
-            if os.path.exists(temp_filepath):
-                os.remove(temp_filepath)
-            
-            current_date = datetime.now()
-            year = current_date.year
-            month = current_date.strftime("%m")
+    except Exception as e:
+        logger.warning("Error processing image: %s", e, extra={'product_code': product_code})
+        if os.path.exists(temp_filepath):
+            os.remove(temp_filepath)
+        if os.path.exists(final_filepath):
+            os.remove(final_filepath)
+        return None
+
+# Give a product the stored image `digest` and return its published URL
+def link_stored_image(store, digest, product_code, save_directory):
+    store.link(digest, os.path.join(save_directory, image_filename(product_code)), product_code)
+    return published_image_url(product_code)
+
+def download_image(image_url, product_code, save_directory, resize_executor=None):
+    store = image_store.get_store()
+    if store is None:
+        return fetch_image(image_url, product_code, save_directory, resize_executor)
+    # An image already stored from this URL is not downloaded again
+    with store.url_lock(image_url):
+        digest = store.lookup(image_url)
+        if digest is not None:
+            try:
+                return link_stored_image(store, digest, product_code, save_directory)
+            except OSError as e:
+                logger.warning("Error linking stored image: %s", e,
+                               extra={'url': image_url, 'product_code': product_code})
+        return fetch_image(image_url, product_code, save_directory, resize_executor)
+
+# The "image" stage time includes the resize, which is also timed on its own
+def fetch_image(image_url, product_code, save_directory, resize_executor=None):
+    try:
+        logger.debug("Downloading image from: %s", image_url, extra={'product_code': product_code})
+        request_url = encode_image_url(image_url)
             
-            # Use encoded filename in the final URL
-            new_image_url = f"https://www.movantechonline.com/wp-content/uploads/{year}/{month}/{encoded_filename}"
+        with metrics.STAGE_SECONDS.time(stage="image"):
+            response = http_client.get(request_url, stream=True)
+            response.raise_for_status()
             
-            return new_image_url
+            if not is_image_content_type(response.headers.get('Content-Type')):
+                logger.warning("URL does not point to an image: %s", request_url,
+                               extra={'url': request_url, 'product_code': product_code})
+                return None
             
-        except Exception as e:
-            print(f"Error processing image: {str(e)}")
-            if os.path.exists(temp_filepath):
-                os.remove(temp_filepath)
-            if os.path.exists(final_filepath):
-                os.remove(final_filepath)
-            return None
+            return save_image(response.iter_content(8192), product_code, save_directory, resize_executor,
+                              image_url)
         
     except requests.RequestException as e:
-        print(f"Error downloading image for {product_code}: {str(e)}")
+        logger.warning("Error downloading image for %s: %s", product_code, e,
+                       extra={'url': image_url, 'product_code': product_code})
         return None
 
-def scrape_stone_group():
-    products_data = []
-    unique_product_codes = set()
-    
+# Fill in the image columns once the image download has finished
+def apply_image(product_data, new_image_url):
+    if new_image_url:
+        product_data['Images'] = new_image_url
+        product_data['Description'] = DESCRIPTION_TEMPLATE.fill(product_data['Description'], 'IMAGE', new_image_url)
+    else:
+        logger.warning("Failed to download image for %s", product_data['Name'],
+                       extra={'product_code': product_data['Product Code']})
+        product_data['Images'] = ''
+
+# Image published by an earlier run of this job, if its file is still on disk
+def checkpointed_image(journal, product_code, image_directory):
+    new_image_url = journal.images.get(product_code)
+    if new_image_url and os.path.exists(os.path.join(image_directory, image_filename(product_code))):
+        return new_image_url
+    return None
+
+# Remember which product a URL turned out to be, so later runs can skip it
+# before fetching once that product has been written
+def remember_product_code(url, product_code):
+    frontier = url_frontier.get_frontier()
+    if frontier is not None:
+        frontier.record_product(url, product_code)
+
+# Drop URLs the frontier has already seen in this run, or whose product
+# `is_claimed` already; dropped URLs are journaled as duplicates
+def admit_product_urls(product_urls, journal, is_claimed):
+    frontier = url_frontier.get_frontier()
+    if frontier is None:
+        return product_urls
+    return frontier.admit(product_urls, is_claimed, on_dropped=lambda url, reason: journal.record_duplicate(url))
+
+# Journal and write out a finished row once its image (if any) has been resolved
+def finish_product(journal, writer, url, product_data, new_image_url=None):
+    with metrics.STAGE_SECONDS.time(stage="write"):
+        if 'image_url' in product_data:
+            apply_image(product_data, new_image_url)
+            if new_image_url:
+                journal.record_image(product_data['Product Code'], new_image_url)
+            else:
+                journal.record_failure(url, "image", "image download failed")
+        journal.record_product(url, product_data)
+        writer.write(product_data)
+    remember_product_code(url, product_data['Product Code'])
+    metrics.PRODUCTS.inc(result="written")
+
+def scrape_stone_group(engine="threads", concurrency=None, checkpoint_path=None, resume=False,
+                       output_path='stone_group_products.csv', compress=False, incremental=False,
+                       parse_workers=None):
     start_page = int(input("Enter the starting page number: "))
     end_page = int(input("Enter the ending page number: "))
-    
-    product_urls = extract_product_urls(start_page, end_page)
-    total_products = len(product_urls)
-    
-    print(f"Found {total_products} products to scrape.")
-    
+    base_url, brand_id = prompt_listing_source()
+
+    # Resolve the FX rate up front so a missing rate stops the job here
+    # instead of failing every product
+    try:
+        print(f"GBP to INR rate: {fx_rate.get_gbp_to_inr_rate()}")
+    except fx_rate.FXRateError as e:
+        print(f"Error: {e}")
+        return
+
     image_directory = "product_images"
     os.makedirs(image_directory, exist_ok=True)
     print(f"Image directory created: {os.path.abspath(image_directory)}")
 
-    def process_url(url):
-        try:
-            response = requests.get(url)
-            tree = html.fromstring(response.content)
-            return extract_product_data(tree, url)
-        except Exception as e:
-            print(f"Error scraping {url}: {str(e)}")
-            return None
-
-    with Progress(
+    checkpoint_path = checkpoint_path or default_checkpoint_path(base_url, brand_id, start_page, end_page)
+    journal = CheckpointJournal(checkpoint_path, resume=resume)
+    if resume:
+        print(f"Resuming from {checkpoint_path}: {len(journal.done_urls)} product pages already done")
+
+    catalog = None
+    if incremental:
+        output_path = resolve_output_path(output_path, compress)
+        previous_path = prepare_previous_catalog(output_path, resume)
+        writer = catalog = IncrementalCatalog(ProductWriter(output_path), previous_path, journal)
+    else:
+        writer = ProductWriter(output_path, compress=compress)
+    try:
+        # Rows finished by an earlier run of this job go out first
+        for row in journal.iter_products():
+            writer.write(row)
+
+        if engine == "async":
+            import asyncio
+            from async_engine import scrape_async
+            asyncio.run(scrape_async(
+                start_page, end_page, base_url, brand_id, image_directory, journal, writer,
+                concurrency=concurrency or 100, catalog=catalog, parse_workers=parse_workers,
+            ))
+        else:
+            scrape_threaded(start_page, end_page, base_url, brand_id, image_directory, journal, writer,
+                            concurrency, catalog, parse_workers)
+    except BaseException:
+        # An incremental catalog only works out removals after a full run
+        if catalog is not None:
+            catalog.abort()
+        else:
+            writer.close()
+        raise
+    else:
+        writer.close()
+    finally:
+        journal.close()
+    print(f"Scraping completed. {writer.rows_written} products written to {writer.path}")
+    if catalog is not None:
+        print(f"Changes since the previous catalog written to {catalog.delta_path}")
+    return writer.path
+
+# Worker processes log with the same settings as this one
+def process_pool(workers):
+    return ProcessPoolExecutor(max_workers=workers, initializer=log_config.init_worker,
+                               initargs=log_config.worker_settings())
+
+# Executors and the Product Code dedup set behind the threaded pipeline.
+# A single scrape creates its own; a batch run shares one between all of
+# its jobs so they draw on the same worker pools and never write the same
+# product twice.
+class ThreadedPipeline:
+    def __init__(self, concurrency=None, parse_workers=None):
+        self.executor = ThreadPoolExecutor(max_workers=concurrency or http_client.MAX_WORKERS)
+        self.image_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS)
+        self.resize_executor = process_pool(RESIZE_WORKERS)
+        # Page parsing runs on the fetching thread unless parse workers are asked for
+        self.parse_executor = process_pool(parse_workers) if parse_workers else None
+        self.product_codes = set()
+        self.lock = threading.Lock()
+
+    def add_product_codes(self, codes):
+        with self.lock:
+            self.product_codes.update(codes)
+
+    def has_product_code(self, code):
+        with self.lock:
+            return code in self.product_codes
+
+    # True the first time a code is seen, False for duplicates
+    def claim_product_code(self, code):
+        with self.lock:
+            if code in self.product_codes:
+                return False
+            self.product_codes.add(code)
+            return True
+
+    def parse_product_page(self, content, url, catalog=None):
+        with metrics.STAGE_SECONDS.time(stage="parse"):
+            if self.parse_executor is None:
+                return parse_product_page(content, url, catalog)
+            fields = self.parse_executor.submit(parse_product_fields, content, url).result()
+            return product_row(fields, url, catalog)
+
+    def close(self):
+        self.executor.shutdown()
+        self.image_executor.shutdown()
+        self.resize_executor.shutdown()
+        if self.parse_executor is not None:
+            self.parse_executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def scrape_threaded(start_page, end_page, base_url, brand_id, image_directory, journal, writer,
+                    concurrency=None, catalog=None, parse_workers=None):
+    if concurrency:
+        http_client.configure(max_connections_per_host=concurrency)
+
+    with ThreadedPipeline(concurrency, parse_workers) as pipeline, Progress(
         SpinnerColumn(),
         TextColumn("[progress.description]{task.description}"),
         BarColumn(),
         TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
         TimeElapsedColumn()
     ) as progress:
-        task = progress.add_task("[cyan]Scraping Products...", total=len(product_urls))
-        
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            futures = []
-            for url in product_urls:
-                futures.append(executor.submit(process_url, url))
-
-            for future in as_completed(futures):
-                product_data = future.result()
-                if product_data and product_data['Product Code'] not in unique_product_codes:
-                    unique_product_codes.add(product_data['Product Code'])
-                    
-                    if 'image_url' in product_data:
-                        new_image_url = download_image(product_data['image_url'], product_data['Product Code'], image_directory)
-                        if new_image_url:
-                            product_data['Images'] = new_image_url
-                            product_data['Description'] = product_data['Description'].replace("{IMAGE}", new_image_url)
-                        else:
-                            print(f"Failed to download image for {product_data['Name']}")
-                            product_data['Images'] = ''
-                    
-                    print(f"Scraped: {product_data['Name']}")
-                    products_data.append(product_data)
-                progress.update(task, advance=1)
-    
-    print("Scraping completed. Exporting data to CSV...")
-    df = pd.DataFrame(products_data)
-    df.to_csv('stone_group_products.csv', index=False)
-    print("Data exported successfully to stone_group_products.csv")
-
+        total_products = run_threaded_job(
+            pipeline, progress, "Scraping Products...",
+            start_page, end_page, base_url, brand_id, image_directory, journal, writer, catalog,
+        )
 
-if __name__ == "__main__":
-    scrape_stone_group()
+    print(f"Found {total_products} products to scrape.")
 
+# Discover and scrape one listing on `pipeline`, reporting to a task on
+# `progress`. Returns the number of product URLs discovered.
+def run_threaded_job(pipeline, progress, description, start_page, end_page, base_url, brand_id,
+                     image_directory, journal, writer, catalog=None):
+    pipeline.add_product_codes(journal.product_codes)
 
+    def process_url(url):
+        try:
+            with metrics.STAGE_SECONDS.time(stage="product_fetch"):
+                response = http_client.get(url)
+                # Retries are exhausted by now; record a failure rather than an empty row
+                response.raise_for_status()
+                metrics.RESPONSE_BYTES.observe(len(response.content), kind="product")
+            return url, pipeline.parse_product_page(response.content, url, catalog)
+        except Exception as e:
+            logger.error("Error scraping %s: %s", url, e, extra={'url': url})
+            journal.record_failure(url, "product", e)
+            metrics.PRODUCTS.inc(result="failed")
+            return url, None
+
+    task = progress.add_task(f"[cyan]{description}", total=None)
+    product_urls = admit_product_urls(journal.pending_urls(journal.discover(
+        iter_product_urls(start_page, end_page, base_url, brand_id))), journal, pipeline.has_product_code)
+    total_products = 0
+
+    def on_discovered(found):
+        nonlocal total_products
+        total_products = found
+        progress.update(task, total=found)
+
+    image_futures = {}
+
+    # Journal and write the rows whose image has resolved, waiting up to
+    # `timeout` seconds for one (None: until one is done)
+    def finish_images(timeout=0, return_when=FIRST_COMPLETED):
+        if not image_futures:
+            return
+        done, _ = wait(image_futures, timeout=timeout, return_when=return_when)
+        for image_future in done:
+            url, product_data = image_futures.pop(image_future)
+            finish_product(journal, writer, url, product_data, image_future.result())
+
+    results = scrape_as_discovered(
+        pipeline.executor, process_url, product_urls,
+        on_discovered=on_discovered,
+    )
+    for url, product_data in results:
+        if product_data and product_data.get('unchanged'):
+            pipeline.add_product_codes([product_data['Product Code']])
+            journal.record_unchanged(url)
+            remember_product_code(url, product_data['Product Code'])
+            metrics.PRODUCTS.inc(result="unchanged")
+        elif product_data and pipeline.claim_product_code(product_data['Product Code']):
+            # Images download in the background; the row is completed
+            # when its image future resolves
+            if 'image_url' in product_data:
+                new_image_url = checkpointed_image(journal, product_data['Product Code'], image_directory)
+                if new_image_url:
+                    finish_product(journal, writer, url, product_data, new_image_url)
+                else:
+                    while len(image_futures) >= MAX_PENDING_IMAGES:
+                        finish_images(timeout=None)
+                    image_future = pipeline.image_executor.submit(
+                        download_image, product_data['image_url'], product_data['Product Code'],
+                        image_directory, pipeline.resize_executor,
+                    )
+                    image_futures[image_future] = (url, product_data)
+            else:
+                finish_product(journal, writer, url, product_data)
+
+            logger.debug("Scraped: %s", product_data['Name'],
+                         extra={'url': url, 'product_code': product_data['Product Code']})
+        elif product_data:
+            journal.record_duplicate(url)
+            remember_product_code(url, product_data['Product Code'])
+            metrics.PRODUCTS.inc(result="duplicate")
+        finish_images()
+        progress.update(task, advance=1)
+
+    finish_images(timeout=None, return_when=ALL_COMPLETED)
+    return total_products
+
+
+# RequestScheduler options given on the command line
+def rate_limit_options(args):
+    options = {'rate': args.rate, 'burst': args.burst, 'retries': args.retries,
+               'latency_target': args.latency_target}
+    return {name: value for name, value in options.items() if value is not None}
+
+# HTTP cache, rate limit, FX rate and image store flags shared with
+# batch_runner and the distributed workers
+def add_fetch_arguments(parser):
+    parser.add_argument("--cache-dir", default=None,
+                        help="keep a disk HTTP cache here and revalidate it with conditional GETs")
+    parser.add_argument("--cache-ttl", type=float, default=None,
+                        help="seconds a cached response is used without revalidation (default 0)")
+    parser.add_argument("--cache-max-mb", type=float, default=None,
+                        help="evict least recently used cache entries above this size")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="maximum requests per second to each host (default: no fixed limit)")
+    parser.add_argument("--burst", type=int, default=None, help="requests allowed at once above --rate")
+    parser.add_argument("--retries", type=int, default=None,
+                        help=f"retries for 429/5xx responses and timeouts (default {rate_limiter.DEFAULT_RETRIES})")
+    parser.add_argument("--latency-target", type=float, default=None,
+                        help="seconds; slower responses make the per-host concurrency back off")
+    parser.add_argument("--fx-rate", type=float, default=None,
+                        help=f"GBP to INR rate to use instead of fetching one (or set {fx_rate.FX_RATE_ENV})")
+    parser.add_argument("--fx-cache-ttl", type=float, default=None,
+                        help=f"seconds a fetched FX rate is reused (default {fx_rate.FX_CACHE_TTL})")
+    parser.add_argument("--image-store", default=image_store.IMAGE_STORE_DIRECTORY,
+                        help="keep each distinct image here once, resized, and link products to it; an image "
+                             "URL already stored is reused until --image-store-ttl runs out")
+    parser.add_argument("--image-store-ttl", type=float, default=image_store.DEFAULT_URL_TTL,
+                        help="seconds before a stored image URL is downloaded again to pick up a changed image "
+                             f"(default {image_store.DEFAULT_URL_TTL}); with --cache-dir that is a conditional GET")
+    parser.add_argument("--no-image-store", action="store_true",
+                        help="download and resize every product's image separately")
+
+def configure_fetching(args):
+    if args.cache_dir:
+        http_client.configure_cache(
+            args.cache_dir, ttl=args.cache_ttl,
+            max_bytes=args.cache_max_mb * 1024 ** 2 if args.cache_max_mb else None,
+        )
+    http_client.configure_rate_limit(**rate_limit_options(args))
+    fx_rate.configure(rate=args.fx_rate, ttl=args.fx_cache_ttl)
+    image_store.configure(None if args.no_image_store else args.image_store, args.image_store_ttl)
+
+# URL frontier flags shared with batch_runner; distributed crawls dedup
+# through their work queue instead
+def add_frontier_arguments(parser):
+    parser.add_argument("--frontier", default=url_frontier.FRONTIER_DIRECTORY,
+                        help="remember discovered URLs and their product codes here across runs")
+    parser.add_argument("--no-frontier", action="store_true",
+                        help="fetch every discovered URL, including ones already seen this run")
+
+def configure_frontier(args):
+    url_frontier.configure(None if args.no_frontier else args.frontier)
+
+# Metrics flags shared with batch_runner
+def add_metrics_arguments(parser):
+    parser.add_argument("--report", default=None,
+                        help="JSON run report written at exit (default: <output>.report.json)")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve Prometheus metrics on this port at /metrics while the job runs")
+    parser.add_argument("--profile-parse", choices=["cprofile", "pyinstrument"], default=None,
+                        help="profile product page parsing and write the profile at exit")
+    parser.add_argument("--profile-output", default=None,
+                        help="profile path (default: parse_profile.prof, or parse_profile.html for pyinstrument)")
+
+# Logging flags shared with batch_runner
+def add_logging_arguments(parser):
+    parser.add_argument("--log-level", action="append", default=[], metavar="[LOGGER=]LEVEL",
+                        help="log level, or one logger's level (e.g. main=DEBUG); repeatable (default INFO)")
+    parser.add_argument("--log-json", action="store_true", help="log one JSON object per line")
+    parser.add_argument("--log-file", default=None, help="log to this file instead of stderr")
+
+def configure_logging(args):
+    log_config.configure_logging(args.log_level, json_format=args.log_json, path=args.log_file)
+
+def check_metrics_arguments(parser, args):
+    if args.profile_parse and args.parse_workers:
+        parser.error("--profile-parse profiles in-process parsing only; drop --parse-workers")
+
+# Start the report, the /metrics endpoint and the parse profiler as asked
+def configure_metrics(args, default_report):
+    metrics.write_report_at_exit(args.report or default_report)
+    if args.metrics_port is not None:
+        server = metrics.serve_prometheus(args.metrics_port)
+        print(f"Prometheus metrics on http://127.0.0.1:{server.server_port}/metrics")
+    if args.profile_parse:
+        metrics.configure_profiler(args.profile_parse, args.profile_output)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape Stone Group products into a WooCommerce CSV")
+    parser.add_argument("--engine", choices=["threads", "async"], default="threads",
+                        help="threads: ThreadPoolExecutor pipeline; async: asyncio pipeline")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="worker threads (threads engine) or requests in flight (async engine)")
+    parser.add_argument("--parse-workers", type=int, default=None,
+                        help="parse product pages in this many processes instead of on the fetching threads")
+    parser.add_argument("--checkpoint", default=None,
+                        help="checkpoint journal path (default: checkpoints/<job hash>.jsonl)")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue from the checkpoint journal instead of starting over")
+    parser.add_argument("--output", default="stone_group_products.csv",
+                        help="output file; .jsonl writes JSON lines, .parquet or .arrow a columnar catalog "
+                             "(render it to CSV with catalog_export.py), a .gz suffix compresses")
+    parser.add_argument("--gzip", action="store_true", help="gzip the output file")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only rebuild products that changed since the previous output; "
+                             "also writes <output>.delta.csv")
+    add_fetch_arguments(parser)
+    add_frontier_arguments(parser)
+    parser.add_argument("--publish", default=None, metavar="SHOP_URL",
+                        help="upsert the catalog into this WooCommerce shop after scraping; credentials "
+                             "come from WC_CONSUMER_KEY and WC_CONSUMER_SECRET")
+    parser.add_argument("--publish-journal", default=None,
+                        help="upload journal used to skip products the shop already has unchanged "
+                             "(default: one per shop in checkpoints/)")
+    add_metrics_arguments(parser)
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    check_metrics_arguments(parser, args)
+    # woocommerce_uploader imports from this module, so it is loaded here
+    from woocommerce_uploader import woocommerce_credentials
+    if args.publish and not woocommerce_credentials():
+        parser.error("--publish needs WC_CONSUMER_KEY and WC_CONSUMER_SECRET in the environment")
+    return args
 
 
+if __name__ == "__main__":
+    args = parse_args()
+    configure_logging(args)
+    configure_fetching(args)
+    configure_frontier(args)
+    configure_metrics(args, sidecar_path(args.output, 'report', '.json'))
+    catalog_path = scrape_stone_group(engine=args.engine, concurrency=args.concurrency,
+                                      checkpoint_path=args.checkpoint, resume=args.resume,
+                                      output_path=args.output, compress=args.gzip,
+                                      incremental=args.incremental, parse_workers=args.parse_workers)
+    if args.publish and catalog_path:
+        from woocommerce_uploader import publish_catalog
+        summary = publish_catalog(catalog_path, args.publish, args.publish_journal)
+        print(f"Published to {args.publish}: {summary}")
@@ -0,0 +1,321 @@
+import atexit
+import bisect
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BYTES_BUCKETS = tuple(1024 * 4 ** i for i in range(8))
+
+
+def _label_key(label_names, labels):
+    if set(labels) != set(label_names):
+        raise ValueError(f"expected labels {label_names}, got {tuple(labels)}")
+    return tuple(str(labels[name]) for name in label_names)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(label_names, key, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(label_names, key)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+# Monotonic count per label combination, e.g. HTTP_REQUESTS.inc(status=200)
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, label_names=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.label_names, labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def reset(self):
+        with self.lock:
+            self.values.clear()
+
+    def report(self):
+        with self.lock:
+            values = dict(self.values)
+        if not self.label_names:
+            return values.get((), 0)
+        return {",".join(key): value for key, value in sorted(values.items())}
+
+    def prometheus_lines(self):
+        with self.lock:
+            values = sorted(self.values.items())
+        for key, value in values:
+            yield f"{self.name}{_label_text(self.label_names, key)} {value}"
+
+
+# Cumulative-bucket histogram per label combination, the same shape
+# Prometheus uses; quantiles in the JSON report are interpolated from the
+# buckets, so they are as precise as the bucket bounds
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.label_names, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "max": 0.0}
+            series["counts"][index] += 1
+            series["sum"] += value
+            series["max"] = max(series["max"], value)
+
+    # Times the block into this histogram, e.g. `with STAGE_SECONDS.time(stage="parse"):`
+    @contextlib.contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def reset(self):
+        with self.lock:
+            self.series.clear()
+
+    def quantile(self, counts, total, maximum, q):
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else maximum
+                return min(maximum, lower + (upper - lower) * (rank - seen) / count)
+            seen += count
+        return maximum
+
+    def report(self):
+        with self.lock:
+            series = {key: {"counts": list(s["counts"]), "sum": s["sum"], "max": s["max"]}
+                      for key, s in self.series.items()}
+        result = {}
+        for key, s in sorted(series.items()):
+            total = sum(s["counts"])
+            result[",".join(key)] = {
+                "count": total,
+                "sum": s["sum"],
+                "mean": s["sum"] / total if total else 0.0,
+                "p50": self.quantile(s["counts"], total, s["max"], 0.5),
+                "p95": self.quantile(s["counts"], total, s["max"], 0.95),
+                "max": s["max"],
+            }
+        if not self.label_names:
+            return result.get("", {"count": 0})
+        return result
+
+    def prometheus_lines(self):
+        with self.lock:
+            series = sorted((key, list(s["counts"]), s["sum"]) for key, s in self.series.items())
+        for key, counts, total_sum in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket{_label_text(self.label_names, key, [('le', le)])} {cumulative}"
+            yield f"{self.name}_sum{_label_text(self.label_names, key)} {total_sum}"
+            yield f"{self.name}_count{_label_text(self.label_names, key)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.started = time.time()
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def reset(self):
+        for metric in self.metrics:
+            metric.reset()
+        self.started = time.time()
+
+    def report(self, extra=None):
+        finished = time.time()
+        report = {
+            "started": datetime.fromtimestamp(self.started, timezone.utc).isoformat(),
+            "finished": datetime.fromtimestamp(finished, timezone.utc).isoformat(),
+            "duration_seconds": finished - self.started,
+            "command": sys.argv,
+            "metrics": {metric.name: metric.report() for metric in self.metrics},
+        }
+        if extra:
+            report.update(extra)
+        return report
+
+    # Prometheus text exposition format (version 0.0.4)
+    def prometheus_text(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.prometheus_lines())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.add(Histogram(
+    "scraper_stage_seconds", "Time spent in each pipeline stage", ["stage"]))
+RESPONSE_BYTES = REGISTRY.add(Histogram(
+    "scraper_response_bytes", "Size of downloaded response bodies", ["kind"], BYTES_BUCKETS))
+HTTP_REQUESTS = REGISTRY.add(Counter(
+    "scraper_http_requests_total", "HTTP responses received, retries included, by status", ["status"]))
+HTTP_RETRIES = REGISTRY.add(Counter(
+    "scraper_http_retries_total", "Requests retried by the scheduler, by status or exception", ["reason"]))
+CACHE_LOOKUPS = REGISTRY.add(Counter(
+    "scraper_cache_lookups_total", "HTTP cache lookups: hit, revalidated or miss", ["result"]))
+PRODUCTS = REGISTRY.add(Counter(
+    "scraper_products_total", "Product pages by outcome", ["result"]))
+IMAGE_STORE = REGISTRY.add(Counter(
+    "scraper_image_store_total", "Images by how the store served them: url_hit, url_stale, content_hit or stored",
+    ["result"]))
+FRONTIER = REGISTRY.add(Counter(
+    "scraper_frontier_urls_total",
+    "Discovered URLs by frontier decision: new, revisit, duplicate_url or duplicate_code", ["result"]))
+
+
+def report(extra=None):
+    return REGISTRY.report(extra)
+
+
+def write_report(path, extra=None):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(REGISTRY.report(extra), f, indent=2)
+
+
+# Write the JSON run report when the process exits, however the run ended
+def write_report_at_exit(path):
+    atexit.register(write_report, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Serve /metrics in Prometheus text format from a daemon thread, for
+# scrapes of long-running jobs
+def serve_prometheus(port, host="127.0.0.1"):
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+
+# Opt-in profiler for the parse path. One parse is profiled at a time and
+# concurrent parses run unprofiled, so profiling doesn't serialise the
+# workers (and cProfile allows only one active profiler on 3.12+). Results
+# accumulate across calls and are written at exit.
+class ParseProfiler:
+    def __init__(self, kind, path):
+        if kind == "pyinstrument" and pyinstrument is None:
+            raise RuntimeError("--profile-parse pyinstrument needs pyinstrument: pip install pyinstrument")
+        self.kind = kind
+        self.path = path
+        self.lock = threading.Lock()
+        if kind == "pyinstrument":
+            self.profiler = pyinstrument.Profiler()
+        else:
+            import cProfile
+            self.profiler = cProfile.Profile()
+        self.calls = 0
+
+    @contextlib.contextmanager
+    def profile(self):
+        if not self.lock.acquire(blocking=False):
+            yield
+            return
+        try:
+            if self.kind == "pyinstrument":
+                self.profiler.start()
+            else:
+                self.profiler.enable()
+            try:
+                yield
+            finally:
+                if self.kind == "pyinstrument":
+                    self.profiler.stop()
+                else:
+                    self.profiler.disable()
+                self.calls += 1
+        finally:
+            self.lock.release()
+
+    def write(self):
+        if not self.calls:
+            return
+        with self.lock:
+            if self.kind == "pyinstrument":
+                output = self.profiler.output_html() if self.path.endswith(".html") else self.profiler.output_text()
+                with open(self.path, "w", encoding="utf-8") as f:
+                    f.write(output)
+            else:
+                # Load with pstats, snakeviz or similar
+                self.profiler.dump_stats(self.path)
+        print(f"Parse profile of {self.calls} pages written to {self.path}")
+
+
+_profiler = None
+
+
+# Profile the parse path with "cprofile" or "pyinstrument"; kind=None turns it off
+def configure_profiler(kind, path=None):
+    global _profiler
+    if kind is None:
+        _profiler = None
+        return None
+    _profiler = ParseProfiler(kind, path or ("parse_profile.html" if kind == "pyinstrument" else "parse_profile.prof"))
+    atexit.register(_profiler.write)
+    return _profiler
+
+
+def profile_parse():
+    profiler = _profiler
+    return profiler.profile() if profiler is not None else contextlib.nullcontext()
@@ -0,0 +1,245 @@
+import csv
+import gzip
+import json
+import os
+import threading
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# WooCommerce import header, in the order of stone_group_products.csv
+PRODUCT_COLUMNS = [
+    'ID', 'Type', 'SKU', 'Name', 'Published', 'Is featured?', 'Visibility in catalog',
+    'Short description', 'Description', 'Date sale price starts', 'Tax status', 'Tax class',
+    'In stock?', 'Stock', 'Regular price', 'Categories', 'Tags', 'Images',
+    'Attribute 1 name', 'Attribute 1 value(s)', 'Attribute 1 visible', 'Attribute 1 global',
+    'Product URL', 'Product Code', 'Meta: _product_code', 'image_url',
+    'FEATURE 1', 'FEATURE 2', 'FEATURE 3', 'FEATURE 4',
+]
+
+DEFAULT_BATCH_SIZE = 50
+
+# Parquet and Arrow IPC files store Description as the template values it
+# is rendered from (see main.render_description); the features, short
+# description and image already have columns of their own
+DESCRIPTION_PARAMS = ['card_pro_name', 'card_pro_des', 'SPEC TABLE']
+COLUMNAR_COLUMNS = [column for column in PRODUCT_COLUMNS if column != 'Description'] + [
+    f'Description: {param}' for param in DESCRIPTION_PARAMS]
+# Few distinct values across a catalog, so stored as dictionary indexes
+DICTIONARY_COLUMNS = frozenset({
+    'Type', 'Visibility in catalog', 'Tax status', 'Categories', 'Tags', 'Attribute 1 name', 'Attribute 1 value(s)',
+})
+INTEGER_COLUMNS = frozenset({'Published', 'Is featured?', 'In stock?', 'Attribute 1 visible', 'Attribute 1 global'})
+FLOAT_COLUMNS = frozenset({'Regular price'})
+COLUMNAR_FORMATS = ('parquet', 'arrow')
+# Columnar files are written in record batches of at least this many rows
+COLUMNAR_BATCH_SIZE = 1000
+COLUMNAR_COMPRESSION = 'zstd'
+
+
+# Descriptions are large HTML blobs; allow fields well past csv's 128 KB default
+csv.field_size_limit(max(csv.field_size_limit(), 16 * 1024 * 1024))
+
+
+# csv, jsonl, parquet or arrow, taken from the file name (a trailing .gz is ignored)
+def output_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith('.parquet'):
+        return 'parquet'
+    if name.endswith(('.arrow', '.feather')):
+        return 'arrow'
+    return 'jsonl' if name.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+# The path ProductWriter actually writes to. Columnar files compress
+# their own pages, so they never get a .gz suffix.
+def resolve_output_path(path, compress=False):
+    if compress and not path.endswith('.gz') and output_format(path) not in COLUMNAR_FORMATS:
+        return path + '.gz'
+    return path
+
+
+# A file next to `path`: sidecar_path('out.csv.gz', 'previous') is
+# 'out.previous.csv.gz'; pass `extension` to replace the original one
+def sidecar_path(path, suffix, extension=None):
+    compressed = path.endswith('.gz')
+    name = path[:-3] if compressed else path
+    name, original_extension = os.path.splitext(name)
+    if extension is not None:
+        return f"{name}.{suffix}{extension}"
+    return f"{name}.{suffix}{original_extension}{'.gz' if compressed else ''}"
+
+
+def _open_text(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def _require_pyarrow(path):
+    if pa is None:
+        raise RuntimeError(f"Writing or reading {path} needs pyarrow: pip install pyarrow")
+
+
+def columnar_schema():
+    fields = []
+    for column in COLUMNAR_COLUMNS:
+        if column in DICTIONARY_COLUMNS:
+            fields.append(pa.field(column, pa.dictionary(pa.int32(), pa.string())))
+        elif column in INTEGER_COLUMNS:
+            fields.append(pa.field(column, pa.int8()))
+        elif column in FLOAT_COLUMNS:
+            fields.append(pa.field(column, pa.float64()))
+        else:
+            fields.append(pa.field(column, pa.string()))
+    return pa.schema(fields)
+
+
+def _columnar_value(row, column):
+    if column.startswith('Description: '):
+        value = (row.get('description_params') or {}).get(column[len('Description: '):])
+    else:
+        value = row.get(column)
+    if value is None or value == '':
+        return None if column in INTEGER_COLUMNS or column in FLOAT_COLUMNS else value
+    if column in INTEGER_COLUMNS:
+        return int(value)
+    if column in FLOAT_COLUMNS:
+        return float(value)
+    return str(value)
+
+
+# Product rows as Parquet row groups or Arrow IPC record batches. The
+# dictionary columns keep one growing dictionary for the whole file, so
+# each batch only adds the values it introduces.
+class ColumnarFile:
+    def __init__(self, path, format):
+        _require_pyarrow(path)
+        self.schema = columnar_schema()
+        self.dictionaries = {column: {} for column in DICTIONARY_COLUMNS}
+        if format == 'parquet':
+            self.writer = pq.ParquetWriter(path, self.schema, compression=COLUMNAR_COMPRESSION)
+        else:
+            options = pa.ipc.IpcWriteOptions(compression=COLUMNAR_COMPRESSION, emit_dictionary_deltas=True)
+            self.writer = pa.ipc.new_file(path, self.schema, options=options)
+
+    def _dictionary_array(self, column, values):
+        dictionary = self.dictionaries[column]
+        indices = [None if value is None else dictionary.setdefault(value, len(dictionary)) for value in values]
+        return pa.DictionaryArray.from_arrays(pa.array(indices, pa.int32()), pa.array(list(dictionary), pa.string()))
+
+    def write_rows(self, rows):
+        arrays = []
+        for field in self.schema:
+            values = [_columnar_value(row, field.name) for row in rows]
+            if field.name in DICTIONARY_COLUMNS:
+                arrays.append(self._dictionary_array(field.name, values))
+            else:
+                arrays.append(pa.array(values, field.type))
+        self.writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def _read_columnar(path, format):
+    _require_pyarrow(path)
+    if format == 'parquet':
+        batches = pq.ParquetFile(path).iter_batches()
+    else:
+        reader = pa.ipc.open_file(path)
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    for batch in batches:
+        for record in batch.to_pylist():
+            row = {column: '' if value is None else value for column, value in record.items()
+                   if not column.startswith('Description: ')}
+            row['description_params'] = {param: record.get(f'Description: {param}') or ''
+                                         for param in DESCRIPTION_PARAMS}
+            yield row
+
+
+# Stream product rows back from a file written by ProductWriter. Rows from
+# a columnar file carry 'description_params' instead of a Description.
+def read_products(path):
+    format = output_format(path)
+    if format in COLUMNAR_FORMATS:
+        yield from _read_columnar(path, format)
+        return
+    with _open_text(path, 'r') as f:
+        if output_format(path) == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+# Appends product rows to the output as they finish instead of holding the
+# whole catalog in memory. Rows are buffered and written `batch_size` at a
+# time; every batch is flushed to disk so a crashed run keeps its output.
+# Columns are fixed to PRODUCT_COLUMNS, extra keys on a row are dropped.
+# Parquet and Arrow files are written COLUMNAR_BATCH_SIZE rows at a time
+# with COLUMNAR_COLUMNS and are only readable once closed.
+class ProductWriter:
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE, compress=None):
+        path = resolve_output_path(path, compress)
+        self.path = path
+        self.format = output_format(path)
+        self.batch_size = batch_size
+        self.rows_written = 0
+        self.buffer = []
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self.format in COLUMNAR_FORMATS:
+            self.file = ColumnarFile(path, self.format)
+            self.batch_size = max(batch_size, COLUMNAR_BATCH_SIZE)
+            return
+        self.file = _open_text(path, 'w')
+
+        if self.format == 'csv':
+            self.csv_writer = csv.DictWriter(
+                self.file, fieldnames=PRODUCT_COLUMNS, extrasaction='ignore', lineterminator='\n')
+            self.csv_writer.writeheader()
+
+    def write(self, row):
+        with self.lock:
+            self.buffer.append(row)
+            if len(self.buffer) >= self.batch_size:
+                self._flush()
+
+    def _flush(self):
+        if not self.buffer:
+            return
+        if self.format == 'csv':
+            self.csv_writer.writerows(self.buffer)
+        elif self.format == 'jsonl':
+            for row in self.buffer:
+                record = {column: row.get(column, '') for column in PRODUCT_COLUMNS}
+                self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        else:
+            self.file.write_rows(self.buffer)
+        self.rows_written += len(self.buffer)
+        self.buffer = []
+        if self.format not in COLUMNAR_FORMATS:
+            self.file.flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,94 @@
+from lxml import etree
+
+# Class-token predicate equivalent to CSS/BeautifulSoup class matching
+def has_class(name):
+    return f'contains(concat(" ", normalize-space(@class), " "), " {name} ")'
+
+
+# A named XPath compiled once at import. It is evaluated against `context`
+# (usually the product's <main> element, see product_anchor) and, when that
+# finds nothing and a `document_path` is registered, against the whole
+# `tree` as a fallback, so a page that doesn't follow the usual template
+# still yields the same data the old whole-document scans did.
+class Selector:
+    def __init__(self, name, path, document_path=None):
+        self.name = name
+        self.path = path
+        self.document_path = document_path
+        self.xpath = etree.XPath(path)
+        self.document_xpath = etree.XPath(document_path) if document_path else None
+
+    def __call__(self, context, tree=None):
+        result = self.xpath(context) if context is not None else []
+        if not result and self.document_xpath is not None and tree is not None:
+            result = self.document_xpath(tree)
+        return result
+
+    def __repr__(self):
+        return f"Selector({self.name!r}, {self.path!r})"
+
+
+SELECTORS = {}
+
+
+def register(name, path, document_path=None):
+    if name in SELECTORS:
+        raise ValueError(f"selector {name!r} is already registered")
+    selector = Selector(name, path, document_path)
+    SELECTORS[name] = selector
+    return selector
+
+
+def get_selector(name):
+    return SELECTORS[name]
+
+
+# Every product field lives under the page's <main> element. Finding it
+# once and evaluating short relative paths from there avoids re-walking the
+# header and navigation for each field.
+PRODUCT_MAIN = register('product_main', '/html/body/div[4]/main')
+
+
+def product_anchor(tree):
+    main = PRODUCT_MAIN(tree)
+    return main[0] if main else None
+
+
+# Fixed-position fields, relative to <main>
+PRODUCT_NAME = register('product_name', 'div[2]/div/div[1]/div[1]/div[2]/h1/span')
+PRODUCT_BRAND = register('product_brand', 'div[2]/div/div[1]/div[1]/div[1]/div[1]/strong/text()')
+PRODUCT_PRICE = register('product_price', 'div[2]/div/div[1]/div[1]/div[3]/div[3]/span/span/span')
+PRODUCT_SHORT_DESCRIPTION = register(
+    'product_short_description', 'div[2]/div/div[2]/div/div[2]/div/div[2]/div[1]/div')
+PRODUCT_CATEGORY = register('product_category', 'div[2]/div/div[2]/div/div[2]/div/div[1]/ul/li[2]')
+
+# Fields found by searching: scoped to <main>, whole document as a fallback
+PRODUCT_IMAGE = register(
+    'product_image',
+    './/img[@class="gallery-placeholder__image"]/@src',
+    '//img[@class="gallery-placeholder__image"]/@src')
+PRODUCT_SKU = register(
+    'product_sku',
+    './/span[contains(text(), "SKU#:")]/text()',
+    '//span[contains(text(), "SKU#:")]/text()')
+PRODUCT_FEATURES = register(
+    'product_features',
+    './/ul[@class="short-overview"]/li/text()',
+    '//ul[@class="short-overview"]/li/text()')
+PRODUCT_MANUFACTURE_CODE = register(
+    'product_manufacture_code',
+    './/div[@class="manufacture-code"]/span/text()',
+    '//div[@class="manufacture-code"]/span/text()')
+
+# Specification table, used by extract_table
+SPEC_LEFT_COLUMN = register(
+    'spec_left_column', f'.//div[{has_class("column-left")}]', f'//div[{has_class("column-left")}]')
+SPEC_RIGHT_COLUMN = register(
+    'spec_right_column', f'.//div[{has_class("column-right")}]', f'//div[{has_class("column-right")}]')
+SPEC_ROW = register('spec_row', f'.//div[{has_class("specification-row")}]')
+SPEC_TITLE = register('spec_title', f'.//strong[{has_class("specification-row-title")}]')
+SPEC_INFO = register('spec_info', f'.//span[{has_class("specification-info")}]')
+
+# Listing pages: each product card contributes the first product link inside it
+LISTING_PRODUCT_CONTAINER = register('listing_product_container', f'//div[{has_class("product-item-info")}]')
+LISTING_PRODUCT_LINK = register('listing_product_link', f'(.//a[{has_class("product-item-link")}])[1]/@href')
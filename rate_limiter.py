@@ -0,0 +1,273 @@
+import asyncio
+import collections
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import metrics
+
+# Responses worth retrying, and the subset that means "slow down"
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+THROTTLE_STATUSES = frozenset({429, 503})
+
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_MAX = 30.0
+# A Retry-After longer than this is treated as this long
+MAX_RETRY_AFTER = 300.0
+
+DEFAULT_MAX_CONCURRENCY = 256
+DEFAULT_DECREASE_FACTOR = 0.5
+
+
+# Seconds to wait from a Retry-After header (delta-seconds or HTTP-date),
+# or None when it is missing or unparseable
+def parse_retry_after(value):
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+# Token bucket allowing `rate` requests per second with bursts of `burst`.
+# reserve() always takes a token, letting the balance go negative, and
+# returns how long the caller has to wait for it; concurrent callers are
+# therefore queued in order instead of polling.
+class TokenBucket:
+    def __init__(self, rate, burst=None):
+        if rate <= 0:
+            raise ValueError(f"rate must be positive, got {rate}")
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+# Resolve a coroutine's wait future on its own loop
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+# Additive-increase / multiplicative-decrease limit on requests in flight.
+# A healthy response raises the limit by 1/limit, about +1 per round trip,
+# but only while the window is actually full. An error, a throttling status
+# or a response slower than `latency_target` cuts it to `decrease_factor`
+# of what was in flight. Only requests sent after the last cut can cut it
+# again, so one burst of 429s halves the limit once instead of collapsing it.
+# Threads wait on the condition; coroutines park a future on their own loop
+# and release(), which is also where the limit grows, wakes as many of them
+# as there are free slots, oldest first.
+class AIMDLimiter:
+    def __init__(self, maximum=DEFAULT_MAX_CONCURRENCY, minimum=1, initial=None, latency_target=None,
+                 decrease_factor=DEFAULT_DECREASE_FACTOR):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.limit = float(initial or maximum)
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self.last_decrease = 0.0
+        self.condition = threading.Condition()
+        self.async_waiters = collections.deque()
+
+    def try_acquire(self):
+        with self.condition:
+            if self.in_flight >= max(self.minimum, int(self.limit)):
+                return False
+            self.in_flight += 1
+            return True
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= max(self.minimum, int(self.limit)):
+                self.condition.wait()
+            self.in_flight += 1
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self.condition:
+                if self.in_flight < max(self.minimum, int(self.limit)):
+                    self.in_flight += 1
+                    return
+                waiter = loop.create_future()
+                self.async_waiters.append((loop, waiter))
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # The wake may already have been spent on this waiter; pass it on
+                with self.condition:
+                    self._wake_async_waiters()
+                raise
+
+    # Called with the condition held
+    def _wake_async_waiters(self):
+        free = max(self.minimum, int(self.limit)) - self.in_flight
+        while free > 0 and self.async_waiters:
+            loop, waiter = self.async_waiters.popleft()
+            if waiter.done():
+                continue
+            try:
+                loop.call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:
+                # Its loop is closed, and the coroutine with it
+                continue
+            free -= 1
+
+    # `latency` is the seconds since the request was sent
+    def release(self, healthy, latency):
+        with self.condition:
+            in_flight = self.in_flight
+            self.in_flight -= 1
+            now = time.monotonic()
+            if healthy and (self.latency_target is None or latency <= self.latency_target):
+                if in_flight >= int(self.limit):
+                    self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            elif now - latency >= self.last_decrease:
+                self.last_decrease = now
+                self.limit = max(float(self.minimum), min(self.limit, in_flight) * self.decrease_factor)
+            self.condition.notify_all()
+            self._wake_async_waiters()
+
+
+# Throttling state for one origin host: an optional token bucket, the AIMD
+# window and a pause set by Retry-After that holds back every request to it
+class HostLimiter:
+    def __init__(self, rate=None, burst=None, **aimd_options):
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.concurrency = AIMDLimiter(**aimd_options)
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def pause(self, seconds):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    # Seconds to wait before the next request may be sent
+    def wait_time(self):
+        with self.lock:
+            delay = max(0.0, self.paused_until - time.monotonic())
+        if self.bucket is not None:
+            delay = max(delay, self.bucket.reserve())
+        return delay
+
+
+# Sends requests through a per-host HostLimiter and retries the transient
+# failures: RETRY_STATUSES responses and the exceptions the caller names.
+# Retries back off exponentially with full jitter, or for as long as the
+# server's Retry-After asks. `send` is any callable returning an object
+# with .status_code and .headers, so requests and httpx both fit.
+# `retries` overrides the scheduler's count for one call; a request that
+# is not safe to repeat is sent with retries=0 and only paced.
+class RequestScheduler:
+    def __init__(self, rate=None, burst=None, retries=DEFAULT_RETRIES, backoff_base=DEFAULT_BACKOFF_BASE,
+                 backoff_max=DEFAULT_BACKOFF_MAX, max_concurrency=DEFAULT_MAX_CONCURRENCY, latency_target=None):
+        self.rate = rate
+        self.burst = burst
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_concurrency = max_concurrency
+        self.latency_target = latency_target
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    def host(self, url):
+        netloc = urlparse(url).netloc
+        with self.lock:
+            limiter = self.hosts.get(netloc)
+            if limiter is None:
+                limiter = HostLimiter(self.rate, self.burst, maximum=self.max_concurrency,
+                                      latency_target=self.latency_target)
+                self.hosts[netloc] = limiter
+            return limiter
+
+    def backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return retry_after + random.uniform(0, self.backoff_base)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    # Delay before the next attempt after `response`, or None to return it
+    def _retry_delay(self, host, response, attempt, retries):
+        if response.status_code not in RETRY_STATUSES or attempt >= retries:
+            return None
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        if retry_after is not None and response.status_code in THROTTLE_STATUSES:
+            host.pause(retry_after)
+        metrics.HTTP_RETRIES.inc(reason=response.status_code)
+        return self.backoff(attempt, retry_after)
+
+    def call(self, url, send, retry_exceptions=(), retries=None):
+        retries = self.retries if retries is None else retries
+        host = self.host(url)
+        attempt = 0
+        while True:
+            time.sleep(host.wait_time())
+            host.concurrency.acquire()
+            start = time.monotonic()
+            try:
+                response = send()
+            except retry_exceptions as e:
+                host.concurrency.release(False, time.monotonic() - start)
+                if attempt >= retries:
+                    raise
+                metrics.HTTP_RETRIES.inc(reason=type(e).__name__)
+                delay = self.backoff(attempt)
+            except BaseException:
+                host.concurrency.release(False, time.monotonic() - start)
+                raise
+            else:
+                host.concurrency.release(response.status_code not in RETRY_STATUSES, time.monotonic() - start)
+                delay = self._retry_delay(host, response, attempt, retries)
+                if delay is None:
+                    return response
+                response.close()
+            attempt += 1
+            time.sleep(delay)
+
+    async def call_async(self, url, send, retry_exceptions=(), retries=None):
+        retries = self.retries if retries is None else retries
+        host = self.host(url)
+        attempt = 0
+        while True:
+            await asyncio.sleep(host.wait_time())
+            await host.concurrency.acquire_async()
+            start = time.monotonic()
+            try:
+                response = await send()
+            except retry_exceptions as e:
+                host.concurrency.release(False, time.monotonic() - start)
+                if attempt >= retries:
+                    raise
+                metrics.HTTP_RETRIES.inc(reason=type(e).__name__)
+                delay = self.backoff(attempt)
+            except BaseException:
+                host.concurrency.release(False, time.monotonic() - start)
+                raise
+            else:
+                host.concurrency.release(response.status_code not in RETRY_STATUSES, time.monotonic() - start)
+                delay = self._retry_delay(host, response, attempt, retries)
+                if delay is None:
+                    return response
+                await response.aclose()
+            attempt += 1
+            await asyncio.sleep(delay)
@@ -0,0 +1,74 @@
+import csv
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from category_classifier import CategoryClassifier, CATEGORY_RULES, standardize_category
+
+CATALOG = os.path.join(ROOT, "stone_group_products.csv")
+
+# Last segment of every Categories value in stone_group_products.csv and
+# what it maps to; none of them matches a rule, so each comes back as is
+CATALOG_CATEGORIES = {
+    "12 ml": "12 ml",
+    "34.7 ml": "34.7 ml",
+    "Black": "Black",
+    "Drum cartridge": "Drum cartridge",
+    "High capacity": "High capacity",
+    "Monitoring device": "Monitoring device",
+    "Original": "Original",
+    "Print ribbon cassette and paper kit": "Print ribbon cassette and paper kit",
+}
+
+# Mixed-case terms the old if-chain compared against lowercased text, so
+# they never matched; the classifier matches them on purpose
+REVIVED_TERMS = {
+    "1000Base-SX SC": "Cables and accessories",
+    "V2": "Network Adapter",
+    "Quad Port Adapter": "Network Adapter",
+    "ST1000SPEX43": "Network Adapter",
+    "1T1R 802.11ac": "Network Adapter",
+    "WiFi Card": "Network Adapter",
+    "Host": "USB Hub",
+}
+
+# Texts where rule order decides between several matching rules
+PRIORITY = {
+    "Campus Switch": "Access Point",
+    "Gen 2 USB Hub": "Monitoring device",
+    "USB Type-C to Ethernet Adapter": "Cables and accessories",
+    "Switch Subscription Licence": "Software License",
+    # "ft" is a cable term, and "software" contains it
+    "Software Licence": "Cables and accessories",
+    "8 Port USB Hub": "USB Hub",
+    "8 Port Serial Card": "Serial Adapter",
+    "SFP+ Transceiver Module": "SFP transceiver module",
+    "Inkjet Printer": "Inkjet Printer",
+}
+
+
+def catalog_categories():
+    with open(CATALOG, encoding="utf-8", newline="") as f:
+        return sorted({row["Categories"].split(">")[-1].strip() for row in csv.DictReader(f) if row["Categories"]})
+
+
+def test_catalog_categories_are_pinned():
+    assert catalog_categories() == sorted(CATALOG_CATEGORIES)
+
+
+@pytest.mark.parametrize("text, expected", sorted({**CATALOG_CATEGORIES, **REVIVED_TERMS, **PRIORITY}.items()))
+def test_standardize_category(text, expected):
+    assert standardize_category(text) == expected
+
+
+# Terms match in any case; the cached wrapper agrees with a fresh classifier
+@pytest.mark.parametrize("text, expected", sorted({**REVIVED_TERMS, **PRIORITY}.items()))
+def test_case_insensitive(text, expected):
+    classifier = CategoryClassifier(CATEGORY_RULES)
+    if expected != text:
+        assert classifier.classify(text.upper()) == expected
+        assert classifier.classify(text.lower()) == expected
+    assert classifier.classify(text) == standardize_category(text)
@@ -0,0 +1,53 @@
+import json
+import os
+import shutil
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from image_store import ImageStore
+
+
+def copy_resize(calls):
+    def resize(source, output):
+        calls.append(source)
+        shutil.copyfile(source, output)
+    return resize
+
+
+def test_url_is_reused_within_ttl(tmp_path):
+    calls = []
+    store = ImageStore(str(tmp_path), url_ttl=60)
+    digest = store.add("https://example.com/a.jpg", [b"image"], copy_resize(calls))
+    assert store.lookup("https://example.com/a.jpg") == digest
+    assert store.lookup("https://example.com/b.jpg") is None
+    assert store.locks == {}
+    store.close()
+
+
+def test_stale_url_is_fetched_again_and_relinked(tmp_path):
+    calls = []
+    store = ImageStore(str(tmp_path), url_ttl=-1)
+    digest = store.add("https://example.com/a.jpg", [b"image"], copy_resize(calls))
+    assert store.lookup("https://example.com/a.jpg") is None
+    # The same bytes again are not resized a second time
+    assert store.add("https://example.com/a.jpg", [b"image"], copy_resize(calls)) == digest
+    assert len(calls) == 1
+    # Changed bytes under the same URL become a new object
+    assert store.add("https://example.com/a.jpg", [b"changed"], copy_resize(calls)) != digest
+    assert len(calls) == 2
+    assert store.locks == {}
+    store.close()
+
+
+def test_manifest_entries_without_fetch_time_are_stale(tmp_path):
+    store = ImageStore(str(tmp_path), url_ttl=None)
+    digest = store.add("https://example.com/a.jpg", [b"image"], copy_resize([]))
+    store.close()
+    with open(tmp_path / "manifest.jsonl", "a", encoding="utf-8") as f:
+        f.write(json.dumps({"url": "https://example.com/old.jpg", "sha256": digest}) + "\n")
+
+    store = ImageStore(str(tmp_path), url_ttl=3600)
+    assert store.lookup("https://example.com/a.jpg") == digest
+    assert store.lookup("https://example.com/old.jpg") is None
+    store.close()
@@ -0,0 +1,150 @@
+import csv
+import os
+import random
+import sys
+import threading
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+from mock_woocommerce import make_server
+from rate_limiter import RequestScheduler
+from woocommerce_uploader import UploadJournal, WooCommerceClient, upload_catalog
+
+COLUMNS = ["Name", "SKU", "Product Code", "Regular price", "Categories", "Tags"]
+
+
+def catalog_rows(count, price="10"):
+    return [{
+        "Name": f"Product {i}",
+        # Every third row has no SKU and is keyed by its product code
+        "SKU": f"SKU-{i}" if i % 3 else "",
+        "Product Code": f"CODE-{i}",
+        "Regular price": price,
+        "Categories": "Networking, Networking > Switches" if i % 2 else "Networking, Networking > Cables",
+        "Tags": f"Brand {i % 2},Switches",
+    } for i in range(count)]
+
+
+def write_catalog(path, rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+
+@pytest.fixture
+def server():
+    server = make_server()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_client(server):
+    client = WooCommerceClient(f"http://127.0.0.1:{server.server_port}", server.key, server.secret, concurrency=1,
+                               scheduler=RequestScheduler(retries=10, backoff_base=0.001, backoff_max=0.01))
+    client.session.trust_env = False
+    return client
+
+
+def upload(server, catalog, journal_path, resume=True, **options):
+    client = make_client(server)
+    journal = UploadJournal(str(journal_path), client.api_url, resume=resume)
+    try:
+        return upload_catalog(catalog, client, journal, concurrency=1, **options)
+    finally:
+        journal.close()
+        client.close()
+
+
+def posts(server):
+    return {name: count for name, count in server.stats.items() if name.startswith("POST")}
+
+
+def test_creates_then_updates_existing_products(server, tmp_path):
+    catalog = write_catalog(tmp_path / "catalog.csv", catalog_rows(12))
+    summary = upload(server, catalog, tmp_path / "journal.jsonl", batch_size=5)
+    assert (summary.created, summary.updated, summary.failed) == (12, 0, 0)
+    assert server.stats["POST products/batch"] == 3
+
+    # Without the journal the products are found in the shop by SKU or product code
+    changed = write_catalog(tmp_path / "changed.csv", catalog_rows(12, price="12"))
+    summary = upload(server, changed, tmp_path / "other.jsonl", batch_size=5)
+    assert (summary.created, summary.updated, summary.failed) == (0, 12, 0)
+    assert len(server.shop.products) == 12
+    assert {product["regular_price"] for product in server.shop.products.values()} == {"12"}
+
+
+def test_skips_unchanged_rows(server, tmp_path):
+    rows = catalog_rows(6)
+    catalog = write_catalog(tmp_path / "catalog.csv", rows)
+    upload(server, catalog, tmp_path / "journal.jsonl")
+    batches = server.stats["POST products/batch"]
+
+    summary = upload(server, catalog, tmp_path / "journal.jsonl")
+    assert (summary.created, summary.updated, summary.unchanged) == (0, 0, 6)
+    assert server.stats["POST products/batch"] == batches
+
+    rows[0]["Regular price"] = "99"
+    summary = upload(server, write_catalog(tmp_path / "catalog.csv", rows), tmp_path / "journal.jsonl")
+    assert (summary.created, summary.updated, summary.unchanged) == (0, 1, 5)
+
+
+def test_resumes_from_journal(server, tmp_path):
+    rows = catalog_rows(10)
+    # An upload that stopped after the first four products
+    upload(server, write_catalog(tmp_path / "partial.csv", rows[:4]), tmp_path / "journal.jsonl")
+
+    summary = upload(server, write_catalog(tmp_path / "catalog.csv", rows), tmp_path / "journal.jsonl")
+    assert (summary.created, summary.unchanged, summary.failed) == (6, 4, 0)
+    assert len(server.shop.products) == 10
+
+    summary = upload(server, write_catalog(tmp_path / "catalog.csv", rows), tmp_path / "journal.jsonl",
+                     resume=False)
+    assert (summary.created, summary.updated, summary.unchanged) == (0, 10, 0)
+
+
+def test_recovers_failed_batches_without_duplicates(server, tmp_path):
+    random.seed(7)
+    server.error_rate = 0.3
+    catalog = write_catalog(tmp_path / "catalog.csv", catalog_rows(20))
+    summary = upload(server, catalog, tmp_path / "journal.jsonl", batch_size=2)
+    assert server.stats["errors"] > 0
+    assert (summary.created, summary.failed) == (20, 0)
+    assert len(server.shop.products) == 20
+
+
+# The shop applies a batch, then the connection drops before the response
+def test_recovers_creates_applied_before_an_error(server, tmp_path):
+    apply_batch = server.shop.batch
+    failures = []
+
+    def batch_then_drop(body):
+        result = apply_batch(body)
+        if not failures:
+            failures.append(body)
+            raise ConnectionResetError("dropped after applying")
+        return result
+
+    server.shop.batch = batch_then_drop
+    server.handle_error = lambda request, client_address: None
+    catalog = write_catalog(tmp_path / "catalog.csv", catalog_rows(9))
+    summary = upload(server, catalog, tmp_path / "journal.jsonl")
+    assert failures
+    assert (summary.created, summary.updated, summary.failed) == (9, 0, 0)
+    assert len(server.shop.products) == 9
+
+
+def test_dry_run_sends_nothing(server, tmp_path):
+    catalog = write_catalog(tmp_path / "catalog.csv", catalog_rows(8))
+    summary = upload(server, catalog, tmp_path / "journal.jsonl", dry_run=True)
+    assert (summary.created, summary.updated) == (8, 0)
+    assert posts(server) == {}
+    assert server.shop.products == {}
+    assert summary.new_terms == {"Networking", "Switches", "Cables", "Brand 0", "Brand 1"}
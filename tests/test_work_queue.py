@@ -0,0 +1,117 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from work_queue import MemoryWorkQueue, SQLiteWorkQueue
+
+URLS = [f"https://example.com/product/{i}" for i in range(5)]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_queue(request, tmp_path):
+    queues = []
+
+    def make(max_attempts=3):
+        if request.param == "memory":
+            queue = MemoryWorkQueue(max_attempts)
+        else:
+            queue = SQLiteWorkQueue(str(tmp_path / "crawl.db"), max_attempts)
+        queues.append(queue)
+        queue.add(URLS)
+        queue.close_discovery()
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.close()
+
+
+def row(code):
+    return {"Product Code": code, "Name": f"Product {code}"}
+
+
+def test_claims_in_order_without_handing_out_twice(make_queue):
+    queue = make_queue()
+    assert queue.add(URLS) == 0
+    assert queue.claim("a", 2) == URLS[:2]
+    assert queue.claim("b", 10) == URLS[2:]
+    assert queue.claim("a", 10) == []
+    assert queue.counts()["leased"] == 5
+    assert not queue.finished()
+
+
+# lease=0 makes a claim expire by the next claim
+def test_expired_lease_goes_back_to_the_front(make_queue):
+    queue = make_queue()
+    assert queue.claim("a", 2, lease=0) == URLS[:2]
+    assert queue.claim("b", 3) == URLS[:3]
+    # The first worker lost its leases; its late failure and renewal change nothing
+    queue.fail(URLS[0], "a", "timeout")
+    queue.renew("a", URLS[:2])
+    assert queue.counts() == {"pending": 2, "leased": 3, "done": 0, "failed": 0, "products": 0}
+
+
+def test_renewed_lease_is_kept(make_queue):
+    queue = make_queue()
+    assert queue.claim("a", 1, lease=0) == URLS[:1]
+    queue.renew("a", URLS[:1], lease=60)
+    assert queue.claim("b", 1) == URLS[1:2]
+
+
+def test_expired_leases_stop_at_max_attempts(make_queue):
+    queue = make_queue(max_attempts=2)
+    assert queue.claim("a", 1, lease=0) == URLS[:1]
+    assert queue.claim("b", 1, lease=0) == URLS[:1]
+    assert queue.claim("c", 1) == URLS[1:2]
+    assert queue.failed() == {URLS[0]: "lease expired"}
+    assert queue.counts()["failed"] == 1
+
+
+def test_failures_retry_until_max_attempts(make_queue):
+    queue = make_queue(max_attempts=2)
+    assert queue.claim("a", 1) == URLS[:1]
+    queue.fail(URLS[0], "a", "HTTP 500")
+    assert queue.claim("a", 1) == URLS[:1]
+    queue.fail(URLS[0], "a", "HTTP 502")
+    assert queue.failed() == {URLS[0]: "HTTP 502"}
+    assert queue.claim("a", 1) == URLS[1:2]
+
+
+def test_release_does_not_use_an_attempt(make_queue):
+    queue = make_queue(max_attempts=1)
+    assert queue.claim("a", 2) == URLS[:2]
+    queue.release("a", URLS[:2])
+    assert queue.claim("b", 2) == URLS[:2]
+    queue.fail(URLS[0], "b", "HTTP 500")
+    assert queue.failed() == {URLS[0]: "HTTP 500"}
+
+
+def test_commit_is_idempotent_by_product_code(make_queue):
+    queue = make_queue()
+    queue.claim("a", 3)
+    assert queue.commit(URLS[0], "a", row("P1"))
+    # The same product under another URL, and the same URL committed again
+    assert not queue.commit(URLS[1], "a", row("P1"))
+    assert not queue.commit(URLS[0], "a", row("P1"))
+    assert queue.commit(URLS[2], "a", row("P2"))
+    assert queue.has_product("P1") and not queue.has_product("P3")
+    rows = queue.rows()
+    assert [data["Product Code"] for _, data in rows] == ["P1", "P2"]
+    # Sequence numbers are a cursor for rows(after), not a count
+    assert [data["Product Code"] for _, data in queue.rows(after=rows[0][0])] == ["P2"]
+    assert queue.counts()["done"] == 3
+
+
+def test_commit_after_lease_expired_is_not_claimed_again(make_queue):
+    queue = make_queue()
+    assert queue.claim("a", 1, lease=0) == URLS[:1]
+    queue.claim("b", 0)
+    # The slow worker finishes after its URL was requeued
+    assert queue.commit(URLS[0], "a", row("P1"))
+    assert queue.claim("b", 10) == URLS[1:]
+    for i, url in enumerate(URLS[1:]):
+        queue.commit(url, "b", row(f"P{i + 2}"))
+    assert queue.counts() == {"pending": 0, "leased": 0, "done": 5, "failed": 0, "products": 5}
+    assert queue.finished()
@@ -0,0 +1,248 @@
+import atexit
+import hashlib
+import logging
+import math
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+FRONTIER_DIRECTORY = os.path.join(".cache", "frontier")
+# URLs the Bloom filter is sized for before it is rebuilt twice as large
+DEFAULT_CAPACITY = 1_000_000
+DEFAULT_ERROR_RATE = 0.01
+# Index writes batched into one transaction; a crash loses at most these,
+# which only means those URLs count as new on the next run
+COMMIT_EVERY = 500
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+TRACKING_PARAMETERS = {"gclid", "fbclid", "msclkid", "dclid", "_ga", "mc_cid", "mc_eid"}
+
+
+# One spelling per page: lower-case scheme and host, no default port, no
+# fragment, no utm_*/click-id parameters and the rest of the query sorted
+def normalize_url(url):
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or "").lower()
+    if parts.port is not None and DEFAULT_PORTS.get(scheme) != parts.port:
+        netloc = f"{netloc}:{parts.port}"
+    query = sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if not name.lower().startswith("utm_") and name.lower() not in TRACKING_PARAMETERS)
+    return urlunsplit((scheme, netloc, parts.path or "/", urlencode(query), ""))
+
+
+# Bloom filter in a memory-mapped file: `capacity` keys at `error_rate`
+# false positives take -capacity * ln(error_rate) / ln(2)^2 bits, about
+# 1.2 MB per million URLs at 1%, and only the pages touched are resident.
+class BloomFilter:
+    MAGIC = b"URLBLOOM"
+    HEADER = struct.Struct("<8sQQQ")
+
+    def __init__(self, path, capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE):
+        self.path = path
+        if not os.path.exists(path):
+            bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+            bits += -bits % 8
+            hashes = max(1, round(bits / capacity * math.log(2)))
+            with open(path, "wb") as f:
+                f.write(self.HEADER.pack(self.MAGIC, bits, hashes, 0))
+                # Sparse on most filesystems until bits are set
+                f.truncate(self.HEADER.size + bits // 8)
+        self.file = open(path, "r+b")
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        magic, self.bits, self.hashes, self.count = self.HEADER.unpack_from(self.map)
+        if magic != self.MAGIC:
+            raise ValueError(f"{path} is not a URL Bloom filter")
+        self.capacity = round(self.bits * math.log(2) / self.hashes)
+
+    def _positions(self, key):
+        h1, h2 = struct.unpack("<QQ", hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest())
+        h2 |= 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def __contains__(self, key):
+        offset = self.HEADER.size
+        return all(self.map[offset + (position >> 3)] & (1 << (position & 7)) for position in self._positions(key))
+
+    # Callers add each key once; `count` is what sizing is judged by
+    def add(self, key):
+        offset = self.HEADER.size
+        for position in self._positions(key):
+            index = offset + (position >> 3)
+            self.map[index] |= 1 << (position & 7)
+        self.count += 1
+
+    @property
+    def saturated(self):
+        return self.count > self.capacity
+
+    def flush(self):
+        self.HEADER.pack_into(self.map, 0, self.MAGIC, self.bits, self.hashes, self.count)
+        self.map.flush()
+
+    def close(self):
+        self.flush()
+        self.map.close()
+        self.file.close()
+
+
+# Every product URL seen by earlier and current runs, kept on disk so
+# duplicates are dropped before any request is made. A Bloom filter
+# answers "never seen" for new URLs without touching the index; the
+# SQLite index holds the exact set, the run that last queued each URL and
+# the Product Code it turned out to be. Within one run a URL is admitted
+# once, and a URL known to be a product already written this run is not
+# fetched again. Memory stays bounded: the filter is a mapped file and the
+# index is read through SQLite's page cache.
+class URLFrontier:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS urls (
+            url TEXT PRIMARY KEY,
+            product_code TEXT,
+            run INTEGER NOT NULL
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);
+    """
+
+    def __init__(self, directory=FRONTIER_DIRECTORY, capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE):
+        self.directory = directory
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.uncommitted = 0
+        os.makedirs(directory, exist_ok=True)
+        self.index = sqlite3.connect(os.path.join(directory, "index.sqlite"), timeout=60, check_same_thread=False)
+        self.index.execute("PRAGMA journal_mode=WAL")
+        self.index.execute("PRAGMA synchronous=NORMAL")
+        self.index.executescript(self.SCHEMA)
+        with self.index:
+            self.index.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('runs', 0)")
+            self.index.execute("UPDATE meta SET value = value + 1 WHERE key = 'runs'")
+        self.run = self.index.execute("SELECT value FROM meta WHERE key = 'runs'").fetchone()[0]
+
+        self.bloom_path = os.path.join(directory, "urls.bloom")
+        self.bloom = BloomFilter(self.bloom_path, capacity, error_rate)
+        known = self.index.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+        if self.bloom.count < known:
+            # Filter lost or older than the index
+            self._rebuild(max(capacity, known * 2))
+
+    # Rebuild the filter from the index, streaming the URLs
+    def _rebuild(self, capacity):
+        logger.info("Rebuilding the URL Bloom filter for %d URLs", capacity)
+        self.bloom.close()
+        temp_path = self.bloom_path + ".tmp"
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        bloom = BloomFilter(temp_path, capacity, self.error_rate)
+        for (url,) in self.index.execute("SELECT url FROM urls"):
+            bloom.add(url)
+        bloom.close()
+        os.replace(temp_path, self.bloom_path)
+        self.bloom = BloomFilter(self.bloom_path)
+
+    def _wrote(self):
+        self.uncommitted += 1
+        if self.uncommitted >= COMMIT_EVERY:
+            self.index.commit()
+            self.uncommitted = 0
+
+    # Classify `url` for this run and record it:
+    #   "new"             never seen before
+    #   "revisit"         seen by an earlier run; fetched again to refresh it
+    #   "duplicate_url"   already admitted in this run
+    #   "duplicate_code"  its product is already claimed (`is_claimed(code)`)
+    def check(self, url, is_claimed=None):
+        key = normalize_url(url)
+        with self.lock:
+            if key not in self.bloom:
+                inserted = self.index.execute(
+                    "INSERT OR IGNORE INTO urls (url, run) VALUES (?, ?)", (key, self.run)).rowcount
+                self.bloom.add(key)
+                if self.bloom.saturated:
+                    self.index.commit()
+                    self._rebuild(self.bloom.capacity * 2)
+                self._wrote()
+                if inserted:
+                    return "new"
+            row = self.index.execute("SELECT product_code, run FROM urls WHERE url = ?", (key,)).fetchone()
+            if row is None:
+                # A Bloom false positive; counted so the filter stays in step with the index
+                self.index.execute("INSERT INTO urls (url, run) VALUES (?, ?)", (key, self.run))
+                self.bloom.add(key)
+                self._wrote()
+                return "new"
+            product_code, run = row
+            if run == self.run:
+                return "duplicate_url"
+            self.index.execute("UPDATE urls SET run = ? WHERE url = ?", (self.run, key))
+            self._wrote()
+            if product_code and is_claimed is not None and is_claimed(product_code):
+                return "duplicate_code"
+            return "revisit"
+
+    # URLs from `urls` worth fetching in this run. Each dropped URL is passed
+    # to `on_dropped(url, reason)`.
+    def admit(self, urls, is_claimed=None, on_dropped=None):
+        for url in urls:
+            result = self.check(url, is_claimed)
+            metrics.FRONTIER.inc(result=result)
+            if result in ("new", "revisit"):
+                yield url
+            else:
+                logger.debug("Skipping %s: %s", url, result.replace("_", " "), extra={'url': url})
+                if on_dropped is not None:
+                    on_dropped(url, result)
+
+    def record_product(self, url, product_code):
+        key = normalize_url(url)
+        with self.lock:
+            self.index.execute(
+                "INSERT INTO urls (url, product_code, run) VALUES (?, ?, ?) "
+                "ON CONFLICT (url) DO UPDATE SET product_code = excluded.product_code",
+                (key, product_code, self.run))
+            self._wrote()
+
+    def product_code(self, url):
+        with self.lock:
+            row = self.index.execute("SELECT product_code FROM urls WHERE url = ?", (normalize_url(url),)).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        with self.lock:
+            self.index.commit()
+            self.index.close()
+            self.bloom.close()
+
+
+_frontier = None
+_frontier_directory = FRONTIER_DIRECTORY
+_frontier_lock = threading.Lock()
+
+
+# Move the frontier; directory=None turns it off and every discovered URL
+# is fetched again
+def configure(directory):
+    global _frontier, _frontier_directory
+    with _frontier_lock:
+        if _frontier is not None:
+            _frontier.close()
+        _frontier = None
+        _frontier_directory = directory
+
+
+# Shared frontier, created on first use and closed at exit; None when off
+def get_frontier():
+    global _frontier
+    if _frontier is None and _frontier_directory is not None:
+        with _frontier_lock:
+            if _frontier is None and _frontier_directory is not None:
+                _frontier = URLFrontier(_frontier_directory)
+                atexit.register(configure, _frontier_directory)
+    return _frontier
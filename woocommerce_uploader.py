@@ -0,0 +1,466 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import http_client
+import metrics
+from main import render_description
+from output_writer import read_products
+from rate_limiter import RETRY_STATUSES, RequestScheduler
+
+logger = logging.getLogger(__name__)
+
+WC_API_PATH = "/wp-json/wc/v3"
+# products/batch accepts at most 100 create/update/delete operations
+MAX_BATCH_SIZE = 100
+DEFAULT_CONCURRENCY = 4
+PAGE_SIZE = 100
+KEY_ENV = "WC_CONSUMER_KEY"
+SECRET_ENV = "WC_CONSUMER_SECRET"
+JOURNAL_DIRECTORY = "checkpoints"
+
+
+class WooCommerceError(RuntimeError):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+# REST client for one shop. Requests share a pooled keep-alive session
+# sized to the upload concurrency and go through a RequestScheduler, so
+# 429/5xx responses and dropped connections are retried with backoff.
+# Batches that create products are the exception: a create that timed out
+# may still have gone through, so they are sent once and send_batch
+# decides what to resend.
+class WooCommerceClient:
+    def __init__(self, base_url, key, secret, concurrency=DEFAULT_CONCURRENCY, scheduler=None,
+                 timeout=(http_client.CONNECT_TIMEOUT, 120)):
+        self.api_url = base_url.rstrip("/") + WC_API_PATH
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency, pool_block=True)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = http_client.USER_AGENT
+        self.session.auth = (key, secret)
+        self.scheduler = scheduler or RequestScheduler(max_concurrency=concurrency)
+
+    def request(self, method, path, retries=None, **kwargs):
+        url = f"{self.api_url}/{path}"
+        kwargs.setdefault("timeout", self.timeout)
+        response = self.scheduler.call(url, lambda: self.session.request(method, url, **kwargs),
+                                       retry_exceptions=(requests.ConnectionError, requests.Timeout), retries=retries)
+        if response.status_code >= 400:
+            raise WooCommerceError(f"{method} {path}: HTTP {response.status_code}: {response.text[:300]}",
+                                   response.status_code)
+        return response
+
+    # Every item of a paginated collection
+    def get_all(self, path, **params):
+        page = 1
+        while True:
+            response = self.request("GET", path, params={**params, "per_page": PAGE_SIZE, "page": page})
+            yield from response.json()
+            if page >= int(response.headers.get("X-WP-TotalPages") or 1):
+                return
+            page += 1
+
+    def batch(self, create=(), update=()):
+        create, update = list(create), list(update)
+        return self.request("POST", "products/batch", retries=0 if create else None,
+                            json={"create": create, "update": update}).json()
+
+    def close(self):
+        self.session.close()
+
+
+# Product category or tag IDs by name, created on first use. Categories
+# are keyed by (parent id, name) since the same name can appear under
+# several parents. With create=False nothing is sent: a missing term
+# resolves to None and its name is collected in `missing`.
+class TermIndex:
+    def __init__(self, client, path, hierarchical=False, create=True):
+        self.client = client
+        self.path = path
+        self.hierarchical = hierarchical
+        self.create = create
+        self.ids = {}
+        self.missing = set()
+        self.lock = threading.Lock()
+        for term in client.get_all(path, _fields="id,name,parent"):
+            self.ids[self._key(term["name"], term.get("parent", 0))] = term["id"]
+
+    def _key(self, name, parent=0):
+        return (parent if self.hierarchical else 0, name.strip().lower())
+
+    def resolve(self, name, parent=0):
+        key = self._key(name, parent)
+        with self.lock:
+            if key not in self.ids and not self.create:
+                self.missing.add(name.strip())
+                return None
+            if key not in self.ids:
+                data = {"name": name.strip()}
+                if self.hierarchical and parent:
+                    data["parent"] = parent
+                self.ids[key] = self.client.request("POST", self.path, json=data).json()["id"]
+                logger.info("Created %s %r", self.path, name.strip())
+            return self.ids[key]
+
+    # "Networking, Networking > Switches" -> ids of Networking and Switches
+    def resolve_paths(self, value):
+        ids = []
+        for path in value.split(","):
+            parent = 0
+            for name in path.split(">"):
+                if name.strip() and parent is not None:
+                    parent = self.resolve(name, parent)
+                elif name.strip():
+                    # Under a parent that doesn't exist yet
+                    self.missing.add(name.strip())
+            if parent and parent not in ids:
+                ids.append(parent)
+        return ids
+
+
+# Upsert key of a row: its SKU, or its product code when it has none
+def product_key(row):
+    return str(row.get("SKU") or row.get("Meta: _product_code") or row.get("Product Code") or "").strip()
+
+
+def _flag(value):
+    return str(value).strip() in ("1", "true", "True", "yes")
+
+
+# WooCommerce REST product body for a WooCommerce import CSV row
+def product_payload(row, categories, tags):
+    payload = {
+        "name": row.get("Name", ""),
+        "type": row.get("Type") or "simple",
+        "status": "publish" if _flag(row.get("Published", 1)) else "draft",
+        "featured": _flag(row.get("Is featured?", 0)),
+        "catalog_visibility": row.get("Visibility in catalog") or "visible",
+        "description": row.get("Description", ""),
+        "short_description": row.get("Short description", ""),
+        "sku": str(row.get("SKU") or ""),
+        "regular_price": str(row.get("Regular price") or ""),
+        "tax_status": row.get("Tax status") or "taxable",
+        "tax_class": row.get("Tax class") or "",
+        "stock_status": "instock" if _flag(row.get("In stock?", 1)) else "outofstock",
+        "meta_data": [{"key": "_product_code", "value": row.get("Meta: _product_code") or row.get("Product Code", "")}],
+    }
+    if row.get("Categories"):
+        payload["categories"] = [{"id": term_id} for term_id in categories.resolve_paths(row["Categories"])]
+    if row.get("Tags"):
+        tag_ids = [tags.resolve(tag) for tag in row["Tags"].split(",") if tag.strip()]
+        payload["tags"] = [{"id": term_id} for term_id in tag_ids if term_id]
+    if row.get("Images"):
+        payload["images"] = [{"src": src.strip()} for src in row["Images"].split(",") if src.strip()]
+    if row.get("Attribute 1 name"):
+        payload["attributes"] = [{
+            "name": row["Attribute 1 name"],
+            "options": [option.strip() for option in str(row.get("Attribute 1 value(s)", "")).split(",")
+                        if option.strip()],
+            "visible": _flag(row.get("Attribute 1 visible", 1)),
+        }]
+    return payload
+
+
+def payload_fingerprint(payload):
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+# Product IDs already in the shop, by SKU and by _product_code meta
+def existing_products(client):
+    ids = {}
+    for product in client.get_all("products", _fields="id,sku,meta_data", status="any"):
+        for meta in product.get("meta_data") or ():
+            if meta.get("key") == "_product_code" and meta.get("value"):
+                ids.setdefault(str(meta["value"]), product["id"])
+        if product.get("sku"):
+            ids[product["sku"]] = product["id"]
+    return ids
+
+
+# IDs of the products among `keys` that are in the shop now. The keys in
+# `skus` are looked up directly; product codes need the full listing.
+def find_products(client, keys, skus):
+    ids = {}
+    for start in range(0, len(skus), PAGE_SIZE):
+        for product in client.get_all("products", sku=",".join(skus[start:start + PAGE_SIZE]),
+                                      _fields="id,sku", status="any"):
+            ids[product["sku"]] = product["id"]
+    if any(key not in skus for key in keys):
+        ids.update(existing_products(client))
+    return {key: ids[key] for key in keys if key in ids}
+
+
+# A failed batch whose creates may or may not have been applied
+def _retryable(error):
+    if isinstance(error, WooCommerceError):
+        return error.status in RETRY_STATUSES
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+
+def shop_key(shop_url):
+    return shop_url.strip().rstrip("/").lower()
+
+
+# One journal per shop: product IDs and "already uploaded" only mean
+# something for the shop they came from
+def default_journal_path(shop_url):
+    digest = hashlib.sha1(shop_key(shop_url).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(JOURNAL_DIRECTORY, f"woocommerce_upload-{digest}.jsonl")
+
+
+# Append-only JSONL journal of the uploads to one shop:
+#   {"event": "uploaded", "shop": ..., "key": ..., "id": ..., "fingerprint": ...}
+#   {"event": "failed", "shop": ..., "key": ..., "error": ...}
+# A product whose payload fingerprint matches its last upload is skipped,
+# so an interrupted upload resumes where it stopped and a refresh only
+# sends products that changed. Events for other shops, in a journal
+# shared through --journal, are ignored.
+class UploadJournal:
+    def __init__(self, path, shop_url, resume=True):
+        self.path = path
+        self.shop = shop_key(shop_url)
+        self.lock = threading.Lock()
+        self.uploaded = {}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if resume and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue
+                    if event.get("event") == "uploaded" and event.get("shop") == self.shop:
+                        self.uploaded[event["key"]] = (event["id"], event["fingerprint"])
+        self.file = open(path, "a" if resume else "w", encoding="utf-8")
+
+    def _write(self, event):
+        event = {"event": event.pop("event"), "shop": self.shop, **event}
+        with self.lock:
+            self.file.write(json.dumps(event, ensure_ascii=False) + "\n")
+            self.file.flush()
+
+    def is_current(self, key, fingerprint):
+        entry = self.uploaded.get(key)
+        return entry is not None and entry[1] == fingerprint
+
+    def product_id(self, key):
+        entry = self.uploaded.get(key)
+        return entry[0] if entry else None
+
+    def record_uploaded(self, key, product_id, fingerprint):
+        with self.lock:
+            self.uploaded[key] = (product_id, fingerprint)
+        self._write({"event": "uploaded", "key": key, "id": product_id, "fingerprint": fingerprint})
+
+    def record_failure(self, key, error):
+        self._write({"event": "failed", "key": key, "error": str(error)})
+
+    def close(self):
+        self.file.close()
+
+
+class UploadSummary:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.failed = 0
+        self.skipped = 0
+        # Category and tag names a dry run would have created
+        self.new_terms = set()
+        self.lock = threading.Lock()
+
+    def add(self, **counts):
+        with self.lock:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+
+    def __str__(self):
+        return (f"{self.created} created, {self.updated} updated, {self.unchanged} unchanged, "
+                f"{self.failed} failed, {self.skipped} without SKU")
+
+
+# Send one products/batch request and journal each item's outcome; items
+# are (key, fingerprint, product id or None, payload). When a batch with
+# creates fails with a 5xx or timeout, the shop is asked which of them
+# exist before resending, and those go as updates instead, so a create
+# the shop applied before the error is not made twice.
+def send_batch(client, journal, summary, items):
+    attempt = 0
+    # Creates the failed attempt turned out to have applied
+    recovered = set()
+    while True:
+        creates = [item for item in items if item[2] is None]
+        updates = [item for item in items if item[2] is not None]
+        try:
+            with metrics.STAGE_SECONDS.time(stage="upload"):
+                result = client.batch(create=[payload for _, _, _, payload in creates],
+                                      update=[{**payload, "id": product_id} for _, _, product_id, payload in updates])
+            break
+        except (WooCommerceError, requests.RequestException, ValueError) as e:
+            error = e
+            if creates and _retryable(e) and attempt < client.scheduler.retries:
+                logger.warning("Batch of %d products failed, checking its creates before resending: %s", len(items), e)
+                time.sleep(client.scheduler.backoff(attempt))
+                attempt += 1
+                try:
+                    found = find_products(client, [key for key, _, _, _ in creates],
+                                          [key for key, _, _, payload in creates if payload["sku"]])
+                except (WooCommerceError, requests.RequestException, ValueError) as lookup_error:
+                    error = lookup_error
+                else:
+                    recovered.update(found)
+                    items = [(key, fingerprint, product_id or found.get(key), payload)
+                             for key, fingerprint, product_id, payload in items]
+                    continue
+        logger.error("Batch of %d products failed: %s", len(items), error)
+        for key, _, _, _ in items:
+            journal.record_failure(key, error)
+        summary.add(failed=len(items))
+        return
+
+    for kind, sent in (("create", creates), ("update", updates)):
+        for (key, fingerprint, _, _), product in zip(sent, result.get(kind) or ()):
+            error = product.get("error")
+            if error:
+                logger.warning("%s %s failed: %s", kind.capitalize(), key, error.get("message") or error,
+                               extra={"product_code": key})
+                journal.record_failure(key, error.get("message") or error)
+                summary.add(failed=1)
+            else:
+                journal.record_uploaded(key, product["id"], fingerprint)
+                summary.add(**{"created" if kind == "create" or key in recovered else "updated": 1})
+
+
+# Upsert every product in a catalog written by ProductWriter (CSV, JSON
+# lines, Parquet or Arrow) into the shop, `batch_size` products per
+# request and `concurrency` requests at a time
+def upload_catalog(path, client, journal, batch_size=MAX_BATCH_SIZE, concurrency=DEFAULT_CONCURRENCY,
+                   dry_run=False):
+    if not 1 <= batch_size <= MAX_BATCH_SIZE:
+        raise ValueError(f"batch size must be between 1 and {MAX_BATCH_SIZE}, got {batch_size}")
+    existing = existing_products(client)
+    # A dry run only looks terms up
+    categories = TermIndex(client, "products/categories", hierarchical=True, create=not dry_run)
+    tags = TermIndex(client, "products/tags", create=not dry_run)
+    summary = UploadSummary()
+    seen = set()
+    # At most two batches queued per worker, so a large catalog is streamed
+    slots = threading.BoundedSemaphore(concurrency * 2)
+    futures = set()
+
+    def submit(executor, items):
+        if dry_run:
+            summary.add(created=sum(1 for item in items if item[2] is None),
+                        updated=sum(1 for item in items if item[2] is not None))
+            return
+        slots.acquire()
+        future = executor.submit(send_batch, client, journal, summary, items)
+        future.add_done_callback(lambda _: slots.release())
+        futures.add(future)
+        # Errors send_batch doesn't journal surface here rather than vanish
+        for done in [f for f in futures if f.done()]:
+            futures.discard(done)
+            done.result()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = []
+        for row in read_products(path):
+            key = product_key(row)
+            if not key:
+                summary.add(skipped=1)
+                continue
+            if key in seen:
+                continue
+            seen.add(key)
+            if "Description" not in row and "description_params" in row:
+                # Columnar catalogs store the description as its template values
+                row["Description"] = render_description(row)
+            payload = product_payload(row, categories, tags)
+            fingerprint = payload_fingerprint(payload)
+            if journal.is_current(key, fingerprint):
+                summary.add(unchanged=1)
+                continue
+            pending.append((key, fingerprint, existing.get(key) or journal.product_id(key), payload))
+            if len(pending) >= batch_size:
+                submit(executor, pending)
+                pending = []
+        if pending:
+            submit(executor, pending)
+        for future in futures:
+            future.result()
+    summary.new_terms = categories.missing | tags.missing
+    return summary
+
+
+# (key, secret) from the environment, or None when either is unset
+def woocommerce_credentials():
+    key, secret = os.environ.get(KEY_ENV), os.environ.get(SECRET_ENV)
+    return (key, secret) if key and secret else None
+
+
+# Publish stage of a scrape: upsert the finished catalog with the
+# credentials from the environment
+def publish_catalog(path, shop_url, journal_path=None, concurrency=DEFAULT_CONCURRENCY):
+    key, secret = woocommerce_credentials()
+    client = WooCommerceClient(shop_url, key, secret, concurrency)
+    journal = UploadJournal(journal_path or default_journal_path(shop_url), shop_url)
+    try:
+        return upload_catalog(path, client, journal, concurrency=concurrency)
+    finally:
+        journal.close()
+        client.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Upsert a scraped catalog into WooCommerce through its REST API")
+    parser.add_argument("catalog", help="catalog file written by main.py (CSV, JSON lines, Parquet or Arrow)")
+    parser.add_argument("--url", required=True, help="shop base URL, e.g. https://www.movantechonline.com")
+    parser.add_argument("--key", default=os.environ.get(KEY_ENV), help=f"REST consumer key (or set {KEY_ENV})")
+    parser.add_argument("--secret", default=os.environ.get(SECRET_ENV),
+                        help=f"REST consumer secret (or set {SECRET_ENV})")
+    parser.add_argument("--batch-size", type=int, default=MAX_BATCH_SIZE,
+                        help=f"products per products/batch request (at most {MAX_BATCH_SIZE})")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="batch requests in flight")
+    parser.add_argument("--journal", default=None,
+                        help="upload journal used to resume and skip unchanged (default: one per shop in checkpoints/)")
+    parser.add_argument("--restart", action="store_true", help="ignore the journal and upload every product")
+    parser.add_argument("--dry-run", action="store_true", help="count creates and updates without sending them")
+    args = parser.parse_args()
+    if not args.key or not args.secret:
+        parser.error(f"give --key/--secret or set {KEY_ENV}/{SECRET_ENV}")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    client = WooCommerceClient(args.url, args.key, args.secret, args.concurrency)
+    journal = UploadJournal(args.journal or default_journal_path(args.url), args.url, resume=not args.restart)
+    try:
+        summary = upload_catalog(args.catalog, client, journal, args.batch_size, args.concurrency, args.dry_run)
+    except (WooCommerceError, requests.RequestException, ValueError) as e:
+        sys.exit(f"Error: {e}")
+    finally:
+        journal.close()
+        client.close()
+    print(f"{'Would upload' if args.dry_run else 'Uploaded'}: {summary}")
+    if summary.new_terms:
+        print(f"Would create categories and tags: {', '.join(sorted(summary.new_terms))}")
+    if summary.failed:
+        sys.exit(1)
@@ -0,0 +1,466 @@
+import json
+import sqlite3
+import threading
+import time
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Seconds a claimed URL stays with its worker before it is handed out again
+DEFAULT_LEASE = 300
+# Claims of one URL (crashed leases included) before it is given up on
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+class WorkQueueError(RuntimeError):
+    pass
+
+
+# Shared queue of product URLs for a distributed crawl. The coordinator
+# adds discovered URLs; workers claim a few at a time under a lease that
+# they renew while they work. A URL whose lease runs out (its worker died
+# or lost the network) goes back to the front of the queue, and after
+# `max_attempts` claims it is marked failed instead. Results are committed
+# by Product Code, so a URL finished twice, or two URLs for one product,
+# store one row. Every backend has the same methods:
+#   add(urls) -> number newly queued           close_discovery()
+#   claim(worker, count, lease) -> [url, ...]  renew(worker, urls, lease)
+#   commit(url, worker, row) -> True if stored, False for a duplicate
+#   fail(url, worker, error)                   release(worker, urls)
+#   has_product(code)  rows(after) -> [(seq, row), ...]  counts()  finished()
+# Lease deadlines come from the workers' clocks, so nodes need NTP.
+
+
+# Process-local stand-in for the shared backends, for single-box runs and
+# for exercising coordinator and workers in one process
+class MemoryWorkQueue:
+    def __init__(self, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.states = {}
+        self.pending = []
+        self.leases = {}
+        self.attempts = {}
+        self.failures = {}
+        self.product_codes = set()
+        self.products = []
+        self.discovery_complete = False
+
+    def add(self, urls):
+        added = 0
+        with self.lock:
+            for url in urls:
+                if url not in self.states:
+                    self.states[url] = "pending"
+                    self.pending.append(url)
+                    added += 1
+        return added
+
+    def close_discovery(self):
+        with self.lock:
+            self.discovery_complete = True
+
+    def _requeue_expired(self, now):
+        expired = [url for url, (worker, deadline) in self.leases.items() if deadline <= now]
+        # Pushed back to the front in their original order
+        for url in reversed(expired):
+            del self.leases[url]
+            self._retry_or_fail(url, "lease expired")
+
+    def _retry_or_fail(self, url, error):
+        if self.attempts.get(url, 0) >= self.max_attempts:
+            self.states[url] = "failed"
+            self.failures[url] = error
+        else:
+            self.states[url] = "pending"
+            self.pending.insert(0, url)
+
+    def claim(self, worker, count, lease=DEFAULT_LEASE):
+        now = time.time()
+        with self.lock:
+            self._requeue_expired(now)
+            claimed, self.pending = self.pending[:count], self.pending[count:]
+            for url in claimed:
+                self.states[url] = "leased"
+                self.leases[url] = (worker, now + lease)
+                self.attempts[url] = self.attempts.get(url, 0) + 1
+            return claimed
+
+    def renew(self, worker, urls, lease=DEFAULT_LEASE):
+        deadline = time.time() + lease
+        with self.lock:
+            for url in urls:
+                if self.leases.get(url, (None,))[0] == worker:
+                    self.leases[url] = (worker, deadline)
+
+    def commit(self, url, worker, row):
+        with self.lock:
+            self.leases.pop(url, None)
+            if self.states.get(url) == "pending":
+                # Requeued when its lease ran out; finished by the late worker after all
+                self.pending.remove(url)
+            self.states[url] = "done"
+            self.failures.pop(url, None)
+            code = row.get("Product Code", "")
+            if code in self.product_codes:
+                return False
+            self.product_codes.add(code)
+            self.products.append(row)
+            return True
+
+    def fail(self, url, worker, error):
+        with self.lock:
+            if self.leases.get(url, (None,))[0] == worker:
+                del self.leases[url]
+                self._retry_or_fail(url, str(error))
+
+    # Hand back URLs a stopping worker never started, without using up an attempt
+    def release(self, worker, urls):
+        with self.lock:
+            for url in reversed(list(urls)):
+                if self.leases.get(url, (None,))[0] == worker:
+                    del self.leases[url]
+                    self.attempts[url] -= 1
+                    self.states[url] = "pending"
+                    self.pending.insert(0, url)
+
+    def has_product(self, product_code):
+        with self.lock:
+            return product_code in self.product_codes
+
+    def rows(self, after=0, limit=1000):
+        with self.lock:
+            return list(enumerate(self.products[after:after + limit], start=after + 1))
+
+    def failed(self):
+        with self.lock:
+            return dict(self.failures)
+
+    def counts(self):
+        with self.lock:
+            counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+            for state in self.states.values():
+                counts[state] += 1
+            counts["products"] = len(self.products)
+            return counts
+
+    def finished(self):
+        with self.lock:
+            return self.discovery_complete and not self.pending and not self.leases
+
+    def close(self):
+        pass
+
+
+# Queue in one SQLite file that every node opens, e.g. on an NFS or SMB
+# share. Each claim or commit is a short IMMEDIATE transaction, so nodes
+# take turns on the file's write lock. The rollback journal is used rather
+# than WAL, which needs shared memory and so only works on one host.
+class SQLiteWorkQueue:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS urls (
+            id INTEGER PRIMARY KEY,
+            url TEXT NOT NULL UNIQUE,
+            state TEXT NOT NULL DEFAULT 'pending',
+            worker TEXT,
+            lease_until REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT
+        );
+        CREATE INDEX IF NOT EXISTS urls_state ON urls (state, id);
+        CREATE TABLE IF NOT EXISTS products (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_code TEXT NOT NULL UNIQUE,
+            url TEXT NOT NULL,
+            worker TEXT,
+            row TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+    """
+
+    def __init__(self, path, max_attempts=DEFAULT_MAX_ATTEMPTS, timeout=60):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        # Transactions are opened explicitly with BEGIN IMMEDIATE
+        self.connection = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=DELETE")
+        with self.lock:
+            self.connection.executescript(self.SCHEMA)
+
+    def _transaction(self, work):
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(self.connection)
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+            self.connection.execute("COMMIT")
+            return result
+
+    def _query(self, sql, parameters=()):
+        with self.lock:
+            return self.connection.execute(sql, parameters).fetchall()
+
+    def add(self, urls):
+        urls = [(url,) for url in urls]
+        return self._transaction(lambda db: db.executemany(
+            "INSERT OR IGNORE INTO urls (url) VALUES (?)", urls).rowcount)
+
+    def close_discovery(self):
+        self._transaction(lambda db: db.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('discovery_complete', '1')"))
+
+    def claim(self, worker, count, lease=DEFAULT_LEASE):
+        def work(db):
+            now = time.time()
+            db.execute("UPDATE urls SET state = 'failed', worker = NULL, error = 'lease expired' "
+                       "WHERE state = 'leased' AND lease_until <= ? AND attempts >= ?", (now, self.max_attempts))
+            # Expired leases keep their place near the front of the queue
+            db.execute("UPDATE urls SET state = 'pending', worker = NULL WHERE state = 'leased' AND lease_until <= ?",
+                       (now,))
+            rows = db.execute("SELECT id, url FROM urls WHERE state = 'pending' ORDER BY id LIMIT ?",
+                              (count,)).fetchall()
+            db.executemany("UPDATE urls SET state = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1 "
+                           "WHERE id = ?", [(worker, now + lease, id) for id, _ in rows])
+            return [url for _, url in rows]
+        return self._transaction(work)
+
+    def renew(self, worker, urls, lease=DEFAULT_LEASE):
+        deadline = time.time() + lease
+        self._transaction(lambda db: db.executemany(
+            "UPDATE urls SET lease_until = ? WHERE url = ? AND state = 'leased' AND worker = ?",
+            [(deadline, url, worker) for url in urls]))
+
+    def commit(self, url, worker, row):
+        def work(db):
+            db.execute("UPDATE urls SET state = 'done', worker = NULL, error = NULL WHERE url = ?", (url,))
+            return db.execute(
+                "INSERT OR IGNORE INTO products (product_code, url, worker, row) VALUES (?, ?, ?, ?)",
+                (row.get("Product Code", ""), url, worker, json.dumps(row, ensure_ascii=False))).rowcount == 1
+        return self._transaction(work)
+
+    def fail(self, url, worker, error):
+        def work(db):
+            db.execute("UPDATE urls SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                       "worker = NULL, error = ? WHERE url = ? AND state = 'leased' AND worker = ?",
+                       (self.max_attempts, str(error), url, worker))
+        self._transaction(work)
+
+    def release(self, worker, urls):
+        self._transaction(lambda db: db.executemany(
+            "UPDATE urls SET state = 'pending', worker = NULL, attempts = attempts - 1 "
+            "WHERE url = ? AND state = 'leased' AND worker = ?", [(url, worker) for url in urls]))
+
+    def has_product(self, product_code):
+        return bool(self._query("SELECT 1 FROM products WHERE product_code = ?", (product_code,)))
+
+    def rows(self, after=0, limit=1000):
+        return [(seq, json.loads(row)) for seq, row in self._query(
+            "SELECT seq, row FROM products WHERE seq > ? ORDER BY seq LIMIT ?", (after, limit))]
+
+    def failed(self):
+        return dict(self._query("SELECT url, error FROM urls WHERE state = 'failed'"))
+
+    def counts(self):
+        counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+        counts.update(self._query("SELECT state, COUNT(*) FROM urls GROUP BY state"))
+        counts["products"] = self._query("SELECT COUNT(*) FROM products")[0][0]
+        return counts
+
+    def finished(self):
+        discovery = self._query("SELECT value FROM meta WHERE key = 'discovery_complete'")
+        return bool(discovery) and not self._query(
+            "SELECT 1 FROM urls WHERE state IN ('pending', 'leased') LIMIT 1")
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+# Queue on a Redis (or Redis-compatible: Valkey, KeyDB, DragonflyDB)
+# server. Claims, commits and failures are Lua scripts, so each one is
+# atomic on the server. Keys, under `prefix`:
+#   seen (set)  pending (list)  leases (zset url -> deadline)
+#   owners (hash url -> worker)  attempts (hash)  done (set)
+#   failed (hash url -> error)  codes (hash code -> url)  rows (list)
+#   discovery_complete (string)
+class RedisWorkQueue:
+    ADD = """
+        local added = 0
+        for _, url in ipairs(ARGV) do
+            if redis.call('SADD', KEYS[1], url) == 1 then
+                redis.call('RPUSH', KEYS[2], url)
+                added = added + 1
+            end
+        end
+        return added
+    """
+    # KEYS: pending leases owners attempts failed done; ARGV: now deadline count worker max_attempts
+    CLAIM = """
+        local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+        for i = #expired, 1, -1 do
+            local url = expired[i]
+            redis.call('ZREM', KEYS[2], url)
+            redis.call('HDEL', KEYS[3], url)
+            if tonumber(redis.call('HGET', KEYS[4], url) or '0') >= tonumber(ARGV[5]) then
+                redis.call('HSET', KEYS[5], url, 'lease expired')
+            else
+                redis.call('LPUSH', KEYS[1], url)
+            end
+        end
+        local claimed = {}
+        while #claimed < tonumber(ARGV[3]) do
+            local url = redis.call('LPOP', KEYS[1])
+            if not url then break end
+            if redis.call('SISMEMBER', KEYS[6], url) == 0 then
+                redis.call('ZADD', KEYS[2], ARGV[2], url)
+                redis.call('HSET', KEYS[3], url, ARGV[4])
+                redis.call('HINCRBY', KEYS[4], url, 1)
+                claimed[#claimed + 1] = url
+            end
+        end
+        return claimed
+    """
+    # KEYS: leases owners; ARGV: deadline worker url...
+    RENEW = """
+        for i = 3, #ARGV do
+            if redis.call('HGET', KEYS[2], ARGV[i]) == ARGV[2] then
+                redis.call('ZADD', KEYS[1], 'XX', ARGV[1], ARGV[i])
+            end
+        end
+    """
+    # KEYS: leases owners done failed codes rows; ARGV: url product_code row
+    COMMIT = """
+        redis.call('ZREM', KEYS[1], ARGV[1])
+        redis.call('HDEL', KEYS[2], ARGV[1])
+        redis.call('SADD', KEYS[3], ARGV[1])
+        redis.call('HDEL', KEYS[4], ARGV[1])
+        if redis.call('HSETNX', KEYS[5], ARGV[2], ARGV[1]) == 1 then
+            redis.call('RPUSH', KEYS[6], ARGV[3])
+            return 1
+        end
+        return 0
+    """
+    # KEYS: pending leases owners attempts failed; ARGV: url worker error max_attempts
+    FAIL = """
+        if redis.call('HGET', KEYS[3], ARGV[1]) ~= ARGV[2] then return end
+        redis.call('ZREM', KEYS[2], ARGV[1])
+        redis.call('HDEL', KEYS[3], ARGV[1])
+        if tonumber(redis.call('HGET', KEYS[4], ARGV[1]) or '0') >= tonumber(ARGV[4]) then
+            redis.call('HSET', KEYS[5], ARGV[1], ARGV[3])
+        else
+            redis.call('LPUSH', KEYS[1], ARGV[1])
+        end
+    """
+    # KEYS: pending leases owners attempts; ARGV: worker url...
+    RELEASE = """
+        for i = #ARGV, 2, -1 do
+            if redis.call('HGET', KEYS[3], ARGV[i]) == ARGV[1] then
+                redis.call('ZREM', KEYS[2], ARGV[i])
+                redis.call('HDEL', KEYS[3], ARGV[i])
+                redis.call('HINCRBY', KEYS[4], ARGV[i], -1)
+                redis.call('LPUSH', KEYS[1], ARGV[i])
+            end
+        end
+    """
+
+    def __init__(self, url, prefix="crawl", max_attempts=DEFAULT_MAX_ATTEMPTS, client=None):
+        if client is None:
+            if redis is None:
+                raise WorkQueueError("the redis package is needed for a Redis work queue (pip install redis)")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.max_attempts = max_attempts
+        self.keys = {name: f"{prefix}:{name}" for name in (
+            "seen", "pending", "leases", "owners", "attempts", "done", "failed", "codes", "rows",
+            "discovery_complete")}
+        self.scripts = {name: client.register_script(getattr(self, name)) for name in (
+            "ADD", "CLAIM", "RENEW", "COMMIT", "FAIL", "RELEASE")}
+
+    def _keys(self, *names):
+        return [self.keys[name] for name in names]
+
+    def add(self, urls):
+        urls = list(urls)
+        if not urls:
+            return 0
+        return self.scripts["ADD"](keys=self._keys("seen", "pending"), args=urls)
+
+    def close_discovery(self):
+        self.client.set(self.keys["discovery_complete"], 1)
+
+    def claim(self, worker, count, lease=DEFAULT_LEASE):
+        now = time.time()
+        claimed = self.scripts["CLAIM"](
+            keys=self._keys("pending", "leases", "owners", "attempts", "failed", "done"),
+            args=[now, now + lease, count, worker, self.max_attempts])
+        return [url.decode("utf-8") if isinstance(url, bytes) else url for url in claimed]
+
+    def renew(self, worker, urls, lease=DEFAULT_LEASE):
+        urls = list(urls)
+        if urls:
+            self.scripts["RENEW"](keys=self._keys("leases", "owners"), args=[time.time() + lease, worker, *urls])
+
+    def commit(self, url, worker, row):
+        return self.scripts["COMMIT"](
+            keys=self._keys("leases", "owners", "done", "failed", "codes", "rows"),
+            args=[url, row.get("Product Code", ""), json.dumps(row, ensure_ascii=False)]) == 1
+
+    def fail(self, url, worker, error):
+        self.scripts["FAIL"](keys=self._keys("pending", "leases", "owners", "attempts", "failed"),
+                             args=[url, worker, str(error), self.max_attempts])
+
+    def release(self, worker, urls):
+        urls = list(urls)
+        if urls:
+            self.scripts["RELEASE"](keys=self._keys("pending", "leases", "owners", "attempts"), args=[worker, *urls])
+
+    def has_product(self, product_code):
+        return bool(self.client.hexists(self.keys["codes"], product_code))
+
+    def rows(self, after=0, limit=1000):
+        rows = self.client.lrange(self.keys["rows"], after, after + limit - 1)
+        return [(seq, json.loads(row)) for seq, row in enumerate(rows, start=after + 1)]
+
+    def failed(self):
+        return {url.decode("utf-8"): error.decode("utf-8")
+                for url, error in self.client.hgetall(self.keys["failed"]).items()}
+
+    def counts(self):
+        pipeline = self.client.pipeline(transaction=False)
+        pipeline.llen(self.keys["pending"])
+        pipeline.zcard(self.keys["leases"])
+        pipeline.scard(self.keys["done"])
+        pipeline.hlen(self.keys["failed"])
+        pipeline.llen(self.keys["rows"])
+        pending, leased, done, failed, products = pipeline.execute()
+        return {"pending": pending, "leased": leased, "done": done, "failed": failed, "products": products}
+
+    def finished(self):
+        counts = self.counts()
+        return bool(self.client.exists(self.keys["discovery_complete"])) and not (
+            counts["pending"] or counts["leased"])
+
+    def close(self):
+        self.client.close()
+
+
+# Open a queue from its location:
+#   path/to/crawl.db or sqlite:///path/to/crawl.db    SQLite file
+#   (sqlite:////shared/crawl.db for an absolute path)
+#   redis://host:6379/0[#prefix]                       Redis server
+#   memory:                                            this process only
+def open_queue(location, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    if location == "memory:":
+        return MemoryWorkQueue(max_attempts)
+    if location.startswith(("redis://", "rediss://", "unix://")):
+        url, _, prefix = location.partition("#")
+        return RedisWorkQueue(url, prefix or "crawl", max_attempts)
+    if location.startswith("sqlite:///"):
+        # sqlite:///relative.db, sqlite:////absolute.db
+        location = location[len("sqlite:///"):]
+    return SQLiteWorkQueue(location, max_attempts)